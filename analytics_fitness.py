@@ -0,0 +1,315 @@
+"""
+Per-user training analytics on pandas/NumPy: volume, estimated 1RM, personal records,
+rolling averages and streaks.
+
+    python analytics_fitness.py --user 7       # print a user's analytics summary
+    python analytics_fitness.py --benchmark    # time everything on a synthetic 10-year history
+
+A user's whole training log is pulled in one columnar query (get_training_log) and kept
+in memory. Later calls only fetch workouts with a higher workout_id than any already held,
+so refreshing after a new workout costs one small query; derived results are recomputed
+from the in-memory frame only when new rows arrived. Frames are fully reloaded after
+`max_age` seconds so deletions are eventually seen.
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from backend_fitness import TRAINING_LOG_COLUMNS, get_training_log
+
+# Resample rules for volume()
+VOLUME_PERIODS = {'week': "W-SUN", 'month': "MS"}
+
+
+def _floats(values):
+    """float64 array from a column that may hold None or Decimal (Postgres NUMERIC)."""
+    return np.fromiter((np.nan if v is None else float(v) for v in values), dtype="float64", count=len(values))
+
+
+def to_frame(log):
+    """Turns a columnar training log into a DataFrame with per-set volume and estimated 1RM."""
+    df = pd.DataFrame({
+        'workout_id': np.asarray(log['workout_id'], dtype="int64"),
+        'workout_date': pd.to_datetime(pd.Series(log['workout_date'], dtype="object")),
+        'duration_minutes': _floats(log['duration_minutes']),
+        'exercise_name': pd.Series(log['exercise_name'], dtype="object"),
+        'sets': _floats(log['sets']),
+        'reps': _floats(log['reps']),
+        'weight': _floats(log['weight']),
+    })
+    df['volume'] = (df['sets'] * df['reps'] * df['weight']).fillna(0.0)
+    # Epley: weight * (1 + reps / 30); a single rep is already a 1RM
+    df['e1rm'] = np.where(df['reps'] <= 1, df['weight'], df['weight'] * (1 + df['reps'] / 30))
+    return df
+
+
+def _runs(values):
+    """Lengths of runs of consecutive integers in a sorted unique array."""
+    breaks = np.diff(values) != 1
+    return np.bincount(np.concatenate(([0], np.cumsum(breaks))))
+
+
+class UserAnalytics:
+    """One user's training log as a DataFrame plus memoized analytics over it."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.frame = to_frame({column: [] for column in TRAINING_LOG_COLUMNS})
+        self.last_workout_id = 0
+        self.loaded_at = time.monotonic()
+        self.lock = threading.Lock()
+        self._results = {}
+
+    def extend(self, log):
+        """Appends newly fetched rows; returns False when there were none."""
+        if not log['workout_id']:
+            return False
+        new = to_frame(log)
+        self.frame = pd.concat([self.frame, new], ignore_index=True) if len(self.frame) else new
+        self.last_workout_id = max(self.last_workout_id, int(new['workout_id'].max()))
+        self._results.clear()
+        return True
+
+    def _memo(self, key, compute):
+        if key not in self._results:
+            self._results[key] = compute()
+        return self._results[key]
+
+    # --- Derived views ---
+
+    def sets(self):
+        """Rows that are actual exercises (workouts without exercises dropped), oldest first."""
+        return self._memo('sets', lambda: self.frame.dropna(subset=['exercise_name'])
+                          .sort_values(['workout_date', 'workout_id'], kind="stable"))
+
+    def workouts(self):
+        """One row per workout: workout_id, workout_date, duration_minutes."""
+        return self._memo('workouts', lambda: self.frame.drop_duplicates('workout_id')
+                          [['workout_id', 'workout_date', 'duration_minutes']].sort_values('workout_date'))
+
+    def volume(self, period='week', by_exercise=False):
+        """Total sets x reps x weight per week/month, optionally one column per exercise."""
+        def compute():
+            sets = self.sets()
+            if not len(sets):
+                return pd.DataFrame() if by_exercise else pd.Series(dtype="float64")
+            if by_exercise:
+                table = sets.pivot_table(index='workout_date', columns='exercise_name', values='volume',
+                                         aggfunc="sum", fill_value=0.0)
+                return table.resample(VOLUME_PERIODS[period]).sum()
+            return sets.set_index('workout_date')['volume'].resample(VOLUME_PERIODS[period]).sum()
+        return self._memo(('volume', period, by_exercise), compute)
+
+    def estimated_1rm(self):
+        """Best estimated one-rep max per exercise, strongest first."""
+        return self._memo('e1rm', lambda: self.sets().groupby('exercise_name')['e1rm'].max()
+                          .dropna().sort_values(ascending=False))
+
+    def e1rm_history(self, exercise):
+        """Best estimated 1RM for one exercise on each day it was trained."""
+        def compute():
+            sets = self.sets()
+            return sets[sets['exercise_name'] == exercise].groupby('workout_date')['e1rm'].max()
+        return self._memo(('e1rm_history', exercise), compute)
+
+    def personal_records(self):
+        """Sets whose estimated 1RM beat every earlier set of the same exercise (first sessions excluded)."""
+        def compute():
+            sets = self.sets().dropna(subset=['e1rm'])
+            best_before = sets.groupby('exercise_name')['e1rm'].cummax().groupby(sets['exercise_name']).shift()
+            prs = sets[sets['e1rm'] > best_before]
+            return prs[['workout_date', 'exercise_name', 'sets', 'reps', 'weight', 'e1rm']].iloc[::-1]
+        return self._memo('prs', compute)
+
+    def rolling(self, windows=(7, 28), today=None):
+        """Daily minutes and volume with rolling means over `windows` days, up to today."""
+        def compute():
+            workouts = self.workouts()
+            if not len(workouts):
+                return pd.DataFrame()
+            end = max(pd.Timestamp(today or date.today()), workouts['workout_date'].max())
+            days = pd.date_range(workouts['workout_date'].min(), end, freq="D")
+            daily = pd.DataFrame({
+                'minutes': workouts.groupby('workout_date')['duration_minutes'].sum(),
+                'volume': self.sets().groupby('workout_date')['volume'].sum(),
+            }).reindex(days, fill_value=0.0).fillna(0.0)
+            for window in windows:
+                daily[f'minutes_{window}d_avg'] = daily['minutes'].rolling(window, min_periods=1).mean()
+                daily[f'volume_{window}d_avg'] = daily['volume'].rolling(window, min_periods=1).mean()
+            return daily
+        return self._memo(('rolling', tuple(windows), today), compute)
+
+    def streaks(self, today=None):
+        """Current and longest runs of consecutive workout days and of consecutive weeks (Monday-based)."""
+        def compute():
+            days = np.unique(self.workouts()['workout_date'].values.astype("datetime64[D]").astype("int64"))
+            if not len(days):
+                return {'current_days': 0, 'longest_days': 0, 'current_weeks': 0, 'longest_weeks': 0}
+            now = np.datetime64(today or date.today(), "D").astype("int64")
+            # Day 0 (1970-01-01) is a Thursday, so +3 puts week boundaries on Mondays
+            weeks = np.unique((days + 3) // 7)
+            day_runs, week_runs = _runs(days), _runs(weeks)
+            return {
+                # A streak is still alive if the last workout was today or yesterday / this or last week
+                'current_days': int(day_runs[-1]) if now - days[-1] <= 1 else 0,
+                'longest_days': int(day_runs.max()),
+                'current_weeks': int(week_runs[-1]) if (now + 3) // 7 - weeks[-1] <= 1 else 0,
+                'longest_weeks': int(week_runs.max()),
+            }
+        return self._memo(('streaks', today), compute)
+
+    def summary(self):
+        workouts = self.workouts()
+        return {
+            'workouts': len(workouts),
+            'sets_logged': len(self.sets()),
+            'total_volume': float(self.sets()['volume'].sum()),
+            'personal_records': len(self.personal_records()),
+            'best_e1rm': self.estimated_1rm().head(5).round(1).to_dict(),
+            **self.streaks(),
+        }
+
+
+class AnalyticsCache:
+    """Per-user UserAnalytics kept across sessions (LRU), refreshed incrementally on every get()."""
+
+    def __init__(self, max_users=256, max_age=600.0):
+        self.max_users = max_users
+        self.max_age = max_age
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'full_loads': 0, 'incremental_loads': 0, 'rows_loaded': 0}
+
+    def get(self, user_id):
+        """Returns the user's UserAnalytics, fetching only workouts logged since the last call."""
+        with self._lock:
+            analytics = self._users.get(user_id)
+            if analytics is None or time.monotonic() - analytics.loaded_at > self.max_age:
+                analytics = self._users[user_id] = UserAnalytics(user_id)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        with analytics.lock:
+            full = analytics.last_workout_id == 0
+            log = get_training_log(user_id, analytics.last_workout_id)
+            if log is not None and analytics.extend(log):
+                with self._lock:
+                    self._stats['full_loads' if full else 'incremental_loads'] += 1
+                    self._stats['rows_loaded'] += len(log['workout_id'])
+        return analytics
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, users=len(self._users))
+
+
+_cache = AnalyticsCache()
+
+
+def get_user_analytics(user_id):
+    """Shared entry point used by the frontend."""
+    return _cache.get(user_id)
+
+
+def get_analytics_cache_stats():
+    return _cache.stats()
+
+
+# --- Benchmark ---
+
+def synthetic_log(years=10, workouts_per_week=4, exercises_per_workout=5, seed=42):
+    """A columnar training log like get_training_log returns, for `years` of steady training."""
+    rng = random.Random(seed)
+    names = ["Squat", "Bench Press", "Deadlift", "Overhead Press", "Barbell Row", "Pull Up", "Lunge", "Bicep Curl"]
+    log = {column: [] for column in TRAINING_LOG_COLUMNS}
+    day = date.today() - timedelta(days=365 * years)
+    workout_id = 0
+    while day <= date.today():
+        if rng.random() < workouts_per_week / 7:
+            workout_id += 1
+            duration = rng.randint(30, 90)
+            for name in rng.sample(names, exercises_per_workout):
+                reps = rng.randint(1, 12)
+                row = (workout_id, day, duration, name, rng.randint(2, 5), reps, float(rng.randint(20, 200)))
+                for column, value in zip(TRAINING_LOG_COLUMNS, row):
+                    log[column].append(value)
+        day += timedelta(days=1)
+    return log
+
+
+def run_benchmark(years=10, repeats=20):
+    """Times a full load and every analytic, then an incremental refresh with one more workout."""
+    log = synthetic_log(years)
+    timings = {}
+
+    def timed(label, fn):
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[label] = sorted(samples)[len(samples) // 2]
+
+    def full():
+        analytics = UserAnalytics(0)
+        analytics.extend(log)
+        analytics.volume('week')
+        analytics.volume('month', by_exercise=True)
+        analytics.estimated_1rm()
+        analytics.personal_records()
+        analytics.rolling()
+        analytics.streaks()
+        return analytics
+
+    timed("load + all analytics", full)
+    analytics = full()
+    last = max(log['workout_id'])
+    extra = {column: [] for column in TRAINING_LOG_COLUMNS}
+    for column, value in zip(TRAINING_LOG_COLUMNS, (last + 1, date.today(), 45, "Squat", 5, 5, 150.0)):
+        extra[column].append(value)
+
+    def incremental():
+        copy = UserAnalytics(0)
+        copy.frame, copy.last_workout_id = analytics.frame, analytics.last_workout_id
+        copy.extend(extra)
+        copy.volume('week')
+        copy.personal_records()
+        copy.streaks()
+
+    timed("incremental refresh (1 workout)", incremental)
+    return len(log['workout_id']), timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-user training analytics.")
+    parser.add_argument("--user", type=int, help="print this user's analytics summary")
+    parser.add_argument("--benchmark", action="store_true", help="time the analytics on a synthetic history")
+    parser.add_argument("--years", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        rows, timings = run_benchmark(args.years)
+        print(f"{args.years}-year synthetic history: {rows} exercise rows")
+        for label, ms in timings.items():
+            print(f"  {label:<36}{ms:>9.2f} ms (median)")
+        return 0
+    if args.user is None:
+        parser.error("give --user or --benchmark")
+    for key, value in get_user_analytics(args.user).summary().items():
+        print(f"{key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+asyncio API over backend_fitness for async servers (e.g. an HTTP layer for mobile clients).
+
+    import async_backend_fitness as api
+    dashboard = await api.get_dashboard(user_id)
+
+Each coroutine runs the matching backend_fitness function on a worker thread, so the
+event loop never blocks on the database. At most one call per pooled connection runs at
+once: further calls wait on an asyncio semaphore instead of occupying a thread while
+they wait for the pool. get_dashboard issues its independent reads concurrently.
+"""
+import asyncio
+import contextvars
+import functools
+import weakref
+
+import backend_fitness as backend
+from leaderboard_fitness import DEFAULT_METRIC
+
+# One semaphore per event loop (asyncio primitives cannot be shared between loops)
+_limiters = weakref.WeakKeyDictionary()
+
+
+def _get_limiter():
+    """Semaphore sized to the pool, rebuilt if configure_pool changed max_size."""
+    loop = asyncio.get_running_loop()
+    size = backend.POOL_CONFIG['max_size']
+    entry = _limiters.get(loop)
+    if entry is None or entry[0] != size:
+        entry = _limiters[loop] = (size, asyncio.Semaphore(size))
+    return entry[1]
+
+
+async def run(fn, *args, **kwargs):
+    """Runs a blocking backend call on a worker thread once a pool connection is free for it."""
+    async with _get_limiter():
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+def _async(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run(fn, *args, **kwargs)
+    return wrapper
+
+
+# --- User Profile ---
+create_user = _async(backend.create_user)
+get_user = _async(backend.get_user)
+get_all_users = _async(backend.get_all_users)
+search_users = _async(backend.search_users)
+update_user = _async(backend.update_user)
+delete_user = _async(backend.delete_user)
+
+# --- Friends ---
+add_friend = _async(backend.add_friend)
+remove_friend = _async(backend.remove_friend)
+get_friends_list = _async(backend.get_friends_list)
+get_friend_ids = _async(backend.get_friend_ids)
+get_mutual_friend_counts = _async(backend.get_mutual_friend_counts)
+suggest_friends = _async(backend.suggest_friends)
+
+# --- Workouts & Exercises ---
+create_workout_with_exercises = _async(backend.create_workout_with_exercises)
+get_all_workouts_for_user = _async(backend.get_all_workouts_for_user)
+get_workouts_page = _async(backend.get_workouts_page)
+get_exercises_for_workout = _async(backend.get_exercises_for_workout)
+get_exercises_for_workouts = _async(backend.get_exercises_for_workouts)
+get_exercises_for_user = _async(backend.get_exercises_for_user)
+
+# --- Goals ---
+create_goal = _async(backend.create_goal)
+get_goals = _async(backend.get_goals)
+update_goal_progress = _async(backend.update_goal_progress)
+delete_goal = _async(backend.delete_goal)
+
+# --- Insights & Leaderboard ---
+get_business_insights = _async(backend.get_business_insights)
+get_leaderboard_data = _async(backend.get_leaderboard_data)
+get_global_rank = _async(backend.get_global_rank)
+get_global_top = _async(backend.get_global_top)
+get_dashboard_snapshot = _async(backend.get_dashboard_snapshot)
+
+
+async def iter_workouts(user_id, start_date=None, end_date=None, chunk_size=1000):
+    """
+    Async generator over backend.iter_workouts, fetching one chunk per worker-thread hop.
+    Every hop runs in the same context, so context variables the generator sets in one
+    step (metrics, shard binding) are still there when a later step resets them.
+    """
+    rows = backend.iter_workouts(user_id, start_date, end_date, chunk_size)
+    context = contextvars.copy_context()
+
+    def next_chunk():
+        return [row for _, row in zip(range(chunk_size), rows)]
+
+    async with _get_limiter():
+        try:
+            while True:
+                chunk = await asyncio.to_thread(context.run, next_chunk)
+                if not chunk:
+                    break
+                for row in chunk:
+                    yield row
+        finally:
+            await asyncio.to_thread(context.run, rows.close)
+
+
+async def get_dashboard(user_id, metric=None):
+    """
+    Everything the landing view needs, fetched concurrently: profile, insights, goals,
+    friends and the leaderboard. Returns a dict; a failed part is None, as in the sync API.
+    """
+    user, insights, goals, friends, leaderboard = await asyncio.gather(
+        get_user(user_id),
+        get_business_insights(user_id),
+        get_goals(user_id),
+        get_friends_list(user_id),
+        get_leaderboard_data(metric or DEFAULT_METRIC, user_id),
+    )
+    return {
+        'user': user,
+        'insights': insights,
+        'goals': goals,
+        'friends': friends,
+        'leaderboard': leaderboard,
+    }
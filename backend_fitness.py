@@ -1,423 +1,1943 @@
-import psycopg2
-from datetime import datetime, date
-
-# Database connection function
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(
-            host="localhost",
-            database="midterm",
-            user="postgres",
-            password="99Mur@ri99"
-        )
-        return conn
-    except psycopg2.Error as e:
-        print(f"Error connecting to database: {e}")
-        return None
-
-# --- User Profile CRUD Operations ---
-
-def create_user(name, email, weight):
-    """Adds a new user to the users table."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "INSERT INTO users (name, email, weight) VALUES (%s, %s, %s) RETURNING user_id;",
-                    (name, email, weight)
-                )
-                user_id = cur.fetchone()[0]
-                conn.commit()
-                return user_id
-        except psycopg2.IntegrityError as e:
-            conn.rollback()
-            print(f"Error: A user with this email already exists. {e}")
-            return None
-        except psycopg2.Error as e:
-            conn.rollback()
-            print(f"Database error: {e}")
-            return None
-        finally:
-            conn.close()
-
-def get_user(user_id):
-    """Retrieves a single user's profile."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                cur.execute("SELECT user_id, name, email, weight FROM users WHERE user_id = %s;", (user_id,))
-                user_data = cur.fetchone()
-                return user_data
-        except psycopg2.Error as e:
-            print(f"Database error: {e}")
-            return None
-        finally:
-            conn.close()
-    return None
-
-def get_all_users():
-    """Retrieves all users from the users table."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                cur.execute("SELECT user_id, name, email, weight FROM users;")
-                users = cur.fetchall()
-                return users
-        except psycopg2.Error as e:
-            print(f"Database error: {e}")
-            return None
-        finally:
-            conn.close()
-    return None
-
-def update_user(user_id, name, email, weight):
-    """Updates an existing user's profile."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE users SET name = %s, email = %s, weight = %s WHERE user_id = %s;",
-                    (name, email, weight, user_id)
-                )
-                conn.commit()
-                return True
-        except psycopg2.IntegrityError as e:
-            conn.rollback()
-            print(f"Error: A user with this email already exists. {e}")
-            return False
-        except psycopg2.Error as e:
-            conn.rollback()
-            print(f"Database error: {e}")
-            return False
-        finally:
-            conn.close()
-
-def delete_user(user_id):
-    """Deletes a user and all their related data (workouts, exercises, goals, friends)."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                # Delete related records first to avoid foreign key constraints
-                cur.execute("DELETE FROM exercises WHERE workout_id IN (SELECT workout_id FROM workouts WHERE user_id = %s);", (user_id,))
-                cur.execute("DELETE FROM workouts WHERE user_id = %s;", (user_id,))
-                cur.execute("DELETE FROM goals WHERE user_id = %s;", (user_id,))
-                cur.execute("DELETE FROM friends WHERE user_id = %s OR friend_id = %s;", (user_id, user_id))
-                cur.execute("DELETE FROM users WHERE user_id = %s;", (user_id,))
-                conn.commit()
-                return True
-        except psycopg2.Error as e:
-            conn.rollback()
-            print(f"Database error: {e}")
-            return False
-        finally:
-            conn.close()
-
-# --- Friends CRUD Operations ---
-
-def add_friend(user_id, friend_id):
-    """Adds a friend connection. Checks for existing connections and prevents self-friending."""
-    conn = get_db_connection()
-    if conn:
-        if user_id == friend_id:
-            return False, "Cannot add yourself as a friend."
-        try:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT 1 FROM friends WHERE (user_id = %s AND friend_id = %s) OR (user_id = %s AND friend_id = %s);",
-                    (user_id, friend_id, friend_id, user_id)
-                )
-                if cur.fetchone():
-                    return False, "Friend connection already exists."
-                
-                # Add a one-way connection. A symmetric connection can be added, but this is a simple approach.
-                cur.execute("INSERT INTO friends (user_id, friend_id) VALUES (%s, %s);", (user_id, friend_id))
-                conn.commit()
-                return True, "Friend added successfully."
-        except psycopg2.Error as e:
-            conn.rollback()
-            print(f"Database error: {e}")
-            return False, f"Database error: {e}"
-        finally:
-            conn.close()
-
-def remove_friend(user_id, friend_id):
-    """Removes a friend connection."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                cur.execute("DELETE FROM friends WHERE (user_id = %s AND friend_id = %s) OR (user_id = %s AND friend_id = %s);",
-                            (user_id, friend_id, friend_id, user_id))
-                conn.commit()
-                return True
-        except psycopg2.Error as e:
-            conn.rollback()
-            print(f"Database error: {e}")
-            return False
-        finally:
-            conn.close()
-
-def get_friends_list(user_id):
-    """Retrieves a list of a user's friends."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT u.user_id, u.name
-                    FROM friends f
-                    JOIN users u ON u.user_id = f.friend_id
-                    WHERE f.user_id = %s
-                    UNION
-                    SELECT u.user_id, u.name
-                    FROM friends f
-                    JOIN users u ON u.user_id = f.user_id
-                    WHERE f.friend_id = %s;
-                """, (user_id, user_id))
-                friends = cur.fetchall()
-                return friends
-        except psycopg2.Error as e:
-            print(f"Database error: {e}")
-            return None
-        finally:
-            conn.close()
-
-# --- Workout & Exercises CRUD Operations ---
-
-def create_workout_with_exercises(user_id, workout_date, duration_minutes, exercises):
-    """Logs a new workout and its associated exercises in a single transaction."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                # Start a transaction to ensure atomicity
-                cur.execute(
-                    "INSERT INTO workouts (user_id, workout_date, duration_minutes) VALUES (%s, %s, %s) RETURNING workout_id;",
-                    (user_id, workout_date, duration_minutes)
-                )
-                workout_id = cur.fetchone()[0]
-
-                for exercise in exercises:
-                    cur.execute(
-                        "INSERT INTO exercises (workout_id, exercise_name, sets, reps, weight) VALUES (%s, %s, %s, %s, %s);",
-                        (workout_id, exercise['name'], exercise['sets'], exercise['reps'], exercise['weight'])
-                    )
-                
-                conn.commit()
-                return True
-        except psycopg2.Error as e:
-            conn.rollback()
-            print(f"Database error: {e}")
-            return False
-        finally:
-            conn.close()
-
-def get_all_workouts_for_user(user_id):
-    """Retrieves all workouts for a specific user."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                cur.execute("SELECT workout_id, workout_date, duration_minutes FROM workouts WHERE user_id = %s ORDER BY workout_date DESC;", (user_id,))
-                workouts = cur.fetchall()
-                return workouts
-        except psycopg2.Error as e:
-            print(f"Database error: {e}")
-            return None
-        finally:
-            conn.close()
-
-def get_exercises_for_workout(workout_id):
-    """Retrieves all exercises for a specific workout."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                cur.execute("SELECT exercise_name, sets, reps, weight FROM exercises WHERE workout_id = %s;", (workout_id,))
-                exercises = cur.fetchall()
-                return exercises
-        except psycopg2.Error as e:
-            print(f"Database error: {e}")
-            return None
-        finally:
-            conn.close()
-
-# --- Goals CRUD Operations ---
-
-def create_goal(user_id, description, target_value):
-    """Creates a new goal for a user."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "INSERT INTO goals (user_id, goal_description, target_value) VALUES (%s, %s, %s);",
-                    (user_id, description, target_value)
-                )
-                conn.commit()
-                return True
-        except psycopg2.Error as e:
-            conn.rollback()
-            print(f"Database error: {e}")
-            return False
-        finally:
-            conn.close()
-
-def get_goals(user_id):
-    """Retrieves all goals for a user."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                cur.execute("SELECT goal_id, goal_description, target_value, progress_value FROM goals WHERE user_id = %s;", (user_id,))
-                goals = cur.fetchall()
-                return goals
-        except psycopg2.Error as e:
-            print(f"Database error: {e}")
-            return None
-        finally:
-            conn.close()
-
-def update_goal_progress(goal_id, new_progress):
-    """Updates the progress of a specific goal."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                cur.execute("UPDATE goals SET progress_value = %s WHERE goal_id = %s;", (new_progress, goal_id))
-                conn.commit()
-                return True
-        except psycopg2.Error as e:
-            conn.rollback()
-            print(f"Database error: {e}")
-            return False
-        finally:
-            conn.close()
-
-def delete_goal(goal_id):
-    """Deletes a goal."""
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                cur.execute("DELETE FROM goals WHERE goal_id = %s;", (goal_id,))
-                conn.commit()
-                return True
-        except psycopg2.Error as e:
-            conn.rollback()
-            print(f"Database error: {e}")
-            return False
-        finally:
-            conn.close()
-
-# --- Business Insights & Leaderboard Queries ---
-
-def get_business_insights(user_id):
-    """
-    Retrieves aggregate business insights for a user.
-    Uses COUNT, SUM, AVG, MIN, MAX.
-    """
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT
-                        COUNT(workout_id) as total_workouts,
-                        COALESCE(SUM(duration_minutes), 0) as total_duration,
-                        COALESCE(AVG(duration_minutes), 0) as avg_duration,
-                        COALESCE(MIN(duration_minutes), 0) as min_duration,
-                        COALESCE(MAX(duration_minutes), 0) as max_duration
-                    FROM workouts
-                    WHERE user_id = %s;
-                """, (user_id,))
-                insights = cur.fetchone()
-                # Use a dictionary for cleaner access
-                return {
-                    'total_workouts': insights[0],
-                    'total_duration': insights[1],
-                    'avg_duration': insights[2],
-                    'min_duration': insights[3],
-                    'max_duration': insights[4]
-                }
-        except psycopg2.Error as e:
-            print(f"Database error: {e}")
-            return None
-        finally:
-            conn.close()
-
-def get_leaderboard_data(metric, user_id):
-    """
-    Retrieves leaderboard data for a user and their friends based on a selected metric.
-    The metric is expected to be a valid SQL column/function to order by.
-    """
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                # Find the user's friends (including the user themselves for ranking)
-                cur.execute("""
-                    SELECT user_id FROM friends WHERE friend_id = %s
-                    UNION
-                    SELECT friend_id FROM friends WHERE user_id = %s
-                    UNION
-                    SELECT %s;
-                """, (user_id, user_id, user_id))
-                friend_ids = [row[0] for row in cur.fetchall()]
-
-                # Handle different metrics for ranking
-                if metric == 'total_workouts_last_30_days':
-                    query = f"""
-                        SELECT u.name, COUNT(w.workout_id) AS metric_value
-                        FROM users u
-                        LEFT JOIN workouts w ON u.user_id = w.user_id AND w.workout_date >= CURRENT_DATE - INTERVAL '30 days'
-                        WHERE u.user_id IN %s
-                        GROUP BY u.name
-                        ORDER BY metric_value DESC, u.name ASC;
-                    """
-                elif metric == 'total_duration_last_30_days':
-                    query = f"""
-                        SELECT u.name, COALESCE(SUM(w.duration_minutes), 0) AS metric_value
-                        FROM users u
-                        LEFT JOIN workouts w ON u.user_id = w.user_id AND w.workout_date >= CURRENT_DATE - INTERVAL '30 days'
-                        WHERE u.user_id IN %s
-                        GROUP BY u.name
-                        ORDER BY metric_value DESC, u.name ASC;
-                    """
-                elif metric == 'avg_duration_all_time':
-                     query = f"""
-                        SELECT u.name, COALESCE(AVG(w.duration_minutes), 0) AS metric_value
-                        FROM users u
-                        LEFT JOIN workouts w ON u.user_id = w.user_id
-                        WHERE u.user_id IN %s
-                        GROUP BY u.name
-                        ORDER BY metric_value DESC, u.name ASC;
-                    """
-                else: # Default to total duration
-                    query = f"""
-                        SELECT u.name, COALESCE(SUM(w.duration_minutes), 0) AS metric_value
-                        FROM users u
-                        LEFT JOIN workouts w ON u.user_id = w.user_id
-                        WHERE u.user_id IN %s
-                        GROUP BY u.name
-                        ORDER BY metric_value DESC, u.name ASC;
-                    """
-                
-                # Use `psycopg2.extras.execute_values` for safe IN clause usage
-                # Note: `psycopg2` can't directly use a list with the %s placeholder for IN.
-                # A common workaround is to format the query or use a custom function.
-                # Here, we will use a simple, but safe, IN clause with a tuple.
-                cur.execute(query, (tuple(friend_ids),))
-                leaderboard_data = cur.fetchall()
-                
-                return leaderboard_data
-        except psycopg2.Error as e:
-            print(f"Database error: {e}")
-            return None
-        finally:
-            conn.close()
\ No newline at end of file
+import functools
+import inspect
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, date, timedelta
+from pool_fitness import ConnectionPool, PoolTimeout
+from replica_fitness import Replica, ReplicaRouter
+from shard_fitness import Shard, ShardMap, ShardMovingError, current as current_shard
+from storage_fitness import create_engine
+from leaderboard_fitness import DEFAULT_METRIC, LEADERBOARD_METRICS, LeaderboardCache, rank
+from graph_fitness import AdjacencyCache, friends_of_friends, load_adjacency, mutual_friend_counts, query_suggestions
+from ranking_fitness import GlobalRankings
+from cache_fitness import ReadCache, cached_read
+from metrics_fitness import Instrumentation, InstrumentedConnection
+
+try:
+    import psycopg2
+except ImportError:  # only required when DB_ENGINE is "postgres"
+    psycopg2 = None
+
+# Storage engine: "postgres" (default) or "sqlite" for embedded/kiosk deployments
+DB_ENGINE = os.environ.get("FITNESS_DB_ENGINE", "postgres")
+
+# Database connection settings (override with environment variables)
+DB_CONFIG = {
+    'host': os.environ.get("FITNESS_DB_HOST", "localhost"),
+    'database': os.environ.get("FITNESS_DB_NAME", "midterm"),
+    'user': os.environ.get("FITNESS_DB_USER", "postgres"),
+    'password': os.environ.get("FITNESS_DB_PASSWORD", "99Mur@ri99"),
+}
+SQLITE_PATH = os.environ.get("FITNESS_SQLITE_PATH", "fitness.db")
+
+# Connection pool settings (override with environment variables or configure_pool)
+POOL_CONFIG = {
+    'min_size': int(os.environ.get("FITNESS_POOL_MIN", 1)),
+    'max_size': int(os.environ.get("FITNESS_POOL_MAX", 10)),
+    'idle_timeout': float(os.environ.get("FITNESS_POOL_IDLE_TIMEOUT", 300)),
+    'checkout_timeout': float(os.environ.get("FITNESS_POOL_TIMEOUT", 30)),
+    'check_interval': float(os.environ.get("FITNESS_POOL_CHECK_INTERVAL", 30)),
+}
+
+# Read replicas, as comma-separated host[:port] entries sharing DB_CONFIG's database and credentials.
+# Read-only functions use a replica within `max_lag` seconds of the primary, except for a user's
+# own reads in the `sticky_seconds` after one of their writes (see replica_fitness)
+REPLICA_CONFIG = {
+    'hosts': [host for host in os.environ.get("FITNESS_DB_REPLICAS", "").split(",") if host],
+    'max_lag': float(os.environ.get("FITNESS_REPLICA_MAX_LAG", 2)),
+    'check_interval': float(os.environ.get("FITNESS_REPLICA_CHECK_INTERVAL", 5)),
+    'sticky_seconds': float(os.environ.get("FITNESS_READ_YOUR_WRITES_SECONDS", 5)),
+    'retry_after': float(os.environ.get("FITNESS_REPLICA_RETRY_AFTER", 30)),
+}
+
+# Shards, as comma-separated name=location entries: host[:port][/database] sharing DB_CONFIG's
+# credentials, or a file path with the SQLite engine. Users are spread over them by consistent
+# hashing; the database DB_CONFIG names holds the directory of where each user lives. Processes
+# reload the directory every `directory_ttl` seconds (see shard_fitness)
+SHARD_CONFIG = {
+    'shards': [entry.split("=", 1) for entry in os.environ.get("FITNESS_SHARDS", "").split(",") if entry],
+    'directory_ttl': float(os.environ.get("FITNESS_SHARD_DIRECTORY_TTL", 5)),
+    'vnodes': int(os.environ.get("FITNESS_SHARD_VNODES", 64)),
+    'workers': int(os.environ.get("FITNESS_SHARD_WORKERS", 8)),
+    'id_block': int(os.environ.get("FITNESS_SHARD_ID_BLOCK", 100)),
+}
+
+# Errors every backend function reports instead of raising, for whichever engine is active
+DB_ERRORS = (sqlite3.Error, PoolTimeout, ShardMovingError) + ((psycopg2.Error,) if psycopg2 else ())
+INTEGRITY_ERRORS = (sqlite3.IntegrityError,) + ((psycopg2.IntegrityError,) if psycopg2 else ())
+
+# Friend sets and per-user leaderboard metrics, shared by all sessions (see leaderboard_fitness)
+LEADERBOARD_CACHE_TTL = float(os.environ.get("FITNESS_LEADERBOARD_CACHE_TTL", 300))
+_leaderboard_cache = LeaderboardCache(ttl=LEADERBOARD_CACHE_TTL)
+# Friend sets for O(degree) graph queries (see graph_fitness); shares the leaderboard's TTL
+_adjacency_cache = AdjacencyCache(ttl=LEADERBOARD_CACHE_TTL)
+# suggest_friends ranks in SQL instead of caching friend sets when more than this many are missing
+SUGGESTION_LOAD_LIMIT = int(os.environ.get("FITNESS_SUGGESTION_LOAD_LIMIT", 256))
+
+# Global rankings over every user (see ranking_fitness). "approximate" mode ranks from a bucketed
+# histogram plus the exact top-K; "exact" also keeps every value sorted. Reads look for new workouts
+# at most every `refresh_interval` seconds and reload everything every `rebuild_interval`.
+RANKING_CONFIG = {
+    'mode': os.environ.get("FITNESS_RANKING_MODE", "approximate"),
+    'top_k': int(os.environ.get("FITNESS_RANKING_TOP_K", 100)),
+    'relative_error': float(os.environ.get("FITNESS_RANKING_RELATIVE_ERROR", 0.01)),
+    'refresh_interval': float(os.environ.get("FITNESS_RANKING_REFRESH_INTERVAL", 5)),
+    'rebuild_interval': float(os.environ.get("FITNESS_RANKING_REBUILD_INTERVAL", 3600)),
+}
+_global_rankings = GlobalRankings(RANKING_CONFIG['top_k'], RANKING_CONFIG['mode'] == "exact",
+                                  RANKING_CONFIG['relative_error'], RANKING_CONFIG['rebuild_interval'])
+
+# Where logged workouts are folded into the summaries and goal progress: "inline", inside the
+# write's own transaction, or "worker", by appending to workout_events for worker_fitness
+AGGREGATION_MODE = os.environ.get("FITNESS_AGGREGATION", "inline")
+
+# Writes re-run their transaction on transient errors (lost connection, serialization failure,
+# deadlock, SQLite busy) up to `attempts` times, with full-jitter exponential backoff
+RETRY_CONFIG = {
+    'attempts': int(os.environ.get("FITNESS_WRITE_ATTEMPTS", 4)),
+    'base_delay': float(os.environ.get("FITNESS_RETRY_BASE_DELAY", 0.05)),
+    'max_delay': float(os.environ.get("FITNESS_RETRY_MAX_DELAY", 1.0)),
+}
+
+# Cross-session cache for read functions; writes below invalidate the tags they touch
+READ_CACHE_TTL = float(os.environ.get("FITNESS_READ_CACHE_TTL", 60))
+READ_CACHE_SIZE = int(os.environ.get("FITNESS_READ_CACHE_SIZE", 2048))
+_read_cache = ReadCache(max_entries=READ_CACHE_SIZE, ttl=READ_CACHE_TTL)
+
+# Per-function latency/query metrics and the slow-query log (see metrics_fitness)
+SLOW_QUERY_MS = float(os.environ.get("FITNESS_SLOW_QUERY_MS", 200))
+_instrumentation = Instrumentation(
+    slow_query_ms=SLOW_QUERY_MS,
+    enabled=os.environ.get("FITNESS_INSTRUMENTATION", "1") != "0",
+)
+instrumented = _instrumentation.instrumented
+
+# The engine and pool live at module level so every Streamlit session in the process shares them.
+_engine = None
+_pool = None
+_router = None
+_router_configured = False
+_shard_map = None
+_shards_configured = False
+_pool_lock = threading.Lock()
+
+def get_engine():
+    """Returns the active storage engine, creating it from DB_ENGINE on first use."""
+    global _engine
+    if _engine is None:
+        with _pool_lock:
+            if _engine is None:
+                if DB_ENGINE == "sqlite":
+                    _engine = create_engine("sqlite", path=SQLITE_PATH)
+                else:
+                    _engine = create_engine("postgres", **DB_CONFIG)
+    return _engine
+
+def configure_engine(engine):
+    """Switches the backend to another storage engine (see storage_fitness) and resets the pool."""
+    global _engine, _pool
+    with _pool_lock:
+        _engine, old_pool = engine, _pool
+        _pool = None
+    if old_pool is not None:
+        old_pool.closeall()
+
+def get_pool():
+    """Returns the shared connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        engine = get_engine()
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    engine.connect, check=engine.check, reset=engine.reset, **POOL_CONFIG
+                )
+    return _pool
+
+def configure_pool(**settings):
+    """Updates pool settings (min_size, max_size, idle_timeout, ...) and replaces the shared pool."""
+    global _pool
+    with _pool_lock:
+        POOL_CONFIG.update(settings)
+        old_pool, _pool = _pool, None
+    if old_pool is not None:
+        old_pool.closeall()
+
+def get_pool_stats():
+    """Returns checkout/wait counters for the shared pool."""
+    return get_pool().stats()
+
+def _replica_engine(host):
+    name, _, port = host.partition(":")
+    return create_engine("postgres", **dict(DB_CONFIG, host=name, **({'port': int(port)} if port else {})))
+
+def get_router():
+    """Returns the read-replica router built from REPLICA_CONFIG, or None without replicas."""
+    global _router, _router_configured
+    if not _router_configured:
+        with _pool_lock:
+            if not _router_configured:
+                if REPLICA_CONFIG['hosts'] and DB_ENGINE == "postgres":
+                    _router = _make_router([(host, _replica_engine(host)) for host in REPLICA_CONFIG['hosts']])
+                _router_configured = True
+    return _router
+
+def _make_router(replicas):
+    settings = {k: v for k, v in REPLICA_CONFIG.items() if k != 'hosts'}
+    return ReplicaRouter([Replica(name, engine, POOL_CONFIG) for name, engine in replicas], errors=DB_ERRORS, **settings)
+
+def configure_replicas(replicas=None, **settings):
+    """
+    Routes reads to `replicas`, given as (name, engine) pairs, e.g. a second local Postgres
+    streaming from the primary; None or [] sends everything to the primary. Keyword settings
+    update REPLICA_CONFIG (max_lag, check_interval, sticky_seconds, retry_after).
+    """
+    global _router, _router_configured
+    REPLICA_CONFIG.update(settings)
+    with _pool_lock:
+        old_router = _router
+        _router = _make_router(replicas) if replicas else None
+        _router_configured = True
+    if old_router is not None:
+        old_router.closeall()
+
+def get_replica_stats():
+    """Returns routing counters and per-replica lag, health and pool stats, or None without replicas."""
+    router = get_router()
+    return router.stats() if router else None
+
+def _mark_written(*user_ids):
+    """Keeps these users' own reads on the primary for a moment after their write commits."""
+    if _router is not None:
+        _router.mark_write(*user_ids)
+
+def _shard_engine(location):
+    if DB_ENGINE == "sqlite":
+        return create_engine("sqlite", path=location)
+    address, _, database = location.partition("/")
+    host, _, port = address.partition(":")
+    return create_engine("postgres", **dict(DB_CONFIG, host=host, **({'port': int(port)} if port else {}),
+                                            **({'database': database} if database else {})))
+
+def get_shard_map():
+    """Returns the shard map built from SHARD_CONFIG, or None for a single-database deployment."""
+    global _shard_map, _shards_configured
+    if not _shards_configured:
+        directory = Shard("directory", get_engine(), pool=get_pool()) if SHARD_CONFIG['shards'] else None
+        with _pool_lock:
+            if not _shards_configured:
+                if directory is not None:
+                    _shard_map = _make_shard_map(
+                        [(name, _shard_engine(location)) for name, location in SHARD_CONFIG['shards']], directory
+                    )
+                _shards_configured = True
+    return _shard_map
+
+def _make_shard_map(shards, directory):
+    settings = {k: v for k, v in SHARD_CONFIG.items() if k != 'shards'}
+    return ShardMap([Shard(name, engine, POOL_CONFIG) for name, engine in shards], directory, **settings)
+
+def configure_shards(shards=None, **settings):
+    """
+    Spreads users over `shards`, given as (name, engine) pairs, e.g. several local SQLite files,
+    with the current engine's database as the directory; None or [] goes back to one database.
+    Call after configure_engine/configure_pool. Keyword settings update SHARD_CONFIG
+    (directory_ttl, vnodes, workers, id_block).
+    """
+    global _shard_map, _shards_configured
+    SHARD_CONFIG.update(settings)
+    directory = Shard("directory", get_engine(), pool=get_pool()) if shards else None
+    with _pool_lock:
+        old_map = _shard_map
+        _shard_map = _make_shard_map(shards, directory) if shards else None
+        _shards_configured = True
+    if old_map is not None:
+        old_map.closeall()
+
+def get_shard_stats():
+    """Returns directory and scatter-gather counters and per-shard pool stats, or None when not sharded."""
+    shard_map = get_shard_map()
+    return shard_map.stats() if shard_map else None
+
+def _user_shard(user_id):
+    """Binds the block to `user_id`'s shard when sharded (see shard_fitness); does nothing otherwise."""
+    shard_map = get_shard_map()
+    return shard_map.using_user(user_id) if shard_map is not None else nullcontext()
+
+def _bound_steps(shard_map, shard, writable, steps):
+    """Advances the generator `steps` bound to `shard`, without binding the caller's code between items."""
+    try:
+        while True:
+            with shard_map.using(shard, writable):
+                try:
+                    item = next(steps)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        steps.close()
+
+def on_user_shard(fn):
+    """
+    Runs `fn`, whose first argument is a user id, on that user's shard when the backend is
+    sharded. Generators are bound one step at a time; a generator given user_id None (every
+    user) runs on each shard in turn.
+    """
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def generator(user_id, *args, **kwargs):
+            shard_map = get_shard_map()
+            if shard_map is None:
+                yield from fn(user_id, *args, **kwargs)
+            elif user_id is None:
+                shard_map.refresh()
+                for name in sorted(shard_map.states):
+                    yield from _bound_steps(shard_map, shard_map.shards[name], True, fn(None, *args, **kwargs))
+            else:
+                shard, moving = shard_map.locate(user_id)
+                yield from _bound_steps(shard_map, shard, not moving, fn(user_id, *args, **kwargs))
+        return generator
+
+    @functools.wraps(fn)
+    def wrapper(user_id, *args, **kwargs):
+        with _user_shard(user_id):
+            return fn(user_id, *args, **kwargs)
+    return wrapper
+
+def on_owner_shard(owner_sql):
+    """
+    For functions keyed by a row id (a goal's): when sharded, asks every shard for the row's
+    owner with `owner_sql` and runs the function on the owner's shard, so a user being moved
+    cannot be written to. Unknown ids run on no particular shard and match nothing.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(row_id, *args, **kwargs):
+            shard_map = get_shard_map()
+            if shard_map is None:
+                return fn(row_id, *args, **kwargs)
+            try:
+                owners = [row[0] for part in _every_shard(lambda cur: _fetch(cur, owner_sql, (row_id,))) for row in part]
+            except DB_ERRORS as e:
+                print(f"Database error: {e}")
+                return False
+            with _user_shard(owners[0]) if owners else nullcontext():
+                return fn(row_id, *args, **kwargs)
+        return wrapper
+    return decorate
+
+def _fetch(cur, sql, params):
+    cur.execute(sql, params)
+    return cur.fetchall()
+
+def _by_shard(user_ids, query, write=False):
+    """
+    Runs query(cur, ids) for `user_ids` and returns the results as a list: one call on one
+    connection, or when sharded one call per shard holding some of them, in parallel, each
+    with the ids on that shard. write=True commits, and refuses users being moved.
+    """
+    user_ids = list(user_ids)
+    shard_map = get_shard_map()
+
+    def run(ids):
+        with db_cursor(commit=write, read_only=not write, user_id=ids) as cur:
+            return query(cur, ids)
+
+    if shard_map is None:
+        return [run(user_ids)]
+    return shard_map.scatter([(shard, functools.partial(run, ids))
+                              for shard, ids in shard_map.group(user_ids, write).items()])
+
+def _every_shard(query, commit=False):
+    """Runs query(cur) on the database, or on every shard in parallel; returns the results as a list."""
+    def run(shard=None):
+        with db_cursor(commit=commit, read_only=not commit) as cur:
+            return query(cur)
+
+    shard_map = get_shard_map()
+    if shard_map is None:
+        return [run()]
+    return list(shard_map.every_shard(run).values())
+
+def on_each_database(fn):
+    """
+    Calls fn() on the database or, when sharded, on each registered shard in turn, bound to it
+    (ShardMap.using). For the maintenance tools, which batch their own transactions per
+    database. Returns the results as a list.
+    """
+    shard_map = get_shard_map()
+    if shard_map is None:
+        return [fn()]
+    shard_map.refresh()
+    results = []
+    for name in sorted(shard_map.states):
+        with shard_map.using(shard_map.shards[name]):
+            results.append(fn())
+    return results
+
+@contextmanager
+def db_connection(read_only=False, user_id=None):
+    """
+    Checks a connection out of the pool for the duration of the block.
+    Uncommitted work is rolled back when the connection is returned.
+    With read_only=True the connection may come from a read replica (see replica_fitness);
+    `user_id` (an id or a list of ids) names the users whose own recent writes the read must see.
+    Inside ShardMap.using the connection comes from that shard's pool instead.
+    """
+    bound = current_shard()
+    if bound is not None and not (read_only or bound[1]):
+        raise ShardMovingError("This user is moving to another shard; try again shortly.")
+    router = get_router() if read_only and bound is None else None
+    replica = router.route(user_id) if router else None
+    conn = None
+    if replica is not None:
+        engine, pool = replica.engine, replica.pool
+        start = time.perf_counter()
+        try:
+            conn = pool.getconn()
+        except DB_ERRORS:
+            # Unreachable replica: skip it for a while and use the primary
+            router.mark_failed(replica)
+            replica = None
+    if conn is None:
+        engine, pool = (bound[0].engine, bound[0].pool) if bound is not None else (get_engine(), get_pool())
+        start = time.perf_counter()
+        try:
+            conn = pool.getconn()
+        except PoolTimeout:
+            _instrumentation.record_error()
+            raise
+    _instrumentation.record_connect(time.perf_counter() - start)
+    try:
+        yield InstrumentedConnection(conn, _instrumentation) if _instrumentation.enabled else conn
+    except Exception as e:
+        _instrumentation.record_error()
+        if replica is not None and isinstance(e, DB_ERRORS) and engine.is_transient(e):
+            router.mark_failed(replica)
+        broken = engine.is_closed(conn)
+        if not broken:
+            try:
+                conn.rollback()
+            except DB_ERRORS:
+                broken = True
+        pool.putconn(conn, discard=broken)
+        raise
+    else:
+        pool.putconn(conn)
+
+def get_read_cache_stats():
+    """Returns hit/miss counters for the read cache."""
+    return _read_cache.stats()
+
+def invalidate_read_cache(*tags):
+    """Drops cached reads tagged with any of `tags`, e.g. ("workouts", user_id)."""
+    _read_cache.invalidate(*tags)
+
+def clear_read_cache():
+    _read_cache.clear()
+
+def configure_read_cache(ttl=None, max_entries=None):
+    """Changes the read cache TTL/size at runtime; max_entries=0 disables caching."""
+    if ttl is not None:
+        _read_cache.ttl = ttl
+    if max_entries is not None:
+        _read_cache.max_entries = max_entries
+    _read_cache.clear()
+
+@contextmanager
+def db_cursor(commit=False, read_only=False, user_id=None):
+    """
+    Yields a cursor on a pooled connection, committing on success when commit=True.
+    read_only and user_id are passed to db_connection to allow a read replica.
+    """
+    with db_connection(read_only, user_id) as conn:
+        with conn.cursor() as cur:
+            yield cur
+        if commit:
+            conn.commit()
+
+def with_retries(fn, *args, **kwargs):
+    """
+    Calls fn, which must run one whole transaction, and calls it again when it fails with an
+    error the engine reports as transient. Only for idempotent work: a commit whose outcome
+    was lost with the connection is re-run, so non-idempotent writes need an idempotency key.
+    """
+    engine = get_engine()
+    attempts = max(1, RETRY_CONFIG['attempts'])
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn(*args, **kwargs)
+        except DB_ERRORS as e:
+            if attempt == attempts or not engine.is_transient(e):
+                raise
+            _instrumentation.record_retry()
+            delay = min(RETRY_CONFIG['max_delay'], RETRY_CONFIG['base_delay'] * 2 ** (attempt - 1))
+            time.sleep(random.uniform(0, delay))
+
+# --- User Profile CRUD Operations ---
+
+@instrumented
+def create_user(name, email, weight):
+    """
+    Adds a new user to the users table. When sharded, the email is first claimed in the
+    directory, which keeps emails unique across shards, and the user goes to their target shard.
+    """
+    shard_map = get_shard_map()
+    try:
+        if shard_map is None:
+            with db_cursor(commit=True) as cur:
+                cur.execute(
+                    "INSERT INTO users (name, email, weight) VALUES (%s, %s, %s) RETURNING user_id;",
+                    (name, email, weight)
+                )
+                user_id = cur.fetchone()[0]
+        else:
+            user_id = shard_map.next_id("users")
+            if not shard_map.claim_email(email, user_id):
+                print("Error: A user with this email already exists.")
+                return None
+            try:
+                with shard_map.using(shard_map.place_new(user_id)), db_cursor(commit=True) as cur:
+                    cur.execute("INSERT INTO users (user_id, name, email, weight) VALUES (%s, %s, %s, %s);",
+                                (user_id, name, email, weight))
+            except DB_ERRORS:
+                shard_map.forget(user_id)
+                raise
+        _read_cache.invalidate(("users",))
+        _mark_written(user_id)
+        return user_id
+    except INTEGRITY_ERRORS as e:
+        print(f"Error: A user with this email already exists. {e}")
+        return None
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+@instrumented
+@cached_read(_read_cache, tags=lambda args, result: [("user", args[0])])
+@on_user_shard
+def get_user(user_id):
+    """Retrieves a single user's profile."""
+    try:
+        with db_cursor(read_only=True, user_id=user_id) as cur:
+            cur.execute("SELECT user_id, name, email, weight FROM users WHERE user_id = %s;", (user_id,))
+            user_data = cur.fetchone()
+            return user_data
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+@instrumented
+@cached_read(_read_cache, tags=lambda args, result: [("users",)])
+def get_all_users():
+    """Retrieves all users from the users table (from every shard, when sharded)."""
+    try:
+        return [row for part in _every_shard(
+            lambda cur: _fetch(cur, "SELECT user_id, name, email, weight FROM users;", ())
+        ) for row in part]
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+@instrumented
+@cached_read(_read_cache, tags=lambda args, result: [("users",)])
+def search_users(query, limit=10, exclude_user_id=None):
+    """
+    Looks users up by name or email for pickers, returning at most `limit` (user_id, name) rows.
+    Name prefix matches come first, then email prefix matches, then (for three or more
+    characters) name substring matches. Each step walks an index in order and stops after
+    `limit` rows, so the cost does not grow with the number of users. An empty query lists
+    the first users by name. Popular prefixes are served from the read cache.
+    """
+    query = (query or "").strip()
+    try:
+        parts = _every_shard(lambda cur: _search_steps(cur, query, limit, exclude_user_id))
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+    if len(parts) == 1:
+        return [row for _, row in parts[0]]
+    # Each shard found its own best `limit`: merge them step by step, by name within a step
+    users = []
+    found = set()
+    for _, row in sorted((item for part in parts for item in part), key=lambda item: (item[0], item[1][1].casefold())):
+        if row[0] not in found:
+            found.add(row[0])
+            users.append(row)
+    return users[:limit]
+
+def _search_steps(cur, query, limit, exclude_user_id):
+    """search_users on one database, as (step, (user_id, name)) rows in order."""
+    engine = get_engine()
+    exclude = " AND user_id <> %s" if exclude_user_id is not None else ""
+    exclude_params = (exclude_user_id,) if exclude_user_id is not None else ()
+    if not query:
+        cur.execute(f"SELECT user_id, name FROM users WHERE 1 = 1{exclude} ORDER BY name LIMIT %s;",
+                    exclude_params + (limit,))
+        return [(0, row) for row in cur.fetchall()]
+
+    steps = [
+        (engine.prefix_condition("name"), engine.prefix_params(query), engine.prefix_order("name")),
+        (engine.prefix_condition("email"), engine.prefix_params(query), engine.prefix_order("email")),
+    ]
+    if len(query) >= 3:
+        steps.append((engine.contains_condition("name"), engine.contains_params(query), "name"))
+
+    users = []
+    found = set()
+    for step, (condition, params, order) in enumerate(steps):
+        cur.execute(f"""
+            SELECT user_id, name FROM users
+            WHERE {condition}{exclude}
+            ORDER BY {order}
+            LIMIT %s;
+        """, params + exclude_params + (limit,))
+        for row in cur.fetchall():
+            if row[0] not in found:
+                found.add(row[0])
+                users.append((step, row))
+        if len(users) >= limit:
+            break
+    return users[:limit]
+
+@instrumented
+@on_user_shard
+def update_user(user_id, name, email, weight):
+    """Updates an existing user's profile."""
+    shard_map = get_shard_map()
+    try:
+        if shard_map is not None and not shard_map.claim_email(email, user_id):
+            print("Error: A user with this email already exists.")
+            return False
+        with db_cursor(commit=True) as cur:
+            cur.execute(
+                "UPDATE users SET name = %s, email = %s, weight = %s WHERE user_id = %s;",
+                (name, email, weight, user_id)
+            )
+        if shard_map is not None:
+            shard_map.release_emails(user_id, keep=email)
+        _read_cache.invalidate(("users",), ("user", user_id))
+        _mark_written(user_id)
+        _leaderboard_cache.invalidate_user_metrics(user_id)
+        with _global_rankings.lock:
+            _global_rankings.rename(user_id, name)
+        return True
+    except INTEGRITY_ERRORS as e:
+        print(f"Error: A user with this email already exists. {e}")
+        return False
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return False
+
+@instrumented
+@on_user_shard
+def delete_user(user_id):
+    """Deletes a user and all their related data (workouts, exercises, goals, friends)."""
+    def delete():
+        with db_cursor(commit=True) as cur:
+            delete_users(cur, [user_id])
+
+    try:
+        with_retries(delete)
+        forget_deleted_users([user_id])
+        invalidate_deleted_users([user_id])
+        return True
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return False
+
+def delete_users(cur, user_ids):
+    """
+    Deletes many users and everything that references them with one statement per table,
+    using the caller's cursor/transaction (see delete_user and purge_fitness).
+    Children go first, so this works whether or not the schema cascades (the partitioned
+    workouts table has no foreign key from exercises). Returns rows deleted per table.
+    """
+    engine = get_engine()
+    ids = engine.id_list_param(user_ids)
+    deleted = {}
+    statements = [
+        # First, so an aggregation worker holding some of these events finishes before the summaries go
+        ("workout_events", f"DELETE FROM workout_events WHERE {engine.id_list_condition('user_id')};"),
+        ("exercises", f"DELETE FROM exercises WHERE workout_id IN "
+                      f"(SELECT workout_id FROM workouts WHERE {engine.id_list_condition('user_id')});"),
+        ("workouts", f"DELETE FROM workouts WHERE {engine.id_list_condition('user_id')};"),
+        ("goals", f"DELETE FROM goals WHERE {engine.id_list_condition('user_id')};"),
+        ("user_workout_daily", f"DELETE FROM user_workout_daily WHERE {engine.id_list_condition('user_id')};"),
+        ("user_workout_stats", f"DELETE FROM user_workout_stats WHERE {engine.id_list_condition('user_id')};"),
+        ("workout_idempotency", f"DELETE FROM workout_idempotency WHERE {engine.id_list_condition('user_id')};"),
+        # Two index-backed deletes rather than one OR that neither index can serve
+        ("friends", f"DELETE FROM friends WHERE {engine.id_list_condition('user_id')};"),
+        ("friends", f"DELETE FROM friends WHERE {engine.id_list_condition('friend_id')};"),
+        ("users", f"DELETE FROM users WHERE {engine.id_list_condition('user_id')};"),
+    ]
+    for table, sql in statements:
+        cur.execute(sql, (ids,))
+        deleted[table] = deleted.get(table, 0) + max(cur.rowcount, 0)
+    return deleted
+
+def forget_deleted_users(user_ids):
+    """
+    When sharded, removes what other shards and the directory still hold for users deleted with
+    delete_users: friends on other shards keep their side of the friendship there. Does nothing
+    for a single database.
+    """
+    shard_map = get_shard_map()
+    if shard_map is None:
+        return
+    engine = get_engine()
+    ids = engine.id_list_param(list(user_ids))
+    _every_shard(lambda cur: cur.execute(f"DELETE FROM friends WHERE {engine.id_list_condition('friend_id')};",
+                                         (ids,)), commit=True)
+    for user_id in user_ids:
+        shard_map.forget(user_id)
+
+def invalidate_deleted_users(user_ids):
+    """Drops cached reads mentioning deleted users; call after the delete_users transaction commits."""
+    tags = [("users",)]
+    for user_id in user_ids:
+        tags += [("user", user_id), ("friends", user_id), ("goals", user_id), ("workouts", user_id)]
+    _read_cache.invalidate(*tags)
+    _leaderboard_cache.invalidate_users(*user_ids)
+    _adjacency_cache.invalidate_users(*user_ids)
+    with _global_rankings.lock:
+        _global_rankings.remove_users(*user_ids)
+
+# --- Friends CRUD Operations ---
+
+@instrumented
+def add_friend(user_id, friend_id):
+    """
+    Adds a friend connection, stored in both directions. Prevents self-friending and duplicates.
+    When the two users live on different shards each direction is written on its owner's shard;
+    if one of those writes fails, adding the friend again completes the pair.
+    """
+    if user_id == friend_id:
+        return False, "Cannot add yourself as a friend."
+    other = {user_id: friend_id, friend_id: user_id}
+
+    def insert(cur, ids):
+        cur.execute(f"""
+            INSERT INTO friends (user_id, friend_id) VALUES {", ".join(["(%s, %s)"] * len(ids))}
+            ON CONFLICT (user_id, friend_id) DO NOTHING;
+        """, [value for owner in ids for value in (owner, other[owner])])
+        return cur.rowcount
+
+    try:
+        if sum(_by_shard([user_id, friend_id], insert, write=True)) == 0:
+            return False, "Friend connection already exists."
+        _invalidate_friendship(user_id, friend_id)
+        return True, "Friend added successfully."
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return False, f"Database error: {e}"
+
+@instrumented
+def remove_friend(user_id, friend_id):
+    """Removes a friend connection (both directions, on each side's shard when sharded)."""
+    other = {user_id: friend_id, friend_id: user_id}
+
+    def delete(cur, ids):
+        cur.execute(f"DELETE FROM friends WHERE (user_id, friend_id) IN ({', '.join(['(%s, %s)'] * len(ids))});",
+                    [value for owner in ids for value in (owner, other[owner])])
+
+    try:
+        _by_shard([user_id, friend_id], delete, write=True)
+        _invalidate_friendship(user_id, friend_id)
+        return True
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return False
+
+def _invalidate_friendship(user_id, friend_id):
+    _read_cache.invalidate(("friends", user_id), ("friends", friend_id))
+    _mark_written(user_id, friend_id)
+    _leaderboard_cache.invalidate_friendship(user_id, friend_id)
+    _adjacency_cache.invalidate_friendship(user_id, friend_id)
+
+@instrumented
+@cached_read(_read_cache, tags=lambda args, result: [("friends", args[0])] + [("user", row[0]) for row in result])
+def get_friends_list(user_id):
+    """
+    Retrieves a list of a user's friends. When sharded, their ids come from the user's shard
+    and their names from the shards they live on, in parallel.
+    """
+    try:
+        if get_shard_map() is not None:
+            names = _user_names(_friend_sets([user_id])[user_id])
+            return sorted(names.items())
+        with db_cursor(read_only=True, user_id=user_id) as cur:
+            cur.execute("""
+                SELECT u.user_id, u.name
+                FROM friends f
+                JOIN users u ON u.user_id = f.friend_id
+                WHERE f.user_id = %s;
+            """, (user_id,))
+            friends = cur.fetchall()
+            return friends
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+def _friend_sets(user_ids):
+    """Friend sets of `user_ids` from the adjacency cache, loading the missing ones in one query per shard."""
+    adjacency, missing = _adjacency_cache.get_many(user_ids)
+    if missing:
+        loaded = {}
+        for part in _by_shard(missing, lambda cur, ids: load_adjacency(cur, get_engine(), ids)):
+            loaded.update(part)
+        _adjacency_cache.put_many(loaded)
+        adjacency.update(loaded)
+    return adjacency
+
+def _user_names(user_ids):
+    """{user_id: name} for those of `user_ids` that exist, in one query per shard."""
+    engine = get_engine()
+    names = {}
+    if not user_ids:
+        return names
+    for part in _by_shard(user_ids, lambda cur, ids: _fetch(
+        cur, f"SELECT user_id, name FROM users WHERE {engine.id_list_condition('user_id')};", (engine.id_list_param(ids),)
+    )):
+        names.update(part)
+    return names
+
+@instrumented
+def get_friend_ids(user_id):
+    """Returns the ids of a user's friends as a frozenset, from the adjacency cache when hot."""
+    try:
+        return frozenset(_friend_sets([user_id])[user_id])
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+@instrumented
+def get_mutual_friend_counts(user_id, other_ids):
+    """Returns {other_id: number of friends shared with user_id} for each of `other_ids`."""
+    try:
+        adjacency = _friend_sets(list({user_id, *other_ids}))
+        return mutual_friend_counts(adjacency[user_id], adjacency, other_ids)
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+@instrumented
+def suggest_friends(user_id, limit=10):
+    """
+    Suggests friends-of-friends the user is not yet friends with, most mutual friends first.
+    Returns (user_id, name, mutual_count) rows. The ranking is computed in memory from the
+    adjacency cache, loading up to SUGGESTION_LOAD_LIMIT missing friend sets in one batch; for
+    users with more uncached friends than that, one two-hop query does it in the database.
+    When sharded the friend sets and names always come from the shards holding them.
+    """
+    engine = get_engine()
+    try:
+        friends = _friend_sets([user_id])[user_id]
+        if not friends:
+            return []
+        adjacency, missing = _adjacency_cache.get_many(friends)
+        if get_shard_map() is not None:
+            adjacency.update(_friend_sets(missing))
+            ranked = friends_of_friends(user_id, friends, adjacency, limit)
+            names = _user_names([candidate for candidate, _ in ranked])
+            return [(candidate, names[candidate], mutual) for candidate, mutual in ranked if candidate in names]
+        with db_cursor(read_only=True, user_id=user_id) as cur:
+            if len(missing) > SUGGESTION_LOAD_LIMIT:
+                return query_suggestions(cur, user_id, limit)
+            if missing:
+                loaded = load_adjacency(cur, engine, missing)
+                _adjacency_cache.put_many(loaded)
+                adjacency.update(loaded)
+            ranked = friends_of_friends(user_id, friends, adjacency, limit)
+            if not ranked:
+                return []
+            cur.execute(f"SELECT user_id, name FROM users WHERE {engine.id_list_condition('user_id')};",
+                        (engine.id_list_param([candidate for candidate, _ in ranked]),))
+            names = dict(cur.fetchall())
+        return [(candidate, names[candidate], mutual) for candidate, mutual in ranked if candidate in names]
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+# --- Workout & Exercises CRUD Operations ---
+
+@instrumented
+@on_user_shard
+def create_workout_with_exercises(user_id, workout_date, duration_minutes, exercises, idempotency_key=None):
+    """
+    Logs a new workout and its associated exercises in a single transaction.
+    With an idempotency_key (e.g. a UUID minted per form or per ingest message), repeating the
+    call - a double submit, a rerun, a redelivered message - logs nothing new and returns the
+    original workout's id. Transient database errors are retried. Returns the workout id, or False.
+    """
+    try:
+        workout_id, duplicate = with_retries(
+            _log_workout, user_id, workout_date, duration_minutes, exercises, idempotency_key
+        )
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return False
+    if duplicate:
+        _instrumentation.record_dedupe()
+    else:
+        _read_cache.invalidate(("workouts", user_id), ("goals", user_id))
+        _leaderboard_cache.invalidate_user_metrics(user_id)
+        _mark_written(user_id)
+    return workout_id
+
+def allocate_ids(cur, table, id_column, count):
+    """
+    Reserves `count` new ids for `table` for a bulk insert: from the database's own sequence,
+    or when sharded from the directory (ShardMap.next_id), so they are unique on every shard.
+    """
+    shard_map = get_shard_map()
+    if shard_map is None:
+        return get_engine().allocate_ids(cur, table, id_column, count)
+    return [shard_map.next_id(table) for _ in range(count)]
+
+def _insert_returning_id(cur, table, id_column, columns, values):
+    """
+    INSERTs one row and returns its new id. When sharded the id comes from the directory
+    (ShardMap.next_id) rather than the shard's own sequence, so it is unique on every shard.
+    """
+    shard_map = get_shard_map()
+    if shard_map is not None:
+        columns, values = (id_column,) + tuple(columns), (shard_map.next_id(table),) + tuple(values)
+    cur.execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(values))}) "
+                f"RETURNING {id_column};", values)
+    return cur.fetchone()[0]
+
+def _log_workout(user_id, workout_date, duration_minutes, exercises, idempotency_key):
+    """One attempt at create_workout_with_exercises. Returns (workout_id, was_duplicate)."""
+    with db_cursor(commit=True) as cur:
+        if idempotency_key is not None:
+            # Claims the key, or (after waiting for a concurrent claimer to commit) returns the
+            # workout it was claimed for; the no-op update makes RETURNING report the existing row
+            cur.execute("""
+                INSERT INTO workout_idempotency (user_id, idempotency_key) VALUES (%s, %s)
+                ON CONFLICT (user_id, idempotency_key) DO UPDATE SET user_id = excluded.user_id
+                RETURNING workout_id;
+            """, (user_id, idempotency_key))
+            existing = cur.fetchone()[0]
+            if existing is not None:
+                return existing, True
+
+        workout_id = _insert_returning_id(cur, "workouts", "workout_id", ("user_id", "workout_date", "duration_minutes"),
+                                          (user_id, workout_date, duration_minutes))
+
+        # All exercises go in one multi-row INSERT instead of one round trip each
+        if exercises:
+            values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(exercises))
+            params = []
+            for exercise in exercises:
+                params.extend((workout_id, exercise['name'], exercise['sets'], exercise['reps'], exercise['weight']))
+            cur.execute(
+                f"INSERT INTO exercises (workout_id, exercise_name, sets, reps, weight) VALUES {values};",
+                params
+            )
+
+        if AGGREGATION_MODE == "worker":
+            # The aggregation worker folds it into the summaries and goals once this commits
+            cur.execute("INSERT INTO workout_events (user_id, workout_id, created_at) VALUES (%s, %s, %s);",
+                        (user_id, workout_id, datetime.now()))
+        else:
+            # Keep the per-user summaries and tracked goals in step, inside the same transaction
+            record_workout_stats(cur, [(user_id, workout_date, duration_minutes)])
+            update_goals_for_workout(cur, user_id, workout_date, duration_minutes, exercises)
+        if idempotency_key is not None:
+            cur.execute("UPDATE workout_idempotency SET workout_id = %s WHERE user_id = %s AND idempotency_key = %s;",
+                        (workout_id, user_id, idempotency_key))
+    return workout_id, False
+
+@instrumented
+@cached_read(_read_cache, tags=lambda args, result: [("workouts", args[0])])
+@on_user_shard
+def get_all_workouts_for_user(user_id):
+    """Retrieves all workouts for a specific user."""
+    try:
+        with db_cursor(read_only=True, user_id=user_id) as cur:
+            cur.execute("SELECT workout_id, workout_date, duration_minutes FROM workouts WHERE user_id = %s ORDER BY workout_date DESC;", (user_id,))
+            workouts = cur.fetchall()
+            return workouts
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+@instrumented
+@cached_read(_read_cache, tags=lambda args, result: [("workouts", args[0])],
+             cache_if=lambda result: result[0] is not None)
+@on_user_shard
+def get_workouts_page(user_id, limit=25, after=None, start_date=None, end_date=None):
+    """
+    Retrieves one page of a user's workouts, newest first, using keyset pagination on
+    (workout_date, workout_id) so every page costs the same however long the history is.
+    `after` is the cursor returned with the previous page. Returns (workouts, next_cursor);
+    next_cursor is None on the last page.
+    """
+    conditions = ["user_id = %s"]
+    params = [user_id]
+    if start_date is not None:
+        conditions.append("workout_date >= %s")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("workout_date <= %s")
+        params.append(end_date)
+    if after is not None:
+        conditions.append("(workout_date, workout_id) < (%s, %s)")
+        params.extend(after)
+    params.append(limit + 1)
+    try:
+        with db_cursor(read_only=True, user_id=user_id) as cur:
+            cur.execute(f"""
+                SELECT workout_id, workout_date, duration_minutes
+                FROM workouts
+                WHERE {' AND '.join(conditions)}
+                ORDER BY workout_date DESC, workout_id DESC
+                LIMIT %s;
+            """, params)
+            workouts = cur.fetchall()
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None, None
+    # The extra row only tells us whether another page exists
+    if len(workouts) > limit:
+        workouts = workouts[:limit]
+        last_id, last_date, _ = workouts[-1]
+        return workouts, (last_date, last_id)
+    return workouts, None
+
+@instrumented
+@on_user_shard
+def iter_workouts(user_id, start_date=None, end_date=None, chunk_size=1000):
+    """
+    Yields a user's workouts, newest first, through a server-side cursor so only
+    `chunk_size` rows are held in memory at a time. The connection stays checked
+    out until the generator is exhausted or closed.
+    """
+    conditions = ["user_id = %s"]
+    params = [user_id]
+    if start_date is not None:
+        conditions.append("workout_date >= %s")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("workout_date <= %s")
+        params.append(end_date)
+    engine = get_engine()
+    with db_connection(read_only=True, user_id=user_id) as conn:
+        with engine.server_cursor(conn, "workout_history", chunk_size) as cur:
+            cur.execute(f"""
+                SELECT workout_id, workout_date, duration_minutes
+                FROM workouts
+                WHERE {' AND '.join(conditions)}
+                ORDER BY workout_date DESC, workout_id DESC;
+            """, params)
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+
+# Exercises never change once logged, so these entries only expire or get evicted
+@instrumented
+@cached_read(_read_cache)
+def get_exercises_for_workout(workout_id):
+    """Retrieves all exercises for a specific workout (asking every shard, when sharded)."""
+    try:
+        return [row for part in _every_shard(lambda cur: _fetch(
+            cur, "SELECT exercise_name, sets, reps, weight FROM exercises WHERE workout_id = %s;", (workout_id,)
+        )) for row in part]
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+EXERCISE_COLUMNS = ("workout_id", "workout_date", "exercise_name", "sets", "reps", "weight")
+
+def _fetch_exercise_columns(where, params, every_shard=False):
+    """
+    Runs one exercises/workouts join and returns it column-wise (see get_exercises_for_workouts).
+    every_shard=True runs it on every shard and merges the rows back into the same order.
+    """
+    sql = f"""
+        SELECT e.workout_id, w.workout_date, e.exercise_name, e.sets, e.reps, e.weight
+        FROM exercises e
+        JOIN workouts w ON w.workout_id = e.workout_id
+        WHERE {where}
+        ORDER BY w.workout_date DESC, e.workout_id DESC, e.exercise_id;
+    """
+    if every_shard:
+        parts = [part for part in _every_shard(lambda cur: _fetch(cur, sql, params)) if part]
+        rows = [row for part in parts for row in part]
+        if len(parts) > 1:
+            # Stable, so each workout's exercises keep their order
+            rows.sort(key=lambda row: (row[1], row[0]), reverse=True)
+    else:
+        with db_cursor() as cur:
+            rows = _fetch(cur, sql, params)
+    if not rows:
+        return {column: [] for column in EXERCISE_COLUMNS}
+    return {column: list(values) for column, values in zip(EXERCISE_COLUMNS, zip(*rows))}
+
+@instrumented
+@cached_read(_read_cache)
+def get_exercises_for_workouts(workout_ids):
+    """
+    Retrieves the exercises of many workouts in a single query.
+    Returns a dict of equal-length column lists (workout_id, workout_date, exercise_name,
+    sets, reps, weight), ordered so each workout's exercises are contiguous;
+    pd.DataFrame(result) builds a table directly.
+    """
+    engine = get_engine()
+    try:
+        return _fetch_exercise_columns(engine.id_list_condition("e.workout_id"), (engine.id_list_param(workout_ids),),
+                                       every_shard=True)
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+@instrumented
+@cached_read(_read_cache, tags=lambda args, result: [("workouts", args[0])])
+@on_user_shard
+def get_exercises_for_user(user_id, start_date=None, end_date=None):
+    """Retrieves every exercise a user logged, optionally within a date range, in the same columnar form."""
+    conditions = ["w.user_id = %s"]
+    params = [user_id]
+    if start_date is not None:
+        conditions.append("w.workout_date >= %s")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("w.workout_date <= %s")
+        params.append(end_date)
+    try:
+        return _fetch_exercise_columns(" AND ".join(conditions), params)
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+TRAINING_LOG_COLUMNS = ("workout_id", "workout_date", "duration_minutes", "exercise_name", "sets", "reps", "weight")
+
+@instrumented
+@on_user_shard
+def get_training_log(user_id, after_workout_id=0):
+    """
+    Retrieves a user's workouts joined with their exercises in one query, column-wise like
+    get_exercises_for_workouts, for workouts with an id above `after_workout_id`. Workouts
+    without exercises appear once with None exercise fields. Workout ids only grow, so
+    passing the highest id seen so far fetches exactly what was logged since (see analytics_fitness).
+    """
+    try:
+        with db_cursor(read_only=True, user_id=user_id) as cur:
+            cur.execute("""
+                SELECT w.workout_id, w.workout_date, w.duration_minutes, e.exercise_name, e.sets, e.reps, e.weight
+                FROM workouts w
+                LEFT JOIN exercises e ON e.workout_id = w.workout_id
+                WHERE w.user_id = %s AND w.workout_id > %s
+                ORDER BY w.workout_id, e.exercise_id;
+            """, (user_id, after_workout_id))
+            rows = cur.fetchall()
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+    if not rows:
+        return {column: [] for column in TRAINING_LOG_COLUMNS}
+    return {column: list(values) for column, values in zip(TRAINING_LOG_COLUMNS, zip(*rows))}
+
+EXPORT_COLUMNS = ("user_id",) + TRAINING_LOG_COLUMNS
+
+@instrumented
+@on_user_shard
+def iter_training_log(user_id=None, chunk_size=10000):
+    """
+    Yields the training log (workouts joined with their exercises, EXPORT_COLUMNS) of one
+    user, or of every user when user_id is None, as lists of up to `chunk_size` row tuples.
+    Rows stream through a server-side cursor, as in iter_workouts, so memory stays bounded
+    by the chunk size however long the history is.
+    """
+    where = "WHERE w.user_id = %s" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+    engine = get_engine()
+    with db_connection(read_only=True, user_id=user_id) as conn:
+        with engine.server_cursor(conn, "training_log_export", chunk_size) as cur:
+            cur.execute(f"""
+                SELECT w.user_id, w.workout_id, w.workout_date, w.duration_minutes,
+                       e.exercise_name, e.sets, e.reps, e.weight
+                FROM workouts w
+                LEFT JOIN exercises e ON e.workout_id = w.workout_id
+                {where}
+                ORDER BY w.workout_id, e.exercise_id;
+            """, params)
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+# --- Goals CRUD Operations ---
+
+@instrumented
+@on_user_shard
+def create_goal(user_id, description, target_value, goal_type='manual', exercise_name=None):
+    """
+    Creates a new goal for a user. `goal_type` is one of GOAL_TYPES; every type except
+    'manual' tracks its progress from logged workouts, and 'max_weight' needs `exercise_name`.
+    """
+    if goal_type not in GOAL_TYPES:
+        print(f"Error: Unknown goal type {goal_type!r}.")
+        return False
+    if goal_type == 'max_weight' and not (exercise_name or "").strip():
+        print("Error: A max weight goal needs an exercise name.")
+        return False
+    try:
+        with db_cursor(commit=True) as cur:
+            goal_id = _insert_returning_id(
+                cur, "goals", "goal_id", ("user_id", "goal_description", "target_value", "goal_type", "exercise_name"),
+                (user_id, description, target_value, goal_type,
+                 exercise_name.strip() if goal_type == 'max_weight' else None)
+            )
+            if goal_type != 'manual':
+                # Start from what the user has already logged
+                recompute_goal_progress(cur, [goal_id])
+        _read_cache.invalidate(("goals", user_id))
+        _mark_written(user_id)
+        return True
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return False
+
+@instrumented
+@cached_read(_read_cache, tags=lambda args, result: [("goals", args[0])])
+@on_user_shard
+def get_goals(user_id):
+    """
+    Retrieves all goals for a user as (goal_id, description, target, progress, goal_type, exercise_name).
+    Weekly/monthly goals report 0 once their period has ended without a new workout.
+    """
+    try:
+        with db_cursor(read_only=True, user_id=user_id) as cur:
+            cur.execute(f"""
+                SELECT goal_id, goal_description, target_value, {GOAL_PROGRESS}, goal_type, exercise_name
+                FROM goals
+                WHERE user_id = %(user_id)s
+                ORDER BY goal_id;
+            """, dict(_goal_periods(), user_id=user_id))
+            goals = cur.fetchall()
+            return goals
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+@instrumented
+@on_owner_shard("SELECT user_id FROM goals WHERE goal_id = %s;")
+def update_goal_progress(goal_id, new_progress):
+    """
+    Updates the progress of a specific manual goal (tracked goals are kept up to date automatically).
+    Returns False when nothing was updated, i.e. the goal is missing or tracked.
+    """
+    try:
+        with db_cursor(commit=True) as cur:
+            cur.execute("UPDATE goals SET progress_value = %s WHERE goal_id = %s AND goal_type = 'manual' RETURNING user_id;",
+                        (new_progress, goal_id))
+            owner = cur.fetchone()
+        if owner is None:
+            return False
+        _read_cache.invalidate(("goals", owner[0]))
+        _mark_written(owner[0])
+        return True
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return False
+
+@instrumented
+@on_user_shard
+def update_goals_progress(user_id, progress_by_goal):
+    """Saves the progress of several of a user's manual goals, given as {goal_id: progress}, in one transaction."""
+    if not progress_by_goal:
+        return True
+    try:
+        with db_cursor(commit=True) as cur:
+            cur.executemany(
+                "UPDATE goals SET progress_value = %s WHERE goal_id = %s AND user_id = %s AND goal_type = 'manual';",
+                [(progress, goal_id, user_id) for goal_id, progress in progress_by_goal.items()]
+            )
+        _read_cache.invalidate(("goals", user_id))
+        _mark_written(user_id)
+        return True
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return False
+
+@instrumented
+@on_owner_shard("SELECT user_id FROM goals WHERE goal_id = %s;")
+def delete_goal(goal_id):
+    """Deletes a goal."""
+    try:
+        with db_cursor(commit=True) as cur:
+            cur.execute("DELETE FROM goals WHERE goal_id = %s RETURNING user_id;", (goal_id,))
+            owner = cur.fetchone()
+        if owner:
+            _read_cache.invalidate(("goals", owner[0]))
+            _mark_written(owner[0])
+        return True
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return False
+
+# --- Goal Progress Tracking ---
+
+# Goal types offered to users; all but 'manual' are updated from logged workouts
+GOAL_TYPES = {
+    'manual': "Manual (update progress yourself)",
+    'workouts_per_week': "Workouts per week",
+    'minutes_per_month': "Workout minutes per month",
+    'max_weight': "Max weight (kg) for an exercise",
+}
+
+# Progress as shown to users: a weekly/monthly count whose period has passed starts again from 0
+GOAL_PROGRESS = """CASE
+    WHEN goal_type = 'workouts_per_week' AND period_start IS DISTINCT FROM %(week_start)s THEN 0
+    WHEN goal_type = 'minutes_per_month' AND period_start IS DISTINCT FROM %(month_start)s THEN 0
+    ELSE COALESCE(progress_value, 0)
+END"""
+
+def _goal_periods(today=None):
+    """The current week (from Monday) and calendar month, as half-open date ranges."""
+    today = today or date.today()
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1)
+    return {'week_start': week_start, 'week_end': week_start + timedelta(days=7),
+            'month_start': month_start, 'month_end': month_end}
+
+def update_goals_for_workout(cur, user_id, workout_date, duration_minutes, exercises, logged_on=None):
+    """
+    Folds one new workout into the user's tracked goals using the caller's cursor/transaction.
+    Touches only that user's goals of the affected types, so the cost does not depend on history.
+    Backdated workouts outside the week/month the workout was logged in (`logged_on`, default
+    today) leave the periodic goals alone, as does a goal already counting a later period.
+    """
+    if isinstance(workout_date, str):
+        workout_date = date.fromisoformat(workout_date)
+    periods = _goal_periods(logged_on)
+    increments = []
+    if periods['week_start'] <= workout_date < periods['week_end']:
+        increments.append(('workouts_per_week', periods['week_start'], 1))
+    if periods['month_start'] <= workout_date < periods['month_end']:
+        increments.append(('minutes_per_month', periods['month_start'], duration_minutes))
+    for goal_type, period_start, delta in increments:
+        cur.execute("""
+            UPDATE goals SET
+                progress_value = CASE WHEN period_start = %(period)s THEN COALESCE(progress_value, 0) + %(delta)s
+                                      ELSE %(delta)s END,
+                period_start = %(period)s
+            WHERE user_id = %(user_id)s AND goal_type = %(goal_type)s
+              AND (period_start IS NULL OR period_start <= %(period)s);
+        """, {'period': period_start, 'delta': delta, 'user_id': user_id, 'goal_type': goal_type})
+
+    heaviest = {}
+    for exercise in exercises or ():
+        if exercise.get('weight'):
+            name = exercise['name'].strip().lower()
+            heaviest[name] = max(heaviest.get(name, 0), int(exercise['weight']))
+    if heaviest:
+        cur.executemany("""
+            UPDATE goals SET progress_value = %s
+            WHERE user_id = %s AND goal_type = 'max_weight' AND lower(exercise_name) = %s
+              AND (progress_value IS NULL OR progress_value < %s);
+        """, [(weight, user_id, name, weight) for name, weight in heaviest.items()])
+
+def recompute_goal_progress(cur, goal_ids):
+    """
+    Recomputes the progress of the given tracked goals from the summary tables and exercises,
+    with one statement per goal type, using the caller's cursor/transaction. Used for new goals
+    and by goals_fitness for backfills.
+    """
+    engine = get_engine()
+    ids_condition = engine.id_list_condition("goal_id")
+    ids = engine.id_list_param(goal_ids)
+    periods = _goal_periods()
+    for goal_type, value, start, end in (
+        ('workouts_per_week', "SUM(d.workout_count)", periods['week_start'], periods['week_end']),
+        ('minutes_per_month', "SUM(d.duration_sum)", periods['month_start'], periods['month_end']),
+    ):
+        cur.execute(f"""
+            UPDATE goals SET
+                period_start = %s,
+                progress_value = (
+                    SELECT COALESCE({value}, 0) FROM user_workout_daily d
+                    WHERE d.user_id = goals.user_id AND d.workout_date >= %s AND d.workout_date < %s
+                )
+            WHERE goal_type = '{goal_type}' AND {ids_condition};
+        """, (start, start, end, ids))
+
+    # Weights are truncated in Python, exactly as update_goals_for_workout does
+    cur.execute(f"""
+        SELECT g.goal_id, MAX(e.weight)
+        FROM goals g
+        LEFT JOIN workouts w ON w.user_id = g.user_id
+        LEFT JOIN exercises e ON e.workout_id = w.workout_id AND lower(e.exercise_name) = lower(g.exercise_name)
+        WHERE g.goal_type = 'max_weight' AND {engine.id_list_condition("g.goal_id")}
+        GROUP BY g.goal_id;
+    """, (ids,))
+    heaviest = [(int(weight or 0), goal_id) for goal_id, weight in cur.fetchall()]
+    if heaviest:
+        cur.executemany("UPDATE goals SET progress_value = %s WHERE goal_id = %s;", heaviest)
+
+# --- Workout Summary Maintenance ---
+
+def record_workout_stats(cur, workouts):
+    """
+    Folds newly inserted workouts, given as (user_id, workout_date, duration_minutes),
+    into user_workout_stats and user_workout_daily using the caller's cursor/transaction.
+    """
+    per_user = {}
+    per_day = {}
+    for user_id, workout_date, duration in workouts:
+        count, total, sumsq, low, high = per_user.get(user_id, (0, 0, 0, duration, duration))
+        per_user[user_id] = (count + 1, total + duration, sumsq + duration * duration,
+                             min(low, duration), max(high, duration))
+        day_count, day_total = per_day.get((user_id, workout_date), (0, 0))
+        per_day[(user_id, workout_date)] = (day_count + 1, day_total + duration)
+
+    cur.executemany("""
+        INSERT INTO user_workout_stats (user_id, workout_count, duration_sum, duration_sumsq, duration_min, duration_max)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (user_id) DO UPDATE SET
+            workout_count = user_workout_stats.workout_count + excluded.workout_count,
+            duration_sum = user_workout_stats.duration_sum + excluded.duration_sum,
+            duration_sumsq = user_workout_stats.duration_sumsq + excluded.duration_sumsq,
+            duration_min = CASE WHEN user_workout_stats.duration_min IS NULL OR excluded.duration_min < user_workout_stats.duration_min
+                                THEN excluded.duration_min ELSE user_workout_stats.duration_min END,
+            duration_max = CASE WHEN user_workout_stats.duration_max IS NULL OR excluded.duration_max > user_workout_stats.duration_max
+                                THEN excluded.duration_max ELSE user_workout_stats.duration_max END;
+    """, [(user_id,) + values for user_id, values in per_user.items()])
+    cur.executemany("""
+        INSERT INTO user_workout_daily (user_id, workout_date, workout_count, duration_sum)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (user_id, workout_date) DO UPDATE SET
+            workout_count = user_workout_daily.workout_count + excluded.workout_count,
+            duration_sum = user_workout_daily.duration_sum + excluded.duration_sum;
+    """, [key + values for key, values in per_day.items()])
+
+def apply_workout_events(cur, workout_ids, logged_on=None):
+    """
+    Folds logged workouts into the summaries and tracked goals using the caller's cursor/transaction,
+    as _log_workout does inline; the aggregation worker's half of AGGREGATION_MODE "worker".
+    `logged_on` maps workout ids to the day each was logged, so weekly and monthly goals count
+    it toward the period it was logged in however late the worker gets to it (default today).
+    Workouts deleted since they were logged are skipped. Returns the ids of the users affected.
+    """
+    logged_on = logged_on or {}
+    engine = get_engine()
+    cur.execute(f"""
+        SELECT w.workout_id, w.user_id, w.workout_date, w.duration_minutes, e.exercise_name, e.weight
+        FROM workouts w
+        LEFT JOIN exercises e ON e.workout_id = w.workout_id
+        WHERE {engine.id_list_condition('w.workout_id')}
+        ORDER BY w.workout_id;
+    """, (engine.id_list_param(workout_ids),))
+    workouts = {}
+    for workout_id, user_id, workout_date, duration, exercise_name, weight in cur.fetchall():
+        workout = workouts.setdefault(workout_id, (user_id, workout_date, duration, []))
+        if exercise_name is not None:
+            workout[3].append({'name': exercise_name, 'weight': weight})
+    if workouts:
+        record_workout_stats(cur, [workout[:3] for workout in workouts.values()])
+        for workout_id, (user_id, workout_date, duration, exercises) in workouts.items():
+            update_goals_for_workout(cur, user_id, workout_date, duration, exercises, logged_on.get(workout_id))
+    return {workout[0] for workout in workouts.values()}
+
+def invalidate_aggregates(user_ids):
+    """Drops cached reads built from these users' summaries and goals, after the worker updated them."""
+    _read_cache.invalidate(*[tag for user_id in user_ids for tag in (("workouts", user_id), ("goals", user_id))])
+    for user_id in user_ids:
+        _leaderboard_cache.invalidate_user_metrics(user_id)
+
+# --- Business Insights & Leaderboard Queries ---
+
+@instrumented
+@cached_read(_read_cache, tags=lambda args, result: [("workouts", args[0])])
+@on_user_shard
+def get_business_insights(user_id):
+    """
+    Retrieves aggregate business insights for a user.
+    Reads the COUNT/SUM/MIN/MAX kept in user_workout_stats and the rolling
+    30-day totals from user_workout_daily instead of scanning workouts.
+    """
+    since = date.today() - timedelta(days=30)
+    try:
+        with db_cursor(read_only=True, user_id=user_id) as cur:
+            cur.execute("""
+                SELECT
+                    COALESCE(s.workout_count, 0),
+                    COALESCE(s.duration_sum, 0),
+                    COALESCE(s.duration_sumsq, 0),
+                    COALESCE(s.duration_min, 0),
+                    COALESCE(s.duration_max, 0),
+                    recent.workout_count,
+                    recent.duration_sum
+                FROM (
+                    SELECT COALESCE(SUM(workout_count), 0) AS workout_count,
+                           COALESCE(SUM(duration_sum), 0) AS duration_sum
+                    FROM user_workout_daily
+                    WHERE user_id = %s AND workout_date >= %s
+                ) recent
+                LEFT JOIN user_workout_stats s ON s.user_id = %s;
+            """, (user_id, since, user_id))
+            return _insights_from_summary(cur.fetchone())
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+def _insights_from_summary(row):
+    """Builds the insights dict from (count, sum, sumsq, min, max, recent_count, recent_sum) summary values."""
+    # SUMs over BIGINT come back as Decimal on Postgres
+    count, total, sumsq, low, high, recent_count, recent_total = (int(v or 0) for v in row)
+    avg = total / count if count else 0
+    variance = max(sumsq / count - avg * avg, 0) if count else 0
+    # Use a dictionary for cleaner access
+    return {
+        'total_workouts': count,
+        'total_duration': total,
+        'avg_duration': avg,
+        'min_duration': low,
+        'max_duration': high,
+        'stddev_duration': variance ** 0.5,
+        'workouts_last_30_days': recent_count,
+        'duration_last_30_days': recent_total
+    }
+
+def _query_member_metrics(cur, member_filter, params):
+    """
+    Loads (user_id, name, workouts_30d, duration_30d, avg_duration, total_duration)
+    for the users matched by `member_filter` from the summary tables in one query.
+    `member_filter` is a condition on a user_id column, formatted as {column}.
+    """
+    since = date.today() - timedelta(days=30)
+    cur.execute(f"""
+        SELECT u.user_id, u.name,
+               COALESCE(recent.workout_count, 0), COALESCE(recent.duration_sum, 0),
+               COALESCE(s.workout_count, 0), COALESCE(s.duration_sum, 0)
+        FROM users u
+        LEFT JOIN user_workout_stats s ON s.user_id = u.user_id
+        LEFT JOIN (
+            SELECT user_id, SUM(workout_count) AS workout_count, SUM(duration_sum) AS duration_sum
+            FROM user_workout_daily
+            WHERE workout_date >= %s AND {member_filter.format(column='user_id')}
+            GROUP BY user_id
+        ) recent ON recent.user_id = u.user_id
+        WHERE {member_filter.format(column='u.user_id')};
+    """, (since,) + params + params)
+    metrics = {}
+    for user_id, name, recent_count, recent_total, count, total in cur.fetchall():
+        count, total = int(count), int(total)
+        metrics[user_id] = (name, int(recent_count), int(recent_total), total / count if count else 0, total)
+    return metrics
+
+def _load_member_metrics(cur, member_filter, params):
+    """_query_member_metrics, also filling the leaderboard's metric cache."""
+    metrics = _query_member_metrics(cur, member_filter, params)
+    for user_id, user_metrics in metrics.items():
+        _leaderboard_cache.put_metrics(user_id, user_metrics)
+    return metrics
+
+def _member_metrics(user_ids):
+    """_load_member_metrics for `user_ids`, in one query per shard holding some of them."""
+    engine = get_engine()
+    metrics = {}
+    # One array/JSON parameter instead of an IN tuple, however many friends there are
+    for part in _by_shard(user_ids, lambda cur, ids: _load_member_metrics(
+        cur, engine.id_list_condition("{column}"), (engine.id_list_param(ids),)
+    )):
+        metrics.update(part)
+    return metrics
+
+@instrumented
+def get_leaderboard_data(metric, user_id):
+    """
+    Retrieves leaderboard data for a user and their friends based on a selected metric.
+    Supported metrics are listed in leaderboard_fitness.LEADERBOARD_METRICS; anything else ranks by total duration.
+    Friend sets and per-user metrics are cached in memory, so switching metrics or rerunning
+    the page needs no query; a cold cache costs a single query against the summary tables.
+    When sharded, the friends' metrics are gathered from their shards in parallel.
+    """
+    try:
+        members = _leaderboard_cache.get_friend_set(user_id)
+        if members is None and get_shard_map() is not None:
+            members = set(_friend_sets([user_id])[user_id]) | {user_id}
+            metrics = _member_metrics(members)
+            _leaderboard_cache.put_friend_set(user_id, metrics)
+        elif members is None:
+            # Resolve the user's friends (including the user themselves for ranking) in the same query
+            with db_cursor(read_only=True, user_id=user_id) as cur:
+                metrics = _load_member_metrics(cur, """{column} IN (
+                    SELECT friend_id FROM friends WHERE user_id = %s
+                    UNION ALL
+                    SELECT %s
+                )""", (user_id, user_id))
+            _leaderboard_cache.put_friend_set(user_id, metrics)
+        else:
+            metrics, missing = _leaderboard_cache.get_metrics(members)
+            if missing:
+                metrics.update(_member_metrics(missing))
+        return rank(metrics, metric)
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+@instrumented
+@on_user_shard
+def get_dashboard_snapshot(user_id, top_n=5):
+    """
+    Everything the landing view shows in a single query: the profile, the insight aggregates,
+    active goals (progress below target), the friend count and the top `top_n` of the
+    leaderboard by total duration. Each part comes back as tagged rows of one UNION ALL.
+    Returns a dict with 'user', 'insights', 'goals', 'friends_count' and 'leaderboard',
+    or None if the user does not exist or the query fails.
+    Not read-cached: the leaderboard part changes whenever any friend logs a workout.
+    When sharded the query runs on the user's shard, and the leaderboard part, whose friends
+    may live elsewhere, comes from get_leaderboard_data instead.
+    """
+    since = date.today() - timedelta(days=30)
+    try:
+        with db_cursor(read_only=True, user_id=user_id) as cur:
+            cur.execute(f"""
+                WITH members AS (
+                    SELECT friend_id AS user_id FROM friends WHERE user_id = %(user_id)s
+                ),
+                recent AS (
+                    SELECT COALESCE(SUM(workout_count), 0) AS workout_count,
+                           COALESCE(SUM(duration_sum), 0) AS duration_sum
+                    FROM user_workout_daily
+                    WHERE user_id = %(user_id)s AND workout_date >= %(since)s
+                ),
+                board AS (
+                    SELECT u.name, COALESCE(s.duration_sum, 0) AS total
+                    FROM users u
+                    LEFT JOIN user_workout_stats s ON s.user_id = u.user_id
+                    WHERE u.user_id IN (SELECT user_id FROM members) OR u.user_id = %(user_id)s
+                    ORDER BY total DESC, u.name
+                    LIMIT %(top_n)s
+                )
+                SELECT 'user', user_id, name, email, weight, NULL, NULL, NULL, NULL, NULL, NULL
+                FROM users WHERE user_id = %(user_id)s
+                UNION ALL
+                SELECT 'stats', NULL, NULL, NULL, s.workout_count, s.duration_sum, s.duration_sumsq,
+                       s.duration_min, s.duration_max, recent.workout_count, recent.duration_sum
+                FROM recent LEFT JOIN user_workout_stats s ON s.user_id = %(user_id)s
+                UNION ALL
+                SELECT 'goal', goal_id, goal_description, NULL, target_value, progress, NULL, NULL, NULL, NULL, NULL
+                FROM (
+                    SELECT goal_id, goal_description, target_value, {GOAL_PROGRESS} AS progress
+                    FROM goals WHERE user_id = %(user_id)s
+                ) g
+                WHERE target_value IS NULL OR progress < target_value
+                UNION ALL
+                SELECT 'friends', COUNT(*), NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL FROM members
+                UNION ALL
+                SELECT 'board', NULL, name, NULL, total, NULL, NULL, NULL, NULL, NULL, NULL FROM board;
+            """, dict(_goal_periods(), user_id=user_id, since=since, top_n=top_n))
+            rows = cur.fetchall()
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+
+    snapshot = {'user': None, 'insights': None, 'goals': [], 'friends_count': 0, 'leaderboard': []}
+    for kind, row_id, text1, text2, *values in rows:
+        if kind == 'user':
+            snapshot['user'] = (row_id, text1, text2, values[0])
+        elif kind == 'stats':
+            snapshot['insights'] = _insights_from_summary(values[:7])
+        elif kind == 'goal':
+            snapshot['goals'].append((row_id, text1, values[0], values[1]))
+        elif kind == 'friends':
+            snapshot['friends_count'] = int(row_id)
+        elif kind == 'board':
+            snapshot['leaderboard'].append((text1, int(values[0])))
+    if snapshot['user'] is None:
+        return None
+    # UNION ALL does not preserve the CTE's order
+    snapshot['goals'].sort()
+    snapshot['leaderboard'].sort(key=lambda row: (-row[1], row[0]))
+    if get_shard_map() is not None:
+        board = get_leaderboard_data('total_duration_all_time', user_id)
+        if board is not None:
+            snapshot['leaderboard'] = [(name, int(value)) for name, value in board[:top_n]]
+    return snapshot
+
+def get_leaderboard_cache_stats():
+    """Returns hit/miss counters for the leaderboard's friend-set and metric caches."""
+    return _leaderboard_cache.stats()
+
+def get_adjacency_cache_stats():
+    """Returns hit/miss counters for the friend-graph adjacency cache."""
+    return _adjacency_cache.stats()
+
+def clear_leaderboard_cache():
+    """Drops every cached friend set and metric, e.g. after rebuilding the summaries."""
+    _leaderboard_cache.clear()
+    _adjacency_cache.clear()
+    with _global_rankings.lock:
+        _global_rankings.invalidate()
+
+# --- Global Rankings ---
+
+# Per-user value of each leaderboard metric in SQL, for exact ranks without the in-memory rankings
+GLOBAL_METRIC_SQL = {
+    'total_workouts_last_30_days': "COALESCE(recent.workout_count, 0)",
+    'total_duration_last_30_days': "COALESCE(recent.duration_sum, 0)",
+    'avg_duration_all_time': """CASE WHEN s.workout_count > 0
+        THEN CAST(s.duration_sum AS DOUBLE PRECISION) / s.workout_count ELSE 0 END""",
+    'total_duration_all_time': "COALESCE(s.duration_sum, 0)",
+}
+
+def _refresh_global_rankings(force=False):
+    """
+    Brings the in-process rankings up to date: a full load of every user's metrics when they
+    have never been built, on a new day or after rebuild_interval, otherwise just the users with
+    workouts above the watermark. Runs at most once per refresh_interval unless forced.
+    When sharded every shard is read in parallel, each with its own watermark.
+    """
+    rankings = _global_rankings
+    if not force and time.monotonic() - rankings.refreshed_at < RANKING_CONFIG['refresh_interval']:
+        return
+    with rankings.lock:
+        # Another thread may have refreshed while this one waited for the lock
+        if not force and time.monotonic() - rankings.refreshed_at < RANKING_CONFIG['refresh_interval']:
+            return
+        full = rankings.needs_rebuild()
+        shard_map = get_shard_map()
+        if shard_map is None:
+            with db_cursor(read_only=True) as cur:
+                metrics, watermark = _ranking_changes(cur, None if full else rankings.watermark)
+        else:
+            marks = {} if full else rankings.watermark
+
+            def changes(shard):
+                with db_cursor(read_only=True) as cur:
+                    return _ranking_changes(cur, marks.get(shard.name))
+
+            metrics, watermark = {}, {}
+            for name, (shard_metrics, mark) in shard_map.every_shard(changes).items():
+                metrics.update(shard_metrics)
+                watermark[name] = mark
+        if full:
+            rankings.rebuild(metrics, watermark)
+        elif metrics:
+            rankings.update(metrics, watermark)
+        rankings.refreshed_at = time.monotonic()
+
+def _ranking_changes(cur, watermark):
+    """
+    (metrics by user, new watermark) from one database: every user when `watermark` is None,
+    otherwise the users with workouts above it.
+    """
+    if watermark is None:
+        # Read the watermark first: a workout landing in between is simply applied twice
+        cur.execute("SELECT COALESCE(MAX(workout_id), 0) FROM workouts;")
+        watermark = _applied_watermark(cur, cur.fetchone()[0])
+        return _query_member_metrics(cur, "{column} IS NOT NULL", ()), watermark
+    cur.execute("""
+        SELECT user_id, MAX(workout_id) FROM workouts
+        WHERE workout_id > %s
+        GROUP BY user_id;
+    """, (watermark,))
+    rows = cur.fetchall()
+    if not rows:
+        return {}, watermark
+    engine = get_engine()
+    changed = [user_id for user_id, _ in rows]
+    return _query_member_metrics(
+        cur, engine.id_list_condition("{column}"), (engine.id_list_param(changed),)
+    ), _applied_watermark(cur, max(workout_id for _, workout_id in rows))
+
+def _applied_watermark(cur, watermark):
+    """
+    With AGGREGATION_MODE "worker", holds the rankings' watermark below the first workout the
+    worker has not folded into the summaries yet, so its user is reloaded once it has.
+    """
+    if AGGREGATION_MODE != "worker":
+        return watermark
+    cur.execute("SELECT MIN(workout_id) FROM workout_events;")
+    pending = cur.fetchone()[0]
+    return watermark if pending is None else min(watermark, pending - 1)
+
+def _global_metric_cte(metric):
+    """A CTE `m` of (user_id, value) for every user, binding %(since)s."""
+    return f"""
+        WITH m AS (
+            SELECT u.user_id, {GLOBAL_METRIC_SQL[metric]} AS value
+            FROM users u
+            LEFT JOIN user_workout_stats s ON s.user_id = u.user_id
+            LEFT JOIN (
+                SELECT user_id, SUM(workout_count) AS workout_count, SUM(duration_sum) AS duration_sum
+                FROM user_workout_daily
+                WHERE workout_date >= %(since)s
+                GROUP BY user_id
+            ) recent ON recent.user_id = u.user_id
+        )
+    """
+
+def _exact_global_rank(cur, user_id, metric):
+    """(value, rank, users) for `user_id` computed in SQL over every user; None if the user does not exist."""
+    since = date.today() - timedelta(days=30)
+    cur.execute(_global_metric_cte(metric) + """
+        SELECT me.value,
+               (SELECT COUNT(*) FROM m WHERE m.value > me.value) + 1,
+               (SELECT COUNT(*) FROM m)
+        FROM m me
+        WHERE me.user_id = %(user_id)s;
+    """, {'since': since, 'user_id': user_id})
+    row = cur.fetchone()
+    if row is None:
+        return None
+    value, position, users = row
+    return float(value) if metric == 'avg_duration_all_time' else int(value), int(position), int(users)
+
+def _exact_global_rank_sharded(user_id, metric):
+    """_exact_global_rank over every shard: the user's value from their shard, then a count on each shard."""
+    with _user_shard(user_id), db_cursor(read_only=True, user_id=user_id) as cur:
+        metrics = _query_member_metrics(cur, "{column} = %s", (user_id,))
+    if user_id not in metrics:
+        return None
+    value = metrics[user_id][LEADERBOARD_METRICS[metric]]
+    since = date.today() - timedelta(days=30)
+    counts = _every_shard(lambda cur: _fetch(cur, _global_metric_cte(metric) + """
+        SELECT COALESCE(SUM(CASE WHEN value > %(value)s THEN 1 ELSE 0 END), 0), COUNT(*) FROM m;
+    """, {'since': since, 'value': value})[0])
+    return value, sum(int(above) for above, _ in counts) + 1, sum(int(users) for _, users in counts)
+
+@instrumented
+def get_global_rank(user_id, metric=DEFAULT_METRIC, exact=None):
+    """
+    Where a user stands among all users by a leaderboard metric. Returns a dict with 'value',
+    'rank' (1 is the highest; ties share a rank), 'users', 'top_percent' (rank as a share of
+    all users), 'percentile' (share of users ranked below) and 'exact', or None if the user
+    does not exist or the query fails.
+    Answered from the in-process rankings in O(log buckets); users in the top-K, and everyone
+    in "exact" mode, get exact ranks. exact=True in "approximate" mode ranks in SQL instead,
+    which scans every user's summary. exact=None follows RANKING_CONFIG['mode'].
+    """
+    metric = metric if metric in LEADERBOARD_METRICS else DEFAULT_METRIC
+    try:
+        if exact and not _global_rankings.exact:
+            if get_shard_map() is not None:
+                result = _exact_global_rank_sharded(user_id, metric)
+            else:
+                with db_cursor(read_only=True, user_id=user_id) as cur:
+                    result = _exact_global_rank(cur, user_id, metric)
+            if result is None:
+                return None
+            value, position, users = result
+            is_exact = True
+        else:
+            _refresh_global_rankings()
+            rankings = _global_rankings
+            ranking = rankings.rankings[metric]
+            with rankings.lock:
+                known = user_id in ranking.values
+            if not known:
+                # Signed up since the last rebuild and has no workouts yet
+                with _user_shard(user_id), db_cursor(read_only=True, user_id=user_id) as cur:
+                    metrics = _query_member_metrics(cur, "{column} = %s", (user_id,))
+                with rankings.lock:
+                    rankings.update(metrics)
+            with rankings.lock:
+                if user_id not in ranking.values:
+                    return None
+                position, value, is_exact = ranking.rank(user_id, exact)
+                users = len(ranking)
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+    return {
+        'value': value,
+        'rank': position,
+        'users': users,
+        'top_percent': 100.0 * position / users,
+        'percentile': 100.0 * (users - position) / users,
+        'exact': is_exact,
+    }
+
+@instrumented
+def get_global_top(metric=DEFAULT_METRIC, k=10):
+    """
+    The `k` highest users of all by a leaderboard metric as (user_id, name, value) rows,
+    exact for k up to RANKING_CONFIG['top_k']. Returns None if the refresh query fails.
+    """
+    metric = metric if metric in LEADERBOARD_METRICS else DEFAULT_METRIC
+    try:
+        _refresh_global_rankings()
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return None
+    rankings = _global_rankings
+    with rankings.lock:
+        return [(user_id, rankings.names.get(user_id), value)
+                for user_id, value in rankings.rankings[metric].leaders(k)]
+
+def refresh_global_rankings(full=True):
+    """
+    Refreshes the global rankings now: reloads every user, or with full=False only applies
+    workouts logged since the last refresh. Returns False if the query fails.
+    """
+    if full:
+        with _global_rankings.lock:
+            _global_rankings.invalidate()
+    try:
+        _refresh_global_rankings(force=True)
+        return True
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return False
+
+def configure_global_rankings(**settings):
+    """Updates RANKING_CONFIG (mode, top_k, relative_error, ...) and starts over with empty rankings."""
+    global _global_rankings
+    RANKING_CONFIG.update(settings)
+    _global_rankings = GlobalRankings(RANKING_CONFIG['top_k'], RANKING_CONFIG['mode'] == "exact",
+                                      RANKING_CONFIG['relative_error'], RANKING_CONFIG['rebuild_interval'])
+
+def get_global_ranking_stats():
+    """Returns the global rankings' size, mode, watermark and refresh counters."""
+    return _global_rankings.stats()
+
+# --- Instrumentation ---
+
+def query_budget():
+    """Context manager totalling the queries of every backend call made inside it (see metrics_fitness)."""
+    return _instrumentation.query_budget()
+
+def start_query_budget():
+    """Starts a query budget for the rest of the current context, e.g. one Streamlit rerun."""
+    return _instrumentation.start_budget()
+
+def capture_queries():
+    """Context manager yielding the list of (sql, params) executed inside it (see migrate_fitness check)."""
+    return _instrumentation.capture()
+
+def get_metrics_json():
+    """Per-function latency/connect/execute/fetch histograms plus the slow-query log, as JSON."""
+    return _instrumentation.export_json()
+
+def get_metrics_prometheus():
+    """The same metrics in the Prometheus text exposition format."""
+    return _instrumentation.export_prometheus()
+
+def get_function_metrics():
+    return _instrumentation.snapshot()
+
+def get_slow_queries():
+    """Statements slower than SLOW_QUERY_MS, with parameter shapes but never parameter values."""
+    return list(_instrumentation.slow_queries)
+
+def configure_instrumentation(enabled=None, slow_query_ms=None):
+    if enabled is not None:
+        _instrumentation.enabled = enabled
+    if slow_query_ms is not None:
+        _instrumentation.slow_query_ms = slow_query_ms
+
+def reset_metrics():
+    _instrumentation.reset()
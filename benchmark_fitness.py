@@ -0,0 +1,762 @@
+"""
+Latency benchmark for the public backend_fitness functions on each storage engine.
+
+    python benchmark_fitness.py                       # SQLite only
+    python benchmark_fitness.py --postgres            # SQLite and the configured Postgres database
+    python benchmark_fitness.py --iterations 500 --json results.json
+    python benchmark_fitness.py --fanout 5000         # leaderboard vs. the original two-query version
+    python benchmark_fitness.py --search-scale 1000,10000,100000
+    python benchmark_fitness.py --graph 1000000       # friend graph: one-way UNION queries vs. graph_fitness
+    python benchmark_fitness.py --ranking 100000      # global rank: SQL vs. in-memory exact/approximate, with accuracy
+    python benchmark_fitness.py --frontend 1000       # cold import times, app startup and per-section rerun times
+    python benchmark_fitness.py --load 10000 --threads 8 --json HEAD.json   # synthetic dataset, single + concurrent
+    python benchmark_fitness.py --load 10000 --threads 8 --compare HEAD.json
+    python benchmark_fitness.py --load 10000 --async-clients 1,4,16,64  # async dashboard throughput per client count
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import backend_fitness as backend
+from storage_fitness import create_engine
+
+LEADERBOARD_METRICS = ["total_workouts_last_30_days", "total_duration_last_30_days", "avg_duration_all_time"]
+
+
+def seed(num_users=20, workouts_per_user=30):
+    """Creates a small dataset with unique emails so it can run against a shared database."""
+    tag = uuid.uuid4().hex[:8]
+    user_ids = []
+    for i in range(num_users):
+        user_ids.append(backend.create_user(f"Bench {tag} {i}", f"bench_{tag}_{i}@example.com", 70 + i))
+    for i, user_id in enumerate(user_ids):
+        for j in range(workouts_per_user):
+            backend.create_workout_with_exercises(
+                user_id, date.today() - timedelta(days=j), 30 + j % 60,
+                [{'name': "Squat", 'sets': 5, 'reps': 5, 'weight': 100.0},
+                 {'name': "Bench Press", 'sets': 3, 'reps': 8, 'weight': 80.0}]
+            )
+        for friend_id in user_ids[i + 1:i + 6]:
+            backend.add_friend(user_id, friend_id)
+        backend.create_goal(user_id, "Work out 4 times a week", 4)
+    return user_ids
+
+
+def public_calls(user_ids):
+    """One (label, callable) pair per public backend function."""
+    user_id = user_ids[0]
+    friend_id = user_ids[-1]
+    workout_id = backend.get_all_workouts_for_user(user_id)[0][0]
+    page_ids = [row[0] for row in backend.get_workouts_page(user_id, limit=25)[0]]
+    goal_id = backend.get_goals(user_id)[0][0]
+    user = backend.get_user(user_id)
+    counter = iter(range(10 ** 9))
+
+    def create_user():
+        new_id = backend.create_user("Bench Temp", f"bench_tmp_{uuid.uuid4().hex}@example.com", 80)
+        backend.delete_user(new_id)
+
+    def toggle_friend():
+        backend.add_friend(user_id, friend_id)
+        backend.remove_friend(user_id, friend_id)
+
+    calls = [
+        ("create_user+delete_user", create_user),
+        ("get_user", lambda: backend.get_user(user_id)),
+        ("get_all_users", backend.get_all_users),
+        ("update_user", lambda: backend.update_user(user_id, user[1], user[2], user[3])),
+        ("add_friend+remove_friend", toggle_friend),
+        ("get_friends_list", lambda: backend.get_friends_list(user_id)),
+        ("create_workout_with_exercises", lambda: backend.create_workout_with_exercises(
+            user_id, date.today(), 45, [{'name': "Row", 'sets': 3, 'reps': 10, 'weight': 50.0}])),
+        ("get_all_workouts_for_user", lambda: backend.get_all_workouts_for_user(user_id)),
+        ("get_workouts_page", lambda: backend.get_workouts_page(user_id, limit=10)),
+        ("iter_workouts", lambda: sum(1 for _ in backend.iter_workouts(user_id))),
+        ("get_exercises_for_workout", lambda: backend.get_exercises_for_workout(workout_id)),
+        ("get_exercises_for_workouts", lambda: backend.get_exercises_for_workouts(page_ids)),
+        ("get_exercises_for_user", lambda: backend.get_exercises_for_user(user_id)),
+        ("create_goal", lambda: backend.create_goal(user_id, "Temporary goal", 1)),
+        ("get_goals", lambda: backend.get_goals(user_id)),
+        ("update_goal_progress", lambda: backend.update_goal_progress(goal_id, next(counter) % 4)),
+        ("get_business_insights", lambda: backend.get_business_insights(user_id)),
+        ("get_dashboard_snapshot", lambda: backend.get_dashboard_snapshot(user_id)),
+    ]
+    for metric in LEADERBOARD_METRICS:
+        calls.append((f"get_leaderboard_data[{metric}]",
+                      lambda metric=metric: backend.get_leaderboard_data(metric, user_id)))
+    return calls
+
+
+def legacy_leaderboard(metric, user_id):
+    """The original get_leaderboard_data: a friend-id query, then an IN-tuple aggregate over workouts."""
+    with backend.db_cursor() as cur:
+        cur.execute("""
+            SELECT user_id FROM friends WHERE friend_id = %s
+            UNION
+            SELECT friend_id FROM friends WHERE user_id = %s
+            UNION
+            SELECT %s;
+        """, (user_id, user_id, user_id))
+        friend_ids = [row[0] for row in cur.fetchall()]
+        since = date.today() - timedelta(days=30)
+        if metric == 'total_workouts_last_30_days':
+            value, window = "COUNT(w.workout_id)", "AND w.workout_date >= %s"
+        elif metric == 'total_duration_last_30_days':
+            value, window = "COALESCE(SUM(w.duration_minutes), 0)", "AND w.workout_date >= %s"
+        elif metric == 'avg_duration_all_time':
+            value, window = "COALESCE(AVG(w.duration_minutes), 0)", ""
+        else:
+            value, window = "COALESCE(SUM(w.duration_minutes), 0)", ""
+        # Expanded placeholders stand in for psycopg2's tuple adaptation so this runs on every engine
+        in_list = ", ".join(["%s"] * len(friend_ids))
+        cur.execute(f"""
+            SELECT u.name, {value} AS metric_value
+            FROM users u
+            LEFT JOIN workouts w ON u.user_id = w.user_id {window}
+            WHERE u.user_id IN ({in_list})
+            GROUP BY u.name
+            ORDER BY metric_value DESC, u.name ASC;
+        """, ((since,) if window else ()) + tuple(friend_ids))
+        return cur.fetchall()
+
+
+def seed_fanout(fanout, workouts_per_user=5):
+    """Creates one user with `fanout` friends, each with a few recent workouts, via the bulk importer."""
+    from import_fitness import bulk_import_workouts
+
+    tag = uuid.uuid4().hex[:8]
+    hub = backend.create_user(f"Hub {tag}", f"hub_{tag}@example.com", 80)
+    friend_ids = []
+    with backend.db_cursor(commit=True) as cur:
+        for i in range(fanout):
+            cur.execute("INSERT INTO users (name, email, weight) VALUES (%s, %s, %s) RETURNING user_id;",
+                        (f"Fan {tag} {i}", f"fan_{tag}_{i}@example.com", 70))
+            friend_ids.append(cur.fetchone()[0])
+        cur.executemany("INSERT INTO friends (user_id, friend_id) VALUES (%s, %s);",
+                        [pair for friend_id in friend_ids for pair in ((hub, friend_id), (friend_id, hub))])
+    records = ((n, {'user_id': friend_id, 'workout_date': (date.today() - timedelta(days=d)).isoformat(),
+                    'duration_minutes': 20 + (n + d) % 60})
+               for n, (friend_id, d) in enumerate((f, d) for f in friend_ids for d in range(workouts_per_user)))
+    bulk_import_workouts(records)
+    return hub
+
+
+def run_leaderboard_comparison(engine, fanout, iterations):
+    """Compares cold/warm cached leaderboards with the original implementation for a large friend set."""
+    backend.configure_engine(engine)
+    try:
+        hub = seed_fanout(fanout)
+        results = {}
+        for metric in LEADERBOARD_METRICS:
+            legacy_leaderboard(metric, hub)
+            results[f"legacy[{metric}]"] = measure(lambda: legacy_leaderboard(metric, hub), iterations)
+
+            def cold():
+                backend.clear_leaderboard_cache()
+                backend.get_leaderboard_data(metric, hub)
+            results[f"cold[{metric}]"] = measure(cold, iterations)
+            backend.get_leaderboard_data(metric, hub)
+            results[f"warm[{metric}]"] = measure(lambda: backend.get_leaderboard_data(metric, hub), iterations)
+        return results
+    finally:
+        backend.configure_engine(None)
+        engine.close()
+
+
+# The friend-graph queries as they were before friendships were stored in both directions,
+# run against a one-way copy of the benchmark graph
+LEGACY_FRIENDS = """
+    SELECT friend_id FROM {table} WHERE user_id = %(user_id)s
+    UNION
+    SELECT user_id FROM {table} WHERE friend_id = %(user_id)s
+"""
+
+
+def legacy_friend_ids(table, user_id):
+    with backend.db_cursor() as cur:
+        cur.execute(LEGACY_FRIENDS.format(table=table), {'user_id': user_id})
+        return {row[0] for row in cur.fetchall()}
+
+
+def legacy_mutual_count(table, user_id, other_id):
+    with backend.db_cursor() as cur:
+        cur.execute(f"""
+            WITH fa AS ({LEGACY_FRIENDS.format(table=table)}),
+                 fb AS ({LEGACY_FRIENDS.format(table=table).replace("%(user_id)s", "%(other_id)s")})
+            SELECT COUNT(*) FROM fa JOIN fb ON fa.friend_id = fb.friend_id;
+        """, {'user_id': user_id, 'other_id': other_id})
+        return cur.fetchone()[0]
+
+
+def legacy_suggestions(table, user_id, limit=10):
+    with backend.db_cursor() as cur:
+        cur.execute(f"""
+            WITH f AS ({LEGACY_FRIENDS.format(table=table)}),
+            ff AS (
+                SELECT t.friend_id AS candidate FROM {table} t JOIN f ON t.user_id = f.friend_id
+                UNION ALL
+                SELECT t.user_id FROM {table} t JOIN f ON t.friend_id = f.friend_id
+            )
+            SELECT candidate, COUNT(*) AS mutual FROM ff
+            WHERE candidate <> %(user_id)s AND candidate NOT IN (SELECT friend_id FROM f)
+            GROUP BY candidate
+            ORDER BY mutual DESC, candidate
+            LIMIT %(limit)s;
+        """, {'user_id': user_id, 'limit': limit})
+        return cur.fetchall()
+
+
+def seed_graph(engine, num_edges, edges_per_user, seed):
+    """
+    Loads a preferential-attachment graph of about `num_edges` friendships into friends
+    (both directions) and into a one-way legacy table. Returns (user ids, legacy table name).
+    """
+    from datagen_fitness import preferential_attachment
+
+    rng = random.Random(seed)
+    tag = uuid.uuid4().hex[:8]
+    num_users = max(num_edges // edges_per_user, edges_per_user + 1)
+    legacy_table = f"bench_friends_oneway_{tag}"
+    with backend.db_cursor(commit=True) as cur:
+        user_ids = engine.allocate_ids(cur, "users", "user_id", num_users)
+        engine.bulk_insert(cur, "users", ("user_id", "name", "email", "weight"),
+                           [(user_id, f"Graph {i}", f"graph_{i}_{tag}@example.com", 70)
+                            for i, user_id in enumerate(user_ids)])
+        edges = preferential_attachment(rng, user_ids, edges_per_user)
+        engine.bulk_insert(cur, "friends", ("user_id", "friend_id"),
+                           edges + [(friend_id, user_id) for user_id, friend_id in edges])
+        # Same indexes the one-way table had: UNIQUE (user_id, friend_id) and idx_friends_friend
+        cur.execute(f"CREATE TABLE {legacy_table} (user_id INT, friend_id INT, UNIQUE (user_id, friend_id));")
+        cur.execute(f"CREATE INDEX {legacy_table}_friend ON {legacy_table} (friend_id, user_id);")
+        engine.bulk_insert(cur, legacy_table, ("user_id", "friend_id"), edges)
+    return user_ids, legacy_table
+
+
+def run_graph_comparison(engine, num_edges, iterations, seed, edges_per_user=10):
+    """Friend lookups, mutual-friend counts and suggestions: one-way UNION queries vs. graph_fitness."""
+    backend.configure_engine(engine)
+    legacy_table = None
+    try:
+        start = time.perf_counter()
+        user_ids, legacy_table = seed_graph(engine, num_edges, edges_per_user, seed)
+        results = {'dataset': {'users': len(user_ids), 'friendships': num_edges,
+                               'load_seconds': time.perf_counter() - start}}
+        rng = random.Random(seed)
+        sample = [rng.choice(user_ids) for _ in range(iterations)]
+        pairs = itertools.cycle([(user_id, rng.choice(user_ids)) for user_id in sample])
+        users = itertools.cycle(sample)
+
+        def mutual_counts():
+            user_id, other_id = next(pairs)
+            return backend.get_mutual_friend_counts(user_id, [other_id])
+
+        def cold(fn):
+            def call():
+                backend.clear_leaderboard_cache()
+                return fn()
+            return call
+
+        calls = [
+            ("friend_ids legacy UNION", lambda: legacy_friend_ids(legacy_table, next(users))),
+            ("friend_ids cold", cold(lambda: backend.get_friend_ids(next(users)))),
+            ("friend_ids warm", lambda: backend.get_friend_ids(next(users))),
+            ("mutual_count legacy UNION", lambda: legacy_mutual_count(legacy_table, *next(pairs))),
+            ("mutual_count cold", cold(mutual_counts)),
+            ("mutual_count warm", mutual_counts),
+            ("suggestions legacy UNION", lambda: legacy_suggestions(legacy_table, next(users))),
+            ("suggestions cold", cold(lambda: backend.suggest_friends(next(users)))),
+            ("suggestions warm", lambda: backend.suggest_friends(next(users))),
+        ]
+        for label, fn in calls:
+            # Warm runs cycle through the same sample, so a first pass fills the adjacency cache
+            for _ in range(len(sample)):
+                fn()
+            results[label] = measure(fn, iterations)
+        results['adjacency_cache'] = backend.get_adjacency_cache_stats()
+        return results
+    finally:
+        if legacy_table:
+            with backend.db_cursor(commit=True) as cur:
+                cur.execute(f"DROP TABLE {legacy_table};")
+        backend.configure_engine(None)
+        engine.close()
+
+
+def ranking_accuracy(user_ids):
+    """Approximate ranks against exact SQL ranks for `user_ids`, per metric."""
+    accuracy = {}
+    for metric in backend.LEADERBOARD_METRICS:
+        rank_errors, percent_errors, exact = [], [], 0
+        for user_id in user_ids:
+            approximate = backend.get_global_rank(user_id, metric, exact=False)
+            truth = backend.get_global_rank(user_id, metric, exact=True)
+            rank_errors.append(abs(approximate['rank'] - truth['rank']))
+            percent_errors.append(abs(approximate['top_percent'] - truth['top_percent']))
+            exact += approximate['rank'] == truth['rank']
+        accuracy[metric] = {
+            'users': len(user_ids),
+            'exact_share': exact / len(user_ids),
+            'mean_rank_error': statistics.fmean(rank_errors),
+            'max_rank_error': max(rank_errors),
+            'mean_percent_error': statistics.fmean(percent_errors),
+            'max_percent_error': max(percent_errors),
+        }
+    return accuracy
+
+
+def run_ranking_comparison(engine, num_users, iterations, seed):
+    """get_global_rank in SQL vs. the in-process rankings in both modes, plus an accuracy report."""
+    from datagen_fitness import generate
+
+    backend.configure_engine(engine)
+    try:
+        dataset = generate(num_users, seed=seed)
+        user_ids = dataset['user_ids']
+        rng = random.Random(seed)
+        sample = [rng.choice(user_ids) for _ in range(iterations)]
+        users = itertools.cycle(sample)
+        results = {'dataset': {k: v for k, v in dataset.items() if k != 'user_ids'}}
+
+        backend.configure_global_rankings(mode="approximate")
+        results["global_rank exact SQL"] = measure(
+            lambda: backend.get_global_rank(next(users), exact=True), iterations)
+        for mode in ("approximate", "exact"):
+            backend.configure_global_rankings(mode=mode)
+            start = time.perf_counter()
+            backend.refresh_global_rankings()
+            results['dataset'][f'{mode}_rebuild_seconds'] = time.perf_counter() - start
+            results[f"global_rank {mode}"] = measure(lambda: backend.get_global_rank(next(users)), iterations)
+            results[f"global_top {mode}"] = measure(lambda: backend.get_global_top(k=10), iterations)
+            # An incremental refresh after a burst of new workouts from the sample
+            updated = backend.get_global_ranking_stats()['users_updated']
+            for user_id in sample[:100]:
+                backend.create_workout_with_exercises(user_id, date.today(), 45, [])
+            start = time.perf_counter()
+            backend.refresh_global_rankings(full=False)
+            results['dataset'][f'{mode}_incremental_seconds'] = time.perf_counter() - start
+            results['dataset'][f'{mode}_incremental_users'] = backend.get_global_ranking_stats()['users_updated'] - updated
+
+        backend.configure_global_rankings(mode="approximate")
+        results['accuracy'] = ranking_accuracy(sorted(set(sample)))
+        results['rankings'] = backend.get_global_ranking_stats()
+        return results
+    finally:
+        backend.configure_engine(None)
+        engine.close()
+
+
+def print_ranking_accuracy(report):
+    for name, results in report.items():
+        print(f"\n{name}: approximate vs. exact SQL rank")
+        print(f"{'metric':<32}{'users':>7}{'exact':>8}{'mean err':>10}{'max err':>9}{'mean % pts':>12}{'max % pts':>11}")
+        for metric, acc in results['accuracy'].items():
+            print(f"{metric:<32}{acc['users']:>7}{acc['exact_share']:>8.1%}{acc['mean_rank_error']:>10.2f}"
+                  f"{acc['max_rank_error']:>9}{acc['mean_percent_error']:>12.4f}{acc['max_percent_error']:>11.4f}")
+        print(", ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                        for key, value in results['dataset'].items()))
+
+
+FRONTEND_IMPORTS = ["backend_fitness", "frontend_sections.log_workout", "frontend_sections.progress",
+                    "frontend_sections.goals", "frontend_sections.friends", "frontend_sections.insights",
+                    "analytics_fitness", "pandas", "streamlit"]
+
+
+def cold_import(module):
+    """Imports `module` in a fresh interpreter: (milliseconds, whether pandas got loaded), or None if it fails."""
+    code = ("import importlib, sys, time; start = time.perf_counter(); importlib.import_module(sys.argv[1]); "
+            "print((time.perf_counter() - start) * 1000, 'pandas' in sys.modules)")
+    result = subprocess.run([sys.executable, "-c", code, module], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode:
+        return None
+    ms, pandas_loaded = result.stdout.split()
+    return float(ms), pandas_loaded == "True"
+
+
+def run_frontend_benchmark(engine, num_users, iterations, seed):
+    """
+    Cold import time of the frontend's modules, then (with streamlit's AppTest) the first run of
+    frontend_fitness.py and the first and repeated reruns of every section for one user.
+    """
+    from datagen_fitness import generate
+    from frontend_sections import SECTIONS
+
+    results = {'imports': {}}
+    for module in FRONTEND_IMPORTS:
+        timing = cold_import(module)
+        results['imports'][module] = (
+            {'ms': timing[0], 'loads_pandas': timing[1]} if timing else {'ms': None, 'loads_pandas': None}
+        )
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        engine.close()
+        return results
+
+    backend.configure_engine(engine)
+    try:
+        user_ids = generate(num_users, seed=seed)['user_ids']
+        app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend_fitness.py"),
+                                default_timeout=60)
+        app.session_state["user_id"] = random.Random(seed).choice(user_ids)
+        start = time.perf_counter()
+        app.run()
+        results['dataset'] = {'users': num_users, 'startup_ms': (time.perf_counter() - start) * 1000}
+        for label in SECTIONS:
+            start = time.perf_counter()
+            app.selectbox(key="section").set_value(label).run()
+            results['dataset'][f"{label} first render ms"] = (time.perf_counter() - start) * 1000
+            results[f"rerun {label}"] = measure(app.run, iterations)
+        results['dataset']['exceptions'] = len(app.exception)
+        return results
+    finally:
+        backend.configure_engine(None)
+        engine.close()
+
+
+def print_import_report(report):
+    for name, results in report.items():
+        print(f"\n{name}: cold import")
+        for module, timing in results['imports'].items():
+            if timing['ms'] is None:
+                print(f"  {module:<36}{'failed':>10}")
+            else:
+                print(f"  {module:<36}{timing['ms']:>8.1f} ms{'  (loads pandas)' if timing['loads_pandas'] else ''}")
+        if 'dataset' in results:
+            print(", ".join(f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+                            for key, value in results['dataset'].items()))
+
+
+SEARCH_QUERIES = ["a", "mi", "sam", "user_1", "zz", "ar"]
+FIRST_NAMES = ["Aaron", "Alice", "Amir", "Ana", "Arjun", "Ben", "Chen", "Dana", "Eva", "Farah", "Ivan", "Jo",
+               "Kai", "Lena", "Maria", "Mike", "Mina", "Noah", "Omar", "Priya", "Sam", "Samira", "Tom", "Zoe"]
+
+
+def run_search_scaling(engine, sizes, iterations):
+    """Times search_users (read cache disabled) as the users table grows through `sizes`."""
+    backend.configure_engine(engine)
+    backend.configure_read_cache(max_entries=0)
+    results = {}
+    try:
+        tag = uuid.uuid4().hex[:8]
+        created = 0
+        for size in sorted(sizes):
+            rows = [(f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {i}", f"user_{i}_{tag}@example.com", 70)
+                    for i in range(created, size)]
+            with backend.db_cursor(commit=True) as cur:
+                engine.bulk_insert(cur, "users", ("name", "email", "weight"), rows)
+            created = size
+            for query in SEARCH_QUERIES:
+                results[f"search_users[{query!r}] @ {size} users"] = measure(
+                    lambda: backend.search_users(query, limit=10), iterations)
+        return results
+    finally:
+        backend.configure_read_cache(max_entries=backend.READ_CACHE_SIZE)
+        backend.configure_engine(None)
+        engine.close()
+
+
+def summarize(samples, wall_seconds):
+    """Latency percentiles in milliseconds plus throughput for one set of samples."""
+    samples = sorted(samples)
+    n = len(samples)
+    return {
+        'iterations': n,
+        'mean_ms': statistics.fmean(samples),
+        'p50_ms': samples[n // 2],
+        'p95_ms': samples[min(n - 1, int(n * 0.95))],
+        'p99_ms': samples[min(n - 1, int(n * 0.99))],
+        'max_ms': samples[-1],
+        'ops_per_sec': n / wall_seconds if wall_seconds > 0 else 0.0,
+    }
+
+
+def measure(fn, iterations):
+    """Returns latency percentiles in milliseconds for `iterations` calls of fn."""
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - call_start) * 1000)
+    return summarize(samples, time.perf_counter() - start)
+
+
+def measure_concurrent(fn, iterations, threads):
+    """Like measure, but `threads` workers share the `iterations` calls; throughput is over wall time."""
+    def timed(_):
+        call_start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - call_start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        samples = list(executor.map(timed, range(iterations)))
+    return summarize(samples, time.perf_counter() - start)
+
+
+def run_engine(engine, iterations):
+    backend.configure_engine(engine)
+    try:
+        user_ids = seed()
+        results = {}
+        for label, fn in public_calls(user_ids):
+            fn()  # warm up the pool and statement caches
+            results[label] = measure(fn, iterations)
+        results['pool'] = backend.get_pool_stats()
+        results['read_cache'] = backend.get_read_cache_stats()
+        return results
+    finally:
+        backend.configure_engine(None)
+        engine.close()
+
+
+def print_report(report):
+    engines = list(report)
+    labels = [label for label in report[engines[0]] if label not in ('pool', 'read_cache', 'dataset', 'adjacency_cache', 'accuracy', 'rankings', 'imports')]
+    print(f"{'function':<52}" + "".join(f"{name + ' p50/p95 ms':>26}" for name in engines))
+    for label in labels:
+        row = f"{label:<52}"
+        for name in engines:
+            stats = report[name].get(label)
+            row += f"{stats['p50_ms']:>14.3f} /{stats['p95_ms']:>9.3f}" if stats else f"{'-':>26}"
+        print(row)
+
+
+def load_calls(user_ids, rng):
+    """
+    The functions the load suite exercises. Each call picks the next user from a shuffled
+    sample of the dataset, so reads spread over cold and hot users the way real traffic does.
+    """
+    sample = [rng.choice(user_ids) for _ in range(10000)]
+    counter = itertools.count()  # next() on a count is atomic, so worker threads can share it
+
+    def next_user():
+        return sample[next(counter) % len(sample)]
+
+    calls = [(f"get_leaderboard_data[{metric}]", lambda metric=metric: backend.get_leaderboard_data(metric, next_user()))
+             for metric in LEADERBOARD_METRICS + ["total_duration_all_time"]]
+    calls += [
+        ("get_business_insights", lambda: backend.get_business_insights(next_user())),
+        ("get_dashboard_snapshot", lambda: backend.get_dashboard_snapshot(next_user())),
+        ("get_all_workouts_for_user", lambda: backend.get_all_workouts_for_user(next_user())),
+        ("get_friends_list", lambda: backend.get_friends_list(next_user())),
+        ("create_workout_with_exercises", lambda: backend.create_workout_with_exercises(
+            next_user(), date.today(), 45,
+            [{'name': "Row", 'sets': 3, 'reps': 10, 'weight': 50.0},
+             {'name': "Squat", 'sets': 5, 'reps': 5, 'weight': 100.0}])),
+    ]
+    return calls
+
+
+def run_load(engine, num_users, iterations, threads, seed):
+    """Generates a synthetic dataset, then runs every load call single-threaded and with `threads` workers."""
+    from datagen_fitness import generate
+
+    backend.configure_engine(engine)
+    backend.configure_pool(max_size=max(threads, backend.POOL_CONFIG['max_size']))
+    try:
+        dataset = generate(num_users, seed=seed)
+        rng = random.Random(seed)
+        results = {'dataset': {k: v for k, v in dataset.items() if k != 'user_ids'}}
+        for label, fn in load_calls(dataset['user_ids'], rng):
+            fn()
+            results[label] = {
+                'single': measure(fn, iterations),
+                'concurrent': measure_concurrent(fn, iterations, threads),
+            }
+        results['pool'] = backend.get_pool_stats()
+        results['read_cache'] = backend.get_read_cache_stats()
+        return results
+    finally:
+        backend.configure_engine(None)
+        engine.close()
+
+
+def run_async_scaling(engine, num_users, client_counts, requests_per_client, seed):
+    """Dashboard throughput through async_backend_fitness as the number of concurrent clients grows."""
+    import async_backend_fitness as api
+    from datagen_fitness import generate
+
+    backend.configure_engine(engine)
+    try:
+        dataset = generate(num_users, seed=seed)
+        user_ids = dataset['user_ids']
+        results = {'dataset': {k: v for k, v in dataset.items() if k != 'user_ids'}}
+
+        async def client(rng, samples):
+            for _ in range(requests_per_client):
+                start = time.perf_counter()
+                await api.get_dashboard(rng.choice(user_ids))
+                samples.append((time.perf_counter() - start) * 1000)
+
+        async def run_clients(count):
+            samples = []
+            start = time.perf_counter()
+            await asyncio.gather(*(client(random.Random(seed + i), samples) for i in range(count)))
+            return summarize(samples, time.perf_counter() - start)
+
+        for count in sorted(client_counts):
+            results[f"get_dashboard @ {count} clients"] = {'async': asyncio.run(run_clients(count))}
+        return results
+    finally:
+        backend.configure_engine(None)
+        engine.close()
+
+
+def git_commit():
+    """The commit being benchmarked, so result files can be told apart; None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_load_report(report, baseline=None):
+    """Prints single/concurrent p50/p95/p99 and throughput, with the change against `baseline` if given."""
+    for name, results in report.items():
+        if name == 'meta':
+            continue
+        print(f"{name}: {results['dataset']}")
+        print(f"{'function':<48}{'mode':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>11}"
+              + (f"{'p95 vs base':>13}" if baseline else ""))
+        for label, modes in results.items():
+            if label in ('dataset', 'pool', 'read_cache'):
+                continue
+            for mode, stats in modes.items():
+                row = (f"{label:<48}{mode:>12}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}"
+                       f"{stats['p99_ms']:>10.3f}{stats['ops_per_sec']:>11.0f}")
+                base = (baseline or {}).get(name, {}).get(label, {}).get(mode)
+                if base:
+                    row += f"{(stats['p95_ms'] / base['p95_ms'] - 1) * 100 if base['p95_ms'] else 0:>+12.1f}%"
+                print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend_fitness on each storage engine.")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--sqlite-path", default=":memory:", help="SQLite database file (default: in-memory)")
+    parser.add_argument("--postgres", action="store_true", help="also benchmark the Postgres database from DB_CONFIG")
+    parser.add_argument("--no-read-cache", action="store_true", help="measure reads without the read cache")
+    parser.add_argument("--fanout", type=int, help="compare leaderboards for a user with this many friends")
+    parser.add_argument("--graph", type=int, metavar="EDGES",
+                        help="compare friend-graph queries on a synthetic graph with this many friendships")
+    parser.add_argument("--ranking", type=int, metavar="USERS",
+                        help="global rank on a synthetic dataset of USERS users: SQL vs. in-memory, with accuracy")
+    parser.add_argument("--frontend", type=int, metavar="USERS",
+                        help="frontend import, startup and per-section rerun times on a synthetic dataset of USERS users")
+    parser.add_argument("--search-scale", help="comma-separated user counts for the search_users benchmark")
+    parser.add_argument("--load", type=int, metavar="USERS",
+                        help="generate a synthetic dataset of this many users and run the load suite")
+    parser.add_argument("--threads", type=int, default=8, help="workers for the concurrent load runs")
+    parser.add_argument("--seed", type=int, default=42, help="dataset and user-sampling seed")
+    parser.add_argument("--async-clients", help="with --load: comma-separated client counts for the async dashboard test")
+    parser.add_argument("--compare", help="earlier --load --json result to compare against")
+    parser.add_argument("--json", help="write the raw results to this file")
+    args = parser.parse_args()
+    if args.no_read_cache:
+        backend.configure_read_cache(max_entries=0)
+
+    if args.load:
+        engine = create_engine("postgres", **backend.DB_CONFIG) if args.postgres else create_engine("sqlite", path=args.sqlite_path)
+        report = {
+            'meta': {
+                'commit': git_commit(), 'engine': engine.name, 'users': args.load, 'threads': args.threads,
+                'iterations': args.iterations, 'seed': args.seed, 'read_cache': not args.no_read_cache,
+                'python': platform.python_version(), 'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+        }
+        if args.async_clients:
+            counts = [int(count) for count in args.async_clients.split(",")]
+            report['meta']['async_clients'] = counts
+            report[engine.name] = run_async_scaling(engine, args.load, counts, args.iterations, args.seed)
+        else:
+            report[engine.name] = run_load(engine, args.load, args.iterations, args.threads, args.seed)
+        baseline = None
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+            print(f"Comparing with {args.compare} (commit {baseline.get('meta', {}).get('commit')})")
+        print_load_report(report, baseline)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2, default=str)
+        return
+
+    if args.search_scale:
+        engine = create_engine("postgres", **backend.DB_CONFIG) if args.postgres else create_engine("sqlite", path=args.sqlite_path)
+        sizes = [int(size) for size in args.search_scale.split(",")]
+        report = {engine.name: run_search_scaling(engine, sizes, args.iterations)}
+        print_report(report)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2, default=str)
+        return
+
+    if args.graph:
+        engine = create_engine("postgres", **backend.DB_CONFIG) if args.postgres else create_engine("sqlite", path=args.sqlite_path)
+        report = {engine.name: run_graph_comparison(engine, args.graph, args.iterations, args.seed)}
+        print_report(report)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2, default=str)
+        return
+
+    if args.frontend:
+        engine = create_engine("postgres", **backend.DB_CONFIG) if args.postgres else create_engine("sqlite", path=args.sqlite_path)
+        report = {engine.name: run_frontend_benchmark(engine, args.frontend, args.iterations, args.seed)}
+        if len(report[engine.name]) > 1:
+            print_report(report)
+        print_import_report(report)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2, default=str)
+        return
+
+    if args.ranking:
+        engine = create_engine("postgres", **backend.DB_CONFIG) if args.postgres else create_engine("sqlite", path=args.sqlite_path)
+        report = {engine.name: run_ranking_comparison(engine, args.ranking, args.iterations, args.seed)}
+        print_report(report)
+        print_ranking_accuracy(report)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2, default=str)
+        return
+
+    if args.fanout:
+        engine = create_engine("postgres", **backend.DB_CONFIG) if args.postgres else create_engine("sqlite", path=args.sqlite_path)
+        report = {engine.name: run_leaderboard_comparison(engine, args.fanout, args.iterations)}
+        print_report(report)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2, default=str)
+        return
+
+    engines = [create_engine("sqlite", path=args.sqlite_path)]
+    if args.postgres:
+        engines.append(create_engine("postgres", **backend.DB_CONFIG))
+
+    report = {}
+    for engine in engines:
+        report[engine.name] = run_engine(engine, args.iterations)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
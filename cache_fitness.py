@@ -0,0 +1,125 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+
+def _freeze(value):
+    """Turns list/dict/set arguments into hashable equivalents for use in cache keys."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class ReadCache:
+    """
+    TTL + LRU cache for backend read functions.
+    Every entry carries a set of tags such as ("user", 7) or ("goals", 7);
+    writes call invalidate() with the tags they touch and only those entries are dropped.
+    """
+
+    def __init__(self, max_entries=2048, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, stored_at, tags)
+        self._by_tag = {}              # tag -> set of keys
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so a read that raced with a write is not cached
+        self._generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        """Returns (True, value) on a hit and (False, None) on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                self._remove(key)
+                self._stats['expirations'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return True, entry[0]
+
+    def put(self, key, value, tags, generation):
+        """Stores a value read while the cache was at `generation`, unless a write happened since."""
+        with self._lock:
+            if generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            tags = frozenset(tags)
+            self._entries[key] = (value, time.monotonic(), tags)
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def invalidate(self, *tags):
+        """Drops every entry carrying any of the given tags."""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._by_tag.get(tag, ())):
+                    if key in self._entries:
+                        self._remove(key)
+                        self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_tag.clear()
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['entries'] = len(self._entries)
+        lookups = snapshot['hits'] + snapshot['misses']
+        snapshot['hit_ratio'] = snapshot['hits'] / lookups if lookups else 0.0
+        return snapshot
+
+
+def cached_read(cache, tags=None, cache_if=lambda result: result is not None):
+    """
+    Decorator caching a read function in `cache`, keyed by function name and arguments.
+    `tags(args, result)` returns the tags the entry depends on; results rejected by
+    `cache_if` (by default None, i.e. a database error) are never cached.
+    """
+    def decorator(fn):
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (name, _freeze(args), _freeze(kwargs))
+            hit, value = cache.get(key)
+            if hit:
+                return value
+            generation = cache.generation()
+            value = fn(*args, **kwargs)
+            if cache_if(value):
+                cache.put(key, value, tags(args, value) if tags else (), generation)
+            return value
+
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
@@ -0,0 +1,161 @@
+"""
+Synthetic, reproducible datasets for benchmarking backend_fitness at realistic scale.
+
+    python datagen_fitness.py --users 10000                      # into FITNESS_DB_ENGINE / FITNESS_SQLITE_PATH
+    python datagen_fitness.py --users 100000 --seed 7 --friends-per-user 4
+
+Workout counts per user follow a power law (most users log a handful of workouts,
+a few log hundreds), each workout has 1-6 exercises from a fixed catalog, and the
+friend graph grows by preferential attachment so degrees are heavy-tailed too.
+Users, friends and goals go in through engine.bulk_insert; workouts and exercises
+through import_fitness.bulk_import_workouts, so the summaries are maintained as usual.
+The same seed always produces the same dataset.
+"""
+import argparse
+import random
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+from backend_fitness import DB_ERRORS, db_cursor, get_engine
+from import_fitness import bulk_import_workouts
+
+EXERCISE_CATALOG = [
+    ("Squat", 60, 180), ("Bench Press", 40, 140), ("Deadlift", 80, 220), ("Overhead Press", 30, 80),
+    ("Barbell Row", 40, 120), ("Pull Up", 0, 30), ("Lunge", 10, 60), ("Leg Press", 80, 300),
+    ("Bicep Curl", 8, 30), ("Plank", 0, 0), ("Running", 0, 0), ("Rowing", 0, 0),
+]
+GOAL_TEMPLATES = [
+    ("Work out {n} times a week", (2, 6)),
+    ("Run {n} km this month", (20, 120)),
+    ("Squat {n} kg", (80, 200)),
+    ("Log {n} workouts this year", (50, 250)),
+]
+FIRST_NAMES = ["Aaron", "Alice", "Amir", "Ana", "Arjun", "Ben", "Chen", "Dana", "Eva", "Farah", "Ivan", "Jo",
+               "Kai", "Lena", "Maria", "Mike", "Mina", "Noah", "Omar", "Priya", "Sam", "Samira", "Tom", "Zoe"]
+LAST_NAMES = ["Ahmed", "Brown", "Garcia", "Ito", "Kim", "Khan", "Lopez", "Müller", "Nguyen", "Okafor",
+              "Patel", "Rossi", "Silva", "Smith", "Wang", "Yilmaz"]
+
+
+# --- Distributions ---
+
+def workout_count(rng, alpha=1.3, minimum=1, maximum=1000):
+    """Pareto-distributed number of workouts for one user."""
+    return min(maximum, int(minimum * rng.paretovariate(alpha)))
+
+
+def preferential_attachment(rng, user_ids, edges_per_user=3):
+    """
+    Barabási-Albert style friend graph: each new user befriends `edges_per_user` existing
+    users chosen proportionally to their degree. Returns (user_id, friend_id) pairs, one per friendship.
+    """
+    edges = []
+    endpoints = []  # every user appears once per friendship they are in
+    for i, user_id in enumerate(user_ids):
+        targets = set()
+        wanted = min(edges_per_user, i)
+        while len(targets) < wanted:
+            # Mix in a uniform pick so early users do not absorb every edge
+            if endpoints and rng.random() < 0.9:
+                targets.add(rng.choice(endpoints))
+            else:
+                targets.add(user_ids[rng.randrange(i)])
+        for friend_id in targets:
+            edges.append((user_id, friend_id))
+            endpoints.extend((user_id, friend_id))
+    return edges
+
+
+def generate_workouts(rng, user_ids, days=365, max_workouts=1000):
+    """Yields (line_number, record) workout records in the shape import_fitness expects."""
+    today = date.today()
+    line_no = 0
+    for user_id in user_ids:
+        count = workout_count(rng, maximum=max_workouts)
+        for _ in range(count):
+            line_no += 1
+            exercises = []
+            for name, low, high in rng.sample(EXERCISE_CATALOG, rng.randint(1, 6)):
+                exercises.append({
+                    'name': name,
+                    'sets': rng.randint(1, 5),
+                    'reps': rng.randint(3, 15),
+                    'weight': float(rng.randint(low, high)) if high else None,
+                })
+            yield line_no, {
+                'user_id': user_id,
+                'workout_date': (today - timedelta(days=rng.randrange(days))).isoformat(),
+                'duration_minutes': max(5, int(rng.gauss(50, 20))),
+                'exercises': exercises,
+            }
+
+
+# --- Loading ---
+
+def generate(num_users=1000, seed=42, friends_per_user=3, days=365, max_workouts=1000,
+             batch_rows=20000, progress=None):
+    """
+    Generates and loads a dataset into the active backend engine.
+    Returns a dict with the new user ids, row counts and load time.
+    """
+    rng = random.Random(seed)
+    engine = get_engine()
+    # Emails carry a run tag so several datasets can share one database
+    tag = uuid.UUID(int=rng.getrandbits(128)).hex[:8]
+    start = time.perf_counter()
+
+    with db_cursor(commit=True) as cur:
+        user_ids = engine.allocate_ids(cur, "users", "user_id", num_users)
+        engine.bulk_insert(cur, "users", ("user_id", "name", "email", "weight"), [
+            (user_id, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+             f"user_{i}_{tag}@example.com", round(rng.uniform(50, 110), 1))
+            for i, user_id in enumerate(user_ids)
+        ])
+        friendships = preferential_attachment(rng, user_ids, friends_per_user)
+        # Friendships are stored in both directions (see add_friend)
+        engine.bulk_insert(cur, "friends", ("user_id", "friend_id"),
+                           friendships + [(friend_id, user_id) for user_id, friend_id in friendships])
+        goals = []
+        for user_id in user_ids:
+            for template, (low, high) in rng.sample(GOAL_TEMPLATES, rng.randint(0, 3)):
+                target = rng.randint(low, high)
+                goals.append((user_id, template.format(n=target), target, rng.randint(0, target)))
+        engine.bulk_insert(cur, "goals", ("user_id", "goal_description", "target_value", "progress_value"), goals)
+
+    stats = bulk_import_workouts(generate_workouts(rng, user_ids, days, max_workouts),
+                                 batch_rows=batch_rows, progress=progress)
+    return {
+        'user_ids': user_ids,
+        'users': len(user_ids),
+        'friendships': len(friendships),
+        'goals': len(goals),
+        'workouts': stats['workouts'],
+        'exercises': stats['exercises'],
+        'rejected': stats['rejected'],
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a synthetic fitness dataset into the configured database.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--friends-per-user", type=int, default=3, help="edges each new user adds to the friend graph")
+    parser.add_argument("--days", type=int, default=365, help="how far back workouts are spread")
+    parser.add_argument("--max-workouts", type=int, default=1000, help="cap on any one user's workout count")
+    parser.add_argument("--batch-rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    try:
+        result = generate(args.users, args.seed, args.friends_per_user, args.days, args.max_workouts, args.batch_rows)
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return 1
+    print(f"Loaded {result['users']} users, {result['friendships']} friendships, {result['goals']} goals, "
+          f"{result['workouts']} workouts and {result['exercises']} exercises in {result['seconds']:.1f}s.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Streaming export of training history (workouts joined with their exercises).
+
+    python export_fitness.py --user 7 history.csv
+    python export_fitness.py --format jsonl all_users.jsonl
+    python export_fitness.py --format parquet --chunk-size 50000 all_users.parquet   # needs pyarrow
+
+Rows are read through backend_fitness.iter_training_log (a server-side cursor) and written
+chunk by chunk, so memory stays bounded by --chunk-size whatever the size of the history.
+Each chunk becomes one Parquet row group. Throughput and peak RSS are reported at the end.
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import weakref
+from datetime import date
+from decimal import Decimal
+
+from backend_fitness import DB_ERRORS, EXPORT_COLUMNS, iter_training_log
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is only needed for Parquet output
+    pyarrow = None
+
+FORMATS = ("csv", "jsonl", "parquet")
+MIME_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+
+def available_formats():
+    """The formats this installation can write (Parquet needs pyarrow)."""
+    return [fmt for fmt in FORMATS if fmt != "parquet" or pyarrow is not None]
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# --- Writers ---
+
+class CSVWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+class JSONLWriter:
+    def __init__(self, path):
+        self.file = open(path, "w")
+
+    def write(self, rows):
+        self.file.writelines(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=_json_value) + "\n" for row in rows
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Writes each chunk as one row group."""
+
+    def __init__(self, path):
+        if pyarrow is None:
+            raise RuntimeError("Parquet export requires pyarrow to be installed.")
+        self.schema = pyarrow.schema([
+            ("user_id", pyarrow.int64()),
+            ("workout_id", pyarrow.int64()),
+            ("workout_date", pyarrow.date32()),
+            ("duration_minutes", pyarrow.int32()),
+            ("exercise_name", pyarrow.string()),
+            ("sets", pyarrow.int32()),
+            ("reps", pyarrow.int32()),
+            ("weight", pyarrow.float64()),
+        ])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows):
+        columns = [list(values) for values in zip(*rows)]
+        # Decimal weights (Postgres) and ISO date strings (SQLite) are normalised here
+        columns[7] = [None if w is None else float(w) for w in columns[7]]
+        columns[2] = [date.fromisoformat(d) if isinstance(d, str) else d for d in columns[2]]
+        self.writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+            schema=self.schema
+        ))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {"csv": CSVWriter, "jsonl": JSONLWriter, "parquet": ParquetWriter}
+
+
+# --- Export ---
+
+def export_training_log(path, fmt="csv", user_id=None, chunk_size=10000, progress=None):
+    """
+    Streams one user's training log (or everyone's, when user_id is None) into `path`.
+    Returns a dict with rows, bytes, seconds, rows_per_sec and peak_rss_mb.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    writer = WRITERS[fmt](path)
+    rows_written = 0
+    start = time.perf_counter()
+    try:
+        for chunk in iter_training_log(user_id, chunk_size):
+            writer.write(chunk)
+            rows_written += len(chunk)
+            if progress:
+                progress(rows_written, time.perf_counter() - start)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows_written,
+        'bytes': os.path.getsize(path),
+        'seconds': elapsed,
+        'rows_per_sec': rows_written / elapsed if elapsed else 0.0,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def export_to_tempfile(user_id, fmt="csv", chunk_size=10000):
+    """
+    Exports one user's training log to a temporary file and returns its path, for callers
+    (the Streamlit download button) that hand a file on rather than an in-memory string.
+    The caller removes the file.
+    """
+    fd, path = tempfile.mkstemp(prefix=f"fitness_{user_id}_", suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        export_training_log(path, fmt, user_id, chunk_size)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ExportFile:
+    """
+    A finished export in a temporary file. The file is removed by remove(), or at the latest
+    when the object is garbage-collected (e.g. with the Streamlit session holding it) or the
+    process exits, so abandoned exports do not pile up in the temp directory.
+    """
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self._finalizer = weakref.finalize(self, _remove_quietly, path)
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path)
+
+    def remove(self):
+        self._finalizer()
+
+
+def _print_progress(rows, elapsed):
+    print(f"  {rows:,} rows ({rows / elapsed if elapsed else 0:,.0f} rows/s)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export training history to CSV, JSONL or Parquet.")
+    parser.add_argument("path", help="output file")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the output file's extension")
+    parser.add_argument("--user", type=int, help="export one user id (default: every user)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows per fetch / Parquet row group")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    fmt = args.format or os.path.splitext(args.path)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        parser.error(f"Cannot infer the format from {args.path!r}; pass --format.")
+
+    try:
+        result = export_training_log(args.path, fmt, args.user, args.chunk_size,
+                                     progress=None if args.quiet else _print_progress)
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return 1
+    except RuntimeError as e:
+        print(e)
+        return 2
+    print(f"Exported {result['rows']:,} rows ({result['bytes'] / 1e6:.1f} MB) in {result['seconds']:.2f}s: "
+          f"{result['rows_per_sec']:,.0f} rows/s, peak RSS {result['peak_rss_mb']:.0f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+"""
+The main views of frontend_fitness, one module per menu entry, each with a render(user_id).
+
+frontend_fitness imports a section only when it is first selected, so a Streamlit worker
+starts without loading what it does not show, and heavy libraries (pandas and numpy via
+analytics_fitness) stay unloaded until a view that needs them runs. Tables are passed to
+Streamlit as plain rows or column dicts wherever no DataFrame operation is needed.
+"""
+
+# How many matches the user pickers show at once
+USER_PICKER_SIZE = 20
+
+# Menu label -> module in this package, in menu order
+SECTIONS = {
+    "Log Workout": "log_workout",
+    "View Progress": "progress",
+    "Set Goals": "goals",
+    "Friends & Leaderboard": "friends",
+    "Business Insights": "insights",
+}
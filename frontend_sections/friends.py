@@ -0,0 +1,84 @@
+import streamlit as st
+
+from backend_fitness import (
+    add_friend, get_friends_list, get_global_rank, get_global_top, get_leaderboard_data, remove_friend,
+    search_users, suggest_friends
+)
+from frontend_sections import USER_PICKER_SIZE
+
+
+def render(user_id):
+    st.subheader("Friends")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("#### Add Friends")
+        friend_search = st.text_input("Find a user", placeholder="Name or email")
+        candidates = search_users(friend_search, limit=USER_PICKER_SIZE, exclude_user_id=user_id) or []
+        user_map = {user[1]: user[0] for user in candidates}
+        if user_map:
+            friend_to_add = st.selectbox("Select a user to add:", list(user_map.keys()))
+            if st.button("Add Friend"):
+                success, message = add_friend(user_id, user_map[friend_to_add])
+                if success:
+                    st.success(message)
+                else:
+                    st.warning(message)
+        elif friend_search:
+            st.info("No users match that search.")
+
+        suggestions = suggest_friends(user_id, limit=5)
+        if suggestions:
+            st.markdown("#### People You May Know")
+            for suggested_id, suggested_name, mutual in suggestions:
+                name_col, add_col = st.columns([3, 1])
+                name_col.write(f"{suggested_name} ({mutual} mutual friend{'s' if mutual != 1 else ''})")
+                if add_col.button("Add", key=f"suggest_{suggested_id}"):
+                    success, message = add_friend(user_id, suggested_id)
+                    if success:
+                        st.rerun()
+                    st.warning(message)
+
+    with col2:
+        st.markdown("#### Your Friends List")
+        friends_list = get_friends_list(user_id)
+        if friends_list:
+            st.dataframe([{"Friend ID": friend_id, "Name": name} for friend_id, name in friends_list])
+            friend_to_remove = st.selectbox("Select a friend to remove:", [friend_id for friend_id, _ in friends_list])
+            if st.button("Remove Friend"):
+                if remove_friend(user_id, friend_to_remove):
+                    st.success("Friend removed.")
+                    st.rerun()
+                else:
+                    st.error("Failed to remove friend.")
+        else:
+            st.info("You have no friends yet. Add some to get started!")
+
+    st.markdown("---")
+    st.subheader("Leaderboard")
+    leaderboard_metric = st.selectbox(
+        "Select a metric:",
+        options=["total_workouts_last_30_days", "total_duration_last_30_days", "avg_duration_all_time"],
+        format_func=lambda x: x.replace('_', ' ').title()
+    )
+    leaderboard_data = get_leaderboard_data(leaderboard_metric, user_id)
+    if leaderboard_data:
+        # A bar column instead of a Styler gradient, which needed pandas and matplotlib
+        top_value = max(value for _, value in leaderboard_data) or 1
+        st.dataframe(
+            [{"User Name": name, "Metric Value": value} for name, value in leaderboard_data],
+            column_config={"Metric Value": st.column_config.ProgressColumn(
+                "Metric Value", format="%.1f", min_value=0, max_value=float(top_value))},
+            hide_index=True,
+        )
+    else:
+        st.info("No data available for the leaderboard.")
+
+    # Standing among all users, from the in-memory global rankings
+    standing = get_global_rank(user_id, leaderboard_metric)
+    if standing:
+        approx = "" if standing['exact'] else "about "
+        st.metric("Global rank", f"#{standing['rank']:,} of {standing['users']:,}",
+                  f"{approx}top {max(standing['top_percent'], 0.1):.1f}%", delta_color="off")
+    global_top = get_global_top(leaderboard_metric, k=5)
+    if global_top:
+        st.caption("Top of all users: " + ", ".join(f"{name} ({value:,.0f})" for _, name, value in global_top))
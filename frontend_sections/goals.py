@@ -0,0 +1,59 @@
+import streamlit as st
+
+from backend_fitness import GOAL_TYPES, create_goal, delete_goal, get_goals, update_goals_progress
+
+
+def render(user_id):
+    st.subheader("Set & Track Personal Goals")
+    goal_type = st.selectbox("Goal type", list(GOAL_TYPES), format_func=GOAL_TYPES.get)
+    with st.form("new_goal_form"):
+        goal_description = st.text_area("Goal Description")
+        exercise_name = st.text_input("Exercise") if goal_type == 'max_weight' else None
+        target_value = st.number_input("Target Value (e.g., workouts per week)", min_value=1)
+        submitted = st.form_submit_button("Set Goal")
+        if submitted:
+            if create_goal(user_id, goal_description, target_value, goal_type, exercise_name):
+                st.success("Goal set successfully!")
+            else:
+                st.error("Failed to set goal.")
+
+    st.markdown("---")
+    st.markdown("### Your Current Goals")
+    goals = get_goals(user_id)
+    if goals:
+        # Manual progress is edited in one form and saved with a single batched write
+        with st.form("goal_progress_form"):
+            new_progress = {}
+            for goal_id, description, target, progress, kind, exercise in goals:
+                st.write(f"**Goal ID:** {goal_id}")
+                st.write(f"**Description:** {description}")
+                if kind == 'manual':
+                    st.write(f"**Target:** {target}")
+                else:
+                    st.write(f"**Target:** {target} ({GOAL_TYPES[kind]}{': ' + exercise if exercise else ''})")
+                if kind == 'manual':
+                    new_progress[goal_id] = st.number_input("Update Progress:", min_value=0, value=progress or 0,
+                                                            key=f"goal_progress_{goal_id}")
+                else:
+                    st.progress(min(progress / target, 1.0) if target else 0.0, text=f"Progress: {progress}")
+            if new_progress:
+                if st.form_submit_button("Save progress"):
+                    saved = {goal[0]: goal[3] for goal in goals}
+                    changed = {goal_id: value for goal_id, value in new_progress.items() if value != saved[goal_id]}
+                    if update_goals_progress(user_id, changed):
+                        st.success(f"Saved progress for {len(changed)} goal(s).")
+                    else:
+                        st.error("Failed to update goal progress.")
+            else:
+                st.form_submit_button("Refresh")
+
+        for goal_id, *_ in goals:
+            if st.button(f"Delete Goal {goal_id}", key=f"delete_goal_{goal_id}"):
+                if delete_goal(goal_id):
+                    st.success(f"Goal {goal_id} deleted successfully.")
+                    st.rerun()
+                else:
+                    st.error("Failed to delete goal.")
+
+    else:
+        st.info("No goals set yet.")
@@ -0,0 +1,29 @@
+import streamlit as st
+
+from backend_fitness import get_business_insights
+
+
+def render(user_id):
+    st.subheader("Your Fitness Journey Insights")
+    insights = get_business_insights(user_id)
+    if insights:
+        col1, col2, col3, col4, col5 = st.columns(5)
+        with col1:
+            st.metric(label="Total Workouts", value=insights['total_workouts'])
+        with col2:
+            st.metric(label="Total Duration (min)", value=f"{insights['total_duration']:.2f}")
+        with col3:
+            st.metric(label="Avg Duration (min)", value=f"{insights['avg_duration']:.2f}")
+        with col4:
+            st.metric(label="Min Duration (min)", value=f"{insights['min_duration']:.2f}")
+        with col5:
+            st.metric(label="Max Duration (min)", value=f"{insights['max_duration']:.2f}")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric(label="Workouts (last 30 days)", value=insights['workouts_last_30_days'])
+        with col2:
+            st.metric(label="Duration, last 30 days (min)", value=f"{insights['duration_last_30_days']:.2f}")
+        with col3:
+            st.metric(label="Duration Std Dev (min)", value=f"{insights['stddev_duration']:.2f}")
+    else:
+        st.info("No workout data available to generate insights.")
@@ -0,0 +1,48 @@
+import uuid
+from datetime import date
+
+import streamlit as st
+
+from backend_fitness import create_workout_with_exercises
+
+
+def render(user_id):
+    # Namespace for the form's idempotency keys
+    if 'workout_nonce' not in st.session_state:
+        st.session_state.workout_nonce = uuid.uuid4()
+
+    st.subheader("Log a New Workout")
+    with st.form("new_workout_form"):
+        workout_date = st.date_input("Date", value=date.today())
+        duration = st.number_input("Duration (minutes)", min_value=1)
+        st.markdown("### Add Exercises")
+        exercises = []
+        num_exercises = st.number_input("Number of exercises", min_value=1, value=1)
+        for i in range(num_exercises):
+            st.markdown(f"**Exercise {i+1}**")
+            ex_name = st.text_input("Exercise Name", key=f"ex_name_{i}")
+            ex_sets = st.number_input("Sets", min_value=1, key=f"ex_sets_{i}")
+            ex_reps = st.number_input("Reps", min_value=1, key=f"ex_reps_{i}")
+            ex_weight = st.number_input("Weight (kg)", min_value=0.0, format="%.2f", key=f"ex_weight_{i}")
+            exercises.append({'name': ex_name, 'sets': ex_sets, 'reps': ex_reps, 'weight': ex_weight})
+
+        submitted = st.form_submit_button("Log Workout")
+        if submitted:
+            # Same form contents under the same nonce give the same key, so a double click or a
+            # rerun mid-submit is deduplicated by the backend instead of logging the workout twice
+            idempotency_key = uuid.uuid5(
+                st.session_state.workout_nonce,
+                repr((user_id, workout_date, duration, exercises))
+            ).hex
+            workout_id = create_workout_with_exercises(user_id, workout_date, duration,
+                                                       exercises, idempotency_key=idempotency_key)
+            if not workout_id:
+                st.error("Failed to log workout.")
+            elif workout_id == st.session_state.get('last_workout_id'):
+                st.info("This workout was already logged.")
+            else:
+                st.session_state.last_workout_id = workout_id
+                st.success("Workout logged successfully!")
+    if st.session_state.get('last_workout_id') and st.button("Log another identical workout"):
+        st.session_state.workout_nonce = uuid.uuid4()
+        st.session_state.last_workout_id = None
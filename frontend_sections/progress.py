@@ -0,0 +1,153 @@
+import os
+
+import streamlit as st
+
+from backend_fitness import DB_ERRORS, get_exercises_for_workouts, get_workouts_page
+from export_fitness import (
+    MIME_TYPES as EXPORT_MIME_TYPES, ExportFile, available_formats as available_export_formats, export_to_tempfile
+)
+
+# Larger exports are pointed at the export_fitness CLI instead of the download button
+DOWNLOAD_MAX_BYTES = int(os.environ.get("FITNESS_EXPORT_DOWNLOAD_MAX_MB", 200)) * 2**20
+
+EXERCISE_COLUMNS = {
+    'workout_id': "Workout ID", 'workout_date': "Date", 'exercise_name': "Exercise Name",
+    'sets': "Sets", 'reps': "Reps", 'weight': "Weight (kg)",
+}
+
+
+def render(user_id):
+    st.subheader("Workout History & Progress")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        start_date = st.date_input("From", value=None)
+    with col2:
+        end_date = st.date_input("To", value=None)
+    with col3:
+        page_size = st.selectbox("Workouts per page", [10, 25, 50, 100], index=1)
+
+    # Keyset cursors of the pages visited so far; reset whenever the filters change
+    history_filter = (user_id, start_date, end_date, page_size)
+    if st.session_state.get('history_filter') != history_filter:
+        st.session_state.history_filter = history_filter
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+
+    workouts, next_cursor = get_workouts_page(
+        user_id, limit=page_size, after=cursors[-1], start_date=start_date, end_date=end_date
+    )
+    if workouts:
+        st.markdown(f"#### Your Workout History (page {len(cursors)})")
+        st.dataframe([{"Workout ID": workout_id, "Date": workout_date, "Duration (min)": duration}
+                      for workout_id, workout_date, duration in workouts])
+
+        nav1, nav2 = st.columns(2)
+        with nav1:
+            if st.button("← Newer", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with nav2:
+            if st.button("Older →", disabled=next_cursor is None):
+                cursors.append(next_cursor)
+                st.rerun()
+
+        # Exercises for the whole page in one round trip, as columns
+        workout_ids = [workout[0] for workout in workouts]
+        page_exercises = get_exercises_for_workouts(workout_ids)
+        if page_exercises and page_exercises['workout_id']:
+            with st.expander("All exercises on this page"):
+                st.dataframe({label: page_exercises[column] for column, label in EXERCISE_COLUMNS.items()})
+
+        selected_workout_id = st.selectbox("Select a workout to view exercises:", workout_ids)
+        if selected_workout_id:
+            rows = []
+            if page_exercises:
+                rows = [{"Exercise Name": name, "Sets": sets, "Reps": reps, "Weight (kg)": weight}
+                        for workout_id, name, sets, reps, weight in zip(
+                            page_exercises['workout_id'], page_exercises['exercise_name'],
+                            page_exercises['sets'], page_exercises['reps'], page_exercises['weight'])
+                        if workout_id == selected_workout_id]
+            if rows:
+                st.markdown("#### Exercises for Selected Workout")
+                st.dataframe(rows)
+            else:
+                st.info("No exercises found for this workout.")
+    elif len(cursors) > 1 or start_date or end_date:
+        st.info("No workouts found for this date range.")
+    else:
+        st.info("No workouts logged yet. Go to 'Log Workout' to get started.")
+
+    # Full-history export, streamed to a temp file that is removed once downloaded or with the session
+    with st.expander("Export full history"):
+        export_format = st.selectbox("Format", available_export_formats(), format_func=str.upper)
+        export_key = (user_id, export_format)
+        if st.button("Prepare export"):
+            _discard_export()
+            try:
+                st.session_state.export = ExportFile(export_to_tempfile(user_id, export_format), export_format)
+                st.session_state.export_key = export_key
+            except DB_ERRORS as e:
+                st.error(f"Failed to prepare the export: {e}")
+        export = st.session_state.get('export')
+        if export and st.session_state.get('export_key') == export_key:
+            if export.size > DOWNLOAD_MAX_BYTES:
+                # The download button holds the whole file in server memory
+                st.warning(f"This export is larger than {DOWNLOAD_MAX_BYTES // 2**20} MB; run "
+                           f"`python export_fitness.py --user {user_id} history.{export_format}` instead.")
+                _discard_export()
+            else:
+                with open(export.path, "rb") as export_file:
+                    st.download_button(
+                        "Download", export_file, file_name=f"fitness_history.{export_format}",
+                        mime=EXPORT_MIME_TYPES[export_format], on_click=_discard_export
+                    )
+        elif export:
+            _discard_export()
+
+    _render_trends(user_id)
+
+
+def _discard_export():
+    export = st.session_state.pop('export', None)
+    st.session_state.pop('export_key', None)
+    if export:
+        export.remove()
+
+
+def _render_trends(user_id):
+    """Trends over the whole history, computed in memory by analytics_fitness (pandas/numpy)."""
+    from analytics_fitness import get_user_analytics
+
+    analytics = get_user_analytics(user_id)
+    if not len(analytics.sets()):
+        return
+    st.markdown("#### Trends")
+    streaks = analytics.streaks()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric(label="Current Streak (days)", value=streaks['current_days'])
+    with col2:
+        st.metric(label="Longest Streak (days)", value=streaks['longest_days'])
+    with col3:
+        st.metric(label="Weekly Streak", value=streaks['current_weeks'])
+    with col4:
+        st.metric(label="Personal Records", value=len(analytics.personal_records()))
+
+    volume_tab, strength_tab, consistency_tab = st.tabs(["Volume", "Strength", "Consistency"])
+    with volume_tab:
+        period = st.radio("Period", ["week", "month"], horizontal=True, format_func=str.title)
+        st.bar_chart(analytics.volume(period, by_exercise=True))
+    with strength_tab:
+        best = analytics.estimated_1rm()
+        exercise = st.selectbox("Exercise", best.index.tolist())
+        if exercise:
+            st.line_chart(analytics.e1rm_history(exercise).rename("Estimated 1RM (kg)"))
+        st.markdown("Recent personal records")
+        st.dataframe(analytics.personal_records().head(10).rename(columns={
+            'workout_date': "Date", 'exercise_name': "Exercise", 'sets': "Sets", 'reps': "Reps",
+            'weight': "Weight (kg)", 'e1rm': "Estimated 1RM (kg)"
+        }), hide_index=True)
+    with consistency_tab:
+        st.line_chart(analytics.rolling()[["minutes_7d_avg", "minutes_28d_avg"]].rename(columns={
+            'minutes_7d_avg': "Minutes (7-day avg)", 'minutes_28d_avg': "Minutes (28-day avg)"
+        }))
@@ -0,0 +1,79 @@
+"""
+Recompute tracked goal progress (workouts per week, minutes per month, max weight) in batches.
+
+    python goals_fitness.py                  # every tracked goal, e.g. after a stats rebuild
+    python goals_fitness.py --user 7         # one user's goals
+    python goals_fitness.py --batch-size 500
+
+Logging or importing a workout keeps goals current on its own; this is for backfills (stats
+rebuilds) and for refreshing weekly/monthly goals at the start of a new period.
+When sharded every shard's goals are walked in turn.
+"""
+import argparse
+import sys
+import time
+
+from backend_fitness import DB_ERRORS, db_connection, invalidate_read_cache, on_each_database, recompute_goal_progress
+
+
+def recompute_goals(user_id=None, batch_size=1000, progress=None):
+    """
+    Walks the tracked goals in goal_id order and recomputes `batch_size` of them per transaction.
+    Weekly and monthly progress is read from the summaries, which leave out workouts whose events
+    are still pending, so the aggregation worker adds those once and only once. Returns the number
+    of goals recomputed.
+    """
+    user_filter = " AND user_id = %s" if user_id is not None else ""
+    user_params = (user_id,) if user_id is not None else ()
+    done = 0
+    start = time.perf_counter()
+
+    def recompute():
+        nonlocal done
+        last_id = 0
+        while True:
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT goal_id, user_id FROM goals
+                        WHERE goal_type <> 'manual' AND goal_id > %s{user_filter}
+                        ORDER BY goal_id
+                        LIMIT %s;
+                    """, (last_id,) + user_params + (batch_size,))
+                    batch = cur.fetchall()
+                    if not batch:
+                        return
+                    recompute_goal_progress(cur, [goal_id for goal_id, _ in batch])
+                conn.commit()
+            invalidate_read_cache(*{("goals", owner) for _, owner in batch})
+            done += len(batch)
+            last_id = batch[-1][0]
+            if progress:
+                progress(done, time.perf_counter() - start)
+
+    on_each_database(recompute)
+    return done
+
+
+def _print_progress(done, elapsed):
+    print(f"  {done} goals recomputed ({done / elapsed if elapsed else 0:,.0f} goals/s)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute tracked goal progress from logged workouts.")
+    parser.add_argument("--user", type=int, help="limit to one user id")
+    parser.add_argument("--batch-size", type=int, default=1000, help="goals recomputed per transaction")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        done = recompute_goals(args.user, args.batch_size, progress=None if args.quiet else _print_progress)
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return 1
+    print(f"Recomputed {done} tracked goals.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+from collections import Counter
+
+from leaderboard_fitness import _LRUCache
+
+
+class AdjacencyCache:
+    """
+    In-process cache of friend sets (user_id -> frozenset of friend ids) for hot users,
+    behind backend_fitness.get_friend_ids and the suggestion/mutual-friend functions.
+    add_friend/remove_friend/delete_users call the invalidate_* hooks; entries also
+    expire after `ttl` seconds so changes made by other processes are picked up.
+    """
+
+    def __init__(self, max_users=100000, ttl=300.0):
+        self.neighbors = _LRUCache(max_users, ttl)
+
+    def get_many(self, user_ids):
+        """Returns ({user_id: friend set} for cached users, [user ids that must be loaded])."""
+        found, missing = {}, []
+        for user_id in user_ids:
+            friends = self.neighbors.get(user_id)
+            if friends is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = friends
+        return found, missing
+
+    def put_many(self, adjacency):
+        for user_id, friends in adjacency.items():
+            self.neighbors.put(user_id, frozenset(friends))
+
+    def invalidate_friendship(self, user_id, friend_id):
+        self.neighbors.discard(user_id, friend_id)
+
+    def invalidate_users(self, *user_ids):
+        """Drops deleted users and every friend set that mentions them."""
+        deleted = set(user_ids)
+        self.neighbors.discard(*user_ids)
+        self.neighbors.discard_where(lambda _, friends: not deleted.isdisjoint(friends))
+
+    def clear(self):
+        self.neighbors.clear()
+
+    def stats(self):
+        return {
+            'friend_sets': len(self.neighbors),
+            'hits': self.neighbors.hits,
+            'misses': self.neighbors.misses,
+        }
+
+
+def load_adjacency(cur, engine, user_ids):
+    """
+    Reads the friend sets of `user_ids` in one query. Friendships are stored in both
+    directions, so this is a range scan of the UNIQUE (user_id, friend_id) index per user
+    and costs O(degree). Users without friends map to an empty set.
+    """
+    adjacency = {user_id: set() for user_id in user_ids}
+    cur.execute(f"SELECT user_id, friend_id FROM friends WHERE {engine.id_list_condition('user_id')};",
+                (engine.id_list_param(user_ids),))
+    for user_id, friend_id in cur.fetchall():
+        adjacency[user_id].add(friend_id)
+    return adjacency
+
+
+def query_suggestions(cur, user_id, limit=10):
+    """
+    friends_of_friends in SQL, for users whose friends' sets are not cached: two hops of
+    index range scans, grouped by candidate. Returns (candidate_id, name, mutual_count) rows.
+    """
+    cur.execute("""
+        SELECT f2.friend_id, u.name, COUNT(*) AS mutual
+        FROM friends f1
+        JOIN friends f2 ON f2.user_id = f1.friend_id
+        JOIN users u ON u.user_id = f2.friend_id
+        WHERE f1.user_id = %(user_id)s
+          AND f2.friend_id <> %(user_id)s
+          AND NOT EXISTS (SELECT 1 FROM friends f3 WHERE f3.user_id = %(user_id)s AND f3.friend_id = f2.friend_id)
+        GROUP BY f2.friend_id, u.name
+        ORDER BY mutual DESC, f2.friend_id
+        LIMIT %(limit)s;
+    """, {'user_id': user_id, 'limit': limit})
+    return cur.fetchall()
+
+
+def mutual_friend_counts(friends, adjacency, candidates):
+    """Number of friends each candidate shares with a user whose friend set is `friends`."""
+    return {candidate: len(friends & adjacency[candidate]) for candidate in candidates}
+
+
+def friends_of_friends(user_id, friends, adjacency, limit=10):
+    """
+    Friend suggestions for `user_id`: people two hops away who are not already friends,
+    ranked by how many friends they share with the user (then by id, for stable output).
+    `adjacency` holds the friend set of every friend. Returns (candidate_id, mutual_count) pairs.
+    """
+    counts = Counter()
+    for friend_id in friends:
+        counts.update(adjacency.get(friend_id, ()))
+    for excluded in friends | {user_id}:
+        counts.pop(excluded, None)
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return ranked[:limit]
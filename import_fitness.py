@@ -0,0 +1,342 @@
+"""
+Streaming bulk import of workouts and their exercises.
+
+    python import_fitness.py history.jsonl --rejects rejects.jsonl
+    python import_fitness.py export.csv --batch-rows 20000
+
+JSONL: one workout per line,
+    {"user_id": 1, "workout_date": "2024-05-01", "duration_minutes": 45,
+     "exercises": [{"name": "Squat", "sets": 5, "reps": 5, "weight": 100}]}
+
+CSV: one exercise per row with the columns
+    user_id, workout_date, duration_minutes, exercise_name, sets, reps, weight[, workout_ref][, idempotency_key]
+Consecutive rows with the same workout_ref (or, without that column, the same
+user_id/workout_date/duration_minutes) form one workout. A row with an empty
+exercise_name is a workout without exercises.
+
+A workout may carry an "idempotency_key" (unique per user, at most 64 characters). Keyed
+workouts that were already imported or logged are skipped and counted as duplicates, so a
+file or message stream can be delivered more than once. Each batch also updates the summaries
+and the tracked goals of the users it imported workouts for.
+
+When sharded, each batch is split by the shard of each workout's user and every part is written
+on its shard in its own transaction, with workout ids from the directory.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from contextlib import nullcontext
+from datetime import date
+
+from backend_fitness import (
+    DB_ERRORS, allocate_ids, db_connection, get_engine, get_shard_map, record_workout_stats, recompute_goal_progress,
+    clear_leaderboard_cache, invalidate_read_cache, with_retries
+)
+
+WORKOUT_COLUMNS = ("workout_id", "user_id", "workout_date", "duration_minutes")
+EXERCISE_COLUMNS = ("workout_id", "exercise_name", "sets", "reps", "weight")
+
+
+class RejectedRecord(ValueError):
+    """Raised by the parsers for a record that cannot be imported."""
+
+
+# --- Parsing ---
+
+def _parse_exercise(raw):
+    name = (raw.get('name') or raw.get('exercise_name') or "").strip()
+    if not name:
+        raise RejectedRecord("exercise name is required")
+    try:
+        sets = int(raw['sets']) if raw.get('sets') not in (None, "") else None
+        reps = int(raw['reps']) if raw.get('reps') not in (None, "") else None
+        weight = float(raw['weight']) if raw.get('weight') not in (None, "") else None
+    except (TypeError, ValueError) as e:
+        raise RejectedRecord(f"invalid exercise value: {e}")
+    return {'name': name, 'sets': sets, 'reps': reps, 'weight': weight}
+
+
+def parse_workout(raw):
+    """Validates one workout record and returns it in the shape create_workout_with_exercises expects."""
+    try:
+        user_id = int(raw['user_id'])
+        workout_date = date.fromisoformat(str(raw['workout_date']))
+        duration_minutes = int(raw['duration_minutes'])
+    except KeyError as e:
+        raise RejectedRecord(f"missing field {e}")
+    except (TypeError, ValueError) as e:
+        raise RejectedRecord(f"invalid workout value: {e}")
+    if duration_minutes <= 0:
+        raise RejectedRecord("duration_minutes must be positive")
+    exercises = raw.get('exercises') or []
+    if not isinstance(exercises, list):
+        raise RejectedRecord("exercises must be a list")
+    idempotency_key = raw.get('idempotency_key') or None
+    if idempotency_key is not None and len(str(idempotency_key)) > 64:
+        raise RejectedRecord("idempotency_key is longer than 64 characters")
+    return {
+        'user_id': user_id,
+        'workout_date': workout_date,
+        'duration_minutes': duration_minutes,
+        'exercises': [_parse_exercise(ex) for ex in exercises],
+        'idempotency_key': str(idempotency_key) if idempotency_key is not None else None,
+    }
+
+
+def read_jsonl(f):
+    """Yields (line_number, raw_record) for each non-empty line."""
+    for line_no, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, RejectedRecord(f"invalid JSON: {e.msg}", line)
+
+
+def read_csv(f):
+    """Yields (line_number, raw_record), grouping consecutive exercise rows into one workout."""
+    reader = csv.DictReader(f)
+    current_key, current, first_line = None, None, None
+    for row in reader:
+        line_no = reader.line_num
+        if 'workout_ref' in row and row['workout_ref']:
+            key = (row.get('user_id'), row['workout_ref'])
+        else:
+            key = (row.get('user_id'), row.get('workout_date'), row.get('duration_minutes'))
+        if key != current_key:
+            if current is not None:
+                yield first_line, current
+            current_key, first_line = key, line_no
+            current = {
+                'user_id': row.get('user_id'),
+                'workout_date': row.get('workout_date'),
+                'duration_minutes': row.get('duration_minutes'),
+                'idempotency_key': row.get('idempotency_key'),
+                'exercises': [],
+            }
+        if row.get('exercise_name'):
+            current['exercises'].append(row)
+    if current is not None:
+        yield first_line, current
+
+
+# --- Loading ---
+
+def _write_batch(batch):
+    """
+    Inserts a batch of parsed workouts in one transaction.
+    Workout ids are reserved up front so exercises can be mapped to their workout without RETURNING per row.
+    Keyed workouts whose idempotency key is already taken (or repeated within the batch) are skipped.
+    The summaries and the owners' tracked goals are brought up to date in the same transaction.
+    Returns (workouts, exercises, duplicates, rejected) where rejected lists (line, raw, error) for unknown users.
+    """
+    engine = get_engine()
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            user_ids = {workout['user_id'] for _, _, workout in batch}
+            cur.execute(
+                f"SELECT user_id FROM users WHERE {engine.id_list_condition('user_id')};",
+                (engine.id_list_param(user_ids),)
+            )
+            known_users = {row[0] for row in cur.fetchall()}
+
+            rejected = [(line_no, raw, f"unknown user_id {workout['user_id']}")
+                        for line_no, raw, workout in batch if workout['user_id'] not in known_users]
+            accepted = [workout for _, _, workout in batch if workout['user_id'] in known_users]
+            if not accepted:
+                return 0, 0, 0, rejected
+
+            workout_ids = allocate_ids(cur, "workouts", "workout_id", len(accepted))
+            kept = _claim_keys(cur, list(zip(workout_ids, accepted)))
+            duplicates = len(accepted) - len(kept)
+            if not kept:
+                return 0, 0, duplicates, rejected
+
+            workout_rows = []
+            exercise_rows = []
+            for workout_id, workout in kept:
+                workout_rows.append((workout_id, workout['user_id'], workout['workout_date'], workout['duration_minutes']))
+                for ex in workout['exercises']:
+                    exercise_rows.append((workout_id, ex['name'], ex['sets'], ex['reps'], ex['weight']))
+
+            engine.bulk_insert(cur, "workouts", WORKOUT_COLUMNS, workout_rows)
+            if exercise_rows:
+                engine.bulk_insert(cur, "exercises", EXERCISE_COLUMNS, exercise_rows)
+            record_workout_stats(cur, [row[1:] for row in workout_rows])
+            owners = {row[1] for row in workout_rows}
+            cur.execute(f"""
+                SELECT goal_id FROM goals
+                WHERE goal_type <> 'manual' AND {engine.id_list_condition('user_id')};
+            """, (engine.id_list_param(owners),))
+            goal_ids = [row[0] for row in cur.fetchall()]
+            if goal_ids:
+                recompute_goal_progress(cur, goal_ids)
+        conn.commit()
+    invalidate_read_cache(*{(tag, owner) for owner in owners for tag in ("workouts", "goals")})
+    return len(workout_rows), len(exercise_rows), duplicates, rejected
+
+
+def _shard_parts(batch):
+    """
+    The batch split by the shard holding each workout's user, as (shard, part) pairs, or
+    [(None, batch)] for a single database. Raises ShardMovingError if any of them is being moved.
+    """
+    shard_map = get_shard_map()
+    if shard_map is None:
+        return [(None, batch)]
+    groups = shard_map.group({workout['user_id'] for _, _, workout in batch}, write=True)
+    shard_of = {user_id: shard for shard, user_ids in groups.items() for user_id in user_ids}
+    parts = {}
+    for item in batch:
+        parts.setdefault(shard_of[item[2]['user_id']], []).append(item)
+    return list(parts.items())
+
+
+def _write_part(shard, part):
+    with get_shard_map().using(shard) if shard is not None else nullcontext():
+        return _write_batch(part)
+
+
+# Keys claimed per INSERT, well inside SQLite's limit on bound parameters
+KEY_CLAIM_ROWS = 300
+
+
+def _claim_keys(cur, workouts):
+    """
+    Records the idempotency keys of (workout_id, workout) pairs, skipping keys already taken -
+    earlier in the batch, by an earlier import or logged workout, or by a concurrent writer - and
+    returns the pairs to insert: the unkeyed ones and those whose key this transaction claimed.
+    """
+    first = {}
+    for workout_id, workout in workouts:
+        if workout['idempotency_key']:
+            first.setdefault((workout['user_id'], workout['idempotency_key']), workout_id)
+    claimed = set()
+    rows = [(user_id, key, workout_id) for (user_id, key), workout_id in first.items()]
+    for start in range(0, len(rows), KEY_CLAIM_ROWS):
+        chunk = rows[start:start + KEY_CLAIM_ROWS]
+        cur.execute(f"""
+            INSERT INTO workout_idempotency (user_id, idempotency_key, workout_id)
+            VALUES {", ".join(["(%s, %s, %s)"] * len(chunk))}
+            ON CONFLICT (user_id, idempotency_key) DO NOTHING
+            RETURNING workout_id;
+        """, [value for row in chunk for value in row])
+        claimed.update(row[0] for row in cur.fetchall())
+    return [(workout_id, workout) for workout_id, workout in workouts
+            if not workout['idempotency_key'] or workout_id in claimed]
+
+
+def bulk_import_workouts(records, batch_rows=5000, rejects=None, progress=None):
+    """
+    Imports an iterable of (line_number, raw_record) as produced by read_jsonl/read_csv.
+    Rows (workouts + exercises) are committed every `batch_rows`; each batch (when sharded, each
+    shard's part of it) is atomic.
+    Malformed records, and every record of a batch that fails in the database, are written to
+    the `rejects` file object as JSON lines. Returns a dict of counters including rows_per_sec.
+    """
+    stats = {'workouts': 0, 'exercises': 0, 'duplicates': 0, 'rejected': 0, 'batches': 0, 'failed_batches': 0}
+    start = time.perf_counter()
+
+    def reject(line_no, raw, error):
+        stats['rejected'] += 1
+        if rejects is not None:
+            rejects.write(json.dumps({'line': line_no, 'error': str(error), 'record': raw}, default=str) + "\n")
+
+    def fail(batch, e):
+        print(f"Database error: {e}")
+        stats['failed_batches'] += 1
+        for line_no, raw, _ in batch:
+            reject(line_no, raw, e)
+
+    def flush(batch):
+        try:
+            parts = _shard_parts(batch)
+        except DB_ERRORS as e:
+            fail(batch, e)
+            return
+        for shard, part in parts:
+            try:
+                workouts, exercises, duplicates, rejected = with_retries(_write_part, shard, part)
+            except DB_ERRORS as e:
+                fail(part, e)
+                continue
+            stats['batches'] += 1
+            stats['workouts'] += workouts
+            stats['exercises'] += exercises
+            stats['duplicates'] += duplicates
+            for line_no, raw, error in rejected:
+                reject(line_no, raw, error)
+        if progress:
+            progress(stats, time.perf_counter() - start)
+
+    batch = []
+    batch_size = 0
+    for line_no, raw in records:
+        try:
+            if isinstance(raw, RejectedRecord):
+                raise raw
+            if not isinstance(raw, dict):
+                raise RejectedRecord("record must be an object")
+            workout = parse_workout(raw)
+        except RejectedRecord as e:
+            reject(line_no, e.args[1] if len(e.args) > 1 else raw, e.args[0])
+            continue
+        batch.append((line_no, raw, workout))
+        batch_size += 1 + len(workout['exercises'])
+        if batch_size >= batch_rows:
+            flush(batch)
+            batch, batch_size = [], 0
+    if batch:
+        flush(batch)
+    # Leaderboard metrics cached in this process no longer match the summaries
+    clear_leaderboard_cache()
+
+    stats['seconds'] = time.perf_counter() - start
+    rows = stats['workouts'] + stats['exercises']
+    stats['rows_per_sec'] = rows / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    return stats
+
+
+def import_file(path, fmt=None, batch_rows=5000, rejects_path=None, progress=None):
+    """Imports a CSV or JSONL file; the format is taken from the extension unless given."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    rejects = open(rejects_path, "w") if rejects_path else None
+    try:
+        with open(path, newline="") as f:
+            records = read_csv(f) if fmt == "csv" else read_jsonl(f)
+            return bulk_import_workouts(records, batch_rows=batch_rows, rejects=rejects, progress=progress)
+    finally:
+        if rejects is not None:
+            rejects.close()
+
+
+def _print_progress(stats, elapsed):
+    rows = stats['workouts'] + stats['exercises']
+    print(f"  batch {stats['batches']}: {stats['workouts']} workouts, {stats['exercises']} exercises, "
+          f"{stats['rejected']} rejected ({rows / elapsed if elapsed else 0:,.0f} rows/s)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import workouts and exercises from CSV or JSONL.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--batch-rows", type=int, default=5000, help="rows committed per transaction")
+    parser.add_argument("--rejects", help="file receiving malformed records as JSON lines")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    stats = import_file(args.path, args.format, args.batch_rows, args.rejects,
+                        progress=None if args.quiet else _print_progress)
+    print(f"Imported {stats['workouts']} workouts and {stats['exercises']} exercises "
+          f"in {stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/s); "
+          f"{stats['duplicates']} duplicates skipped, {stats['rejected']} rejected, "
+          f"{stats['failed_batches']} failed batches.")
+    return 1 if stats['failed_batches'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
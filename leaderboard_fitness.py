@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+# Metrics the leaderboard can rank by, mapped to their position in a UserMetrics tuple
+LEADERBOARD_METRICS = {
+    'total_workouts_last_30_days': 1,
+    'total_duration_last_30_days': 2,
+    'avg_duration_all_time': 3,
+    'total_duration_all_time': 4,
+}
+DEFAULT_METRIC = 'total_duration_all_time'
+
+
+class _LRUCache:
+    """Thread-safe LRU map whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def discard(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def discard_where(self, predicate):
+        with self._lock:
+            for key in [k for k, (v, _) in self._data.items() if predicate(k, v)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class LeaderboardCache:
+    """
+    In-process cache behind get_leaderboard_data.
+    Holds each user's friend set (including the user) and each user's
+    (name, workouts_30d, duration_30d, avg_duration, total_duration) metrics.
+    Writers call the invalidate_* hooks; entries also expire after `ttl` seconds
+    so changes made by other processes are eventually picked up, and metrics
+    are dropped when the day changes because the 30-day window moves.
+    """
+
+    def __init__(self, max_users=100000, ttl=300.0):
+        self.friends = _LRUCache(max_users, ttl)
+        self.metrics = _LRUCache(max_users, ttl)
+        self._day = date.today()
+
+    def _roll_day(self):
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self.metrics.clear()
+
+    def get_friend_set(self, user_id):
+        return self.friends.get(user_id)
+
+    def put_friend_set(self, user_id, members):
+        self.friends.put(user_id, frozenset(members))
+
+    def get_metrics(self, user_ids):
+        """Returns ({user_id: metrics} for cached users, [user ids that must be loaded])."""
+        self._roll_day()
+        found, missing = {}, []
+        for user_id in user_ids:
+            metrics = self.metrics.get(user_id)
+            if metrics is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = metrics
+        return found, missing
+
+    def put_metrics(self, user_id, metrics):
+        self.metrics.put(user_id, metrics)
+
+    def invalidate_friendship(self, user_id, friend_id):
+        self.friends.discard(user_id, friend_id)
+
+    def invalidate_user_metrics(self, *user_ids):
+        self.metrics.discard(*user_ids)
+
+    def invalidate_user(self, user_id):
+        """Drops everything mentioning a deleted user."""
+        self.invalidate_users(user_id)
+
+    def invalidate_users(self, *user_ids):
+        """Drops everything mentioning any of the deleted users, in one pass over the friend sets."""
+        deleted = set(user_ids)
+        self.metrics.discard(*user_ids)
+        self.friends.discard(*user_ids)
+        self.friends.discard_where(lambda _, members: not deleted.isdisjoint(members))
+
+    def clear(self):
+        self.friends.clear()
+        self.metrics.clear()
+
+    def stats(self):
+        return {
+            'friend_sets': len(self.friends),
+            'friend_set_hits': self.friends.hits,
+            'friend_set_misses': self.friends.misses,
+            'user_metrics': len(self.metrics),
+            'metric_hits': self.metrics.hits,
+            'metric_misses': self.metrics.misses,
+        }
+
+
+def rank(metrics_by_user, metric):
+    """Orders users by the chosen metric (descending, then name) as (name, metric_value) rows."""
+    position = LEADERBOARD_METRICS.get(metric, LEADERBOARD_METRICS[DEFAULT_METRIC])
+    rows = [(m[0], m[position]) for m in metrics_by_user.values()]
+    rows.sort(key=lambda row: (-row[1], row[0]))
+    return rows
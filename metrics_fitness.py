@@ -0,0 +1,481 @@
+import contextvars
+import functools
+import inspect
+import json
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (an estimate, like histogram_quantile)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def cumulative(self):
+        total = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            total += n
+            yield bound, total
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': {("+Inf" if bound == float("inf") else str(bound)): n for bound, n in self.cumulative()},
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+        }
+
+
+class FunctionMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.dedupes = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.connect_time = Histogram(LATENCY_BUCKETS)
+        self.execute_time = Histogram(LATENCY_BUCKETS)
+        self.fetch_time = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.rows = Histogram(ROW_BUCKETS)
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'dedupes': self.dedupes,
+            'latency_seconds': self.latency.to_dict(),
+            'connect_seconds': self.connect_time.to_dict(),
+            'execute_seconds': self.execute_time.to_dict(),
+            'fetch_seconds': self.fetch_time.to_dict(),
+            'queries_per_call': self.queries.to_dict(),
+            'rows_per_call': self.rows.to_dict(),
+        }
+
+
+class CallRecord:
+    """What one backend call (or one query budget) spent on the database."""
+
+    __slots__ = ('function', 'queries', 'rows', 'connect', 'execute', 'fetch', 'error', 'retries', 'dedupes',
+                 'by_function')
+
+    def __init__(self, function=None):
+        self.function = function
+        self.queries = 0
+        self.rows = 0
+        self.connect = 0.0
+        self.execute = 0.0
+        self.fetch = 0.0
+        self.error = False
+        self.retries = 0
+        self.dedupes = 0
+        self.by_function = {}
+
+    def add(self, other):
+        self.queries += other.queries
+        self.rows += other.rows
+        self.connect += other.connect
+        self.execute += other.execute
+        self.fetch += other.fetch
+
+
+class Instrumentation:
+    """
+    Registry of per-function metrics plus a slow-query log.
+    Backend functions are wrapped with `instrumented`, and db_connection hands out
+    InstrumentedConnection proxies so every execute/fetch is attributed to the active call.
+    """
+
+    def __init__(self, slow_query_ms=200.0, slow_log_size=200, enabled=True):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self._functions = {}
+        self._lock = threading.Lock()
+        self._call = contextvars.ContextVar("fitness_call", default=None)
+        self._budget = contextvars.ContextVar("fitness_query_budget", default=None)
+        self._capture = contextvars.ContextVar("fitness_query_capture", default=None)
+
+    # --- Recording ---
+
+    def _current(self):
+        return self._call.get()
+
+    def record_connect(self, seconds):
+        call = self._current()
+        if call is not None:
+            call.connect += seconds
+
+    def record_error(self):
+        call = self._current()
+        if call is not None:
+            call.error = True
+
+    def record_retry(self):
+        """A transient error made the active call run its transaction again."""
+        call = self._current()
+        if call is not None:
+            call.retries += 1
+
+    def record_dedupe(self):
+        """The active call's write was a replay of one already applied (same idempotency key)."""
+        call = self._current()
+        if call is not None:
+            call.dedupes += 1
+
+    def record_query(self, sql, params, seconds):
+        captured = self._capture.get()
+        if captured is not None:
+            captured.append((sql, params))
+        call = self._current()
+        if call is not None:
+            call.queries += 1
+            call.execute += seconds
+        if seconds * 1000 >= self.slow_query_ms:
+            self.slow_queries.append({
+                'at': time.time(),
+                'function': call.function if call is not None else None,
+                'ms': round(seconds * 1000, 3),
+                'sql': _WHITESPACE.sub(" ", sql).strip() if isinstance(sql, str) else repr(sql),
+                'params': param_shape(params),
+            })
+
+    def record_fetch(self, rows, seconds):
+        call = self._current()
+        if call is not None:
+            call.rows += rows
+            call.fetch += seconds
+
+    def _finish(self, call, seconds, nested=False):
+        with self._lock:
+            metrics = self._functions.get(call.function)
+            if metrics is None:
+                metrics = self._functions[call.function] = FunctionMetrics()
+            metrics.calls += 1
+            metrics.errors += int(call.error)
+            metrics.retries += call.retries
+            metrics.dedupes += call.dedupes
+            metrics.latency.observe(seconds)
+            metrics.connect_time.observe(call.connect)
+            metrics.execute_time.observe(call.execute)
+            metrics.fetch_time.observe(call.fetch)
+            metrics.queries.observe(call.queries)
+            metrics.rows.observe(call.rows)
+        budget = self._budget.get()
+        if budget is not None:
+            if not nested:  # a nested call's work is already part of its caller's totals
+                budget.add(call)
+            per_function = budget.by_function.setdefault(call.function, [0, 0])
+            per_function[0] += 1
+            per_function[1] += call.queries
+
+    @contextmanager
+    def call(self, function):
+        """Attributes the database work done inside the block to `function`."""
+        if not self.enabled:
+            yield None
+            return
+        parent = self._call.get()
+        record = CallRecord(function)
+        token = self._call.set(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self._call.reset(token)
+            self._finish(record, time.perf_counter() - start, nested=parent is not None)
+            if parent is not None:
+                parent.add(record)
+
+    def instrumented(self, fn):
+        """Decorator recording latency, queries, rows and connect/execute/fetch time for fn."""
+        name = fn.__name__
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                if not self.enabled:
+                    yield from fn(*args, **kwargs)
+                    return
+                # The call is active only while the generator runs, one step at a time: calls the
+                # consumer makes between items are its own, and latency excludes the consumer's time
+                parent = self._call.get()
+                record = CallRecord(name)
+                elapsed = 0.0
+                steps = fn(*args, **kwargs)
+
+                def step(method, *values):
+                    nonlocal elapsed
+                    token = self._call.set(record)
+                    start = time.perf_counter()
+                    try:
+                        return method(*values)
+                    finally:
+                        elapsed += time.perf_counter() - start
+                        self._call.reset(token)
+
+                try:
+                    value = None
+                    while True:
+                        try:
+                            item = step(steps.send, value)
+                        except StopIteration:
+                            return
+                        value = yield item
+                finally:
+                    step(steps.close)
+                    self._finish(record, elapsed, nested=parent is not None)
+                    if parent is not None:
+                        parent.add(record)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.call(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    @contextmanager
+    def query_budget(self):
+        """Totals every instrumented call made inside the block (e.g. one Streamlit rerun)."""
+        record = CallRecord("budget")
+        token = self._budget.set(record)
+        try:
+            yield record
+        finally:
+            self._budget.reset(token)
+
+    @contextmanager
+    def capture(self):
+        """Collects (sql, params) for every statement executed inside the block, e.g. to EXPLAIN them."""
+        statements = []
+        token = self._capture.set(statements)
+        try:
+            yield statements
+        finally:
+            self._capture.reset(token)
+
+    def start_budget(self):
+        """Non-context-manager form of query_budget for scripts that run top to bottom."""
+        record = CallRecord("budget")
+        self._budget.set(record)
+        return record
+
+    # --- Export ---
+
+    def snapshot(self):
+        with self._lock:
+            return {name: metrics.to_dict() for name, metrics in self._functions.items()}
+
+    def export_json(self):
+        return json.dumps({
+            'functions': self.snapshot(),
+            'slow_queries': list(self.slow_queries),
+            'slow_query_ms': self.slow_query_ms,
+        }, indent=2, default=str)
+
+    def export_prometheus(self):
+        """Renders every histogram and counter in the Prometheus text exposition format."""
+        lines = []
+        families = [
+            ('latency', 'fitness_backend_call_seconds', "Backend function latency."),
+            ('connect_time', 'fitness_backend_connect_seconds', "Time spent checking out a connection per call."),
+            ('execute_time', 'fitness_backend_execute_seconds', "Time spent executing SQL per call."),
+            ('fetch_time', 'fitness_backend_fetch_seconds', "Time spent fetching rows per call."),
+            ('queries', 'fitness_backend_queries_per_call', "SQL statements issued per call."),
+            ('rows', 'fitness_backend_rows_per_call', "Rows fetched per call."),
+        ]
+        with self._lock:
+            functions = sorted(self._functions.items())
+            lines.append("# HELP fitness_backend_calls_total Backend function calls.")
+            lines.append("# TYPE fitness_backend_calls_total counter")
+            for name, metrics in functions:
+                lines.append(f'fitness_backend_calls_total{{function="{name}"}} {metrics.calls}')
+            lines.append("# HELP fitness_backend_errors_total Backend calls that hit a database error.")
+            lines.append("# TYPE fitness_backend_errors_total counter")
+            for name, metrics in functions:
+                lines.append(f'fitness_backend_errors_total{{function="{name}"}} {metrics.errors}')
+            lines.append("# HELP fitness_backend_retries_total Transactions re-run after a transient database error.")
+            lines.append("# TYPE fitness_backend_retries_total counter")
+            for name, metrics in functions:
+                lines.append(f'fitness_backend_retries_total{{function="{name}"}} {metrics.retries}')
+            lines.append("# HELP fitness_backend_dedupes_total Writes skipped because their idempotency key was already used.")
+            lines.append("# TYPE fitness_backend_dedupes_total counter")
+            for name, metrics in functions:
+                lines.append(f'fitness_backend_dedupes_total{{function="{name}"}} {metrics.dedupes}')
+            for attr, family, help_text in families:
+                lines.append(f"# HELP {family} {help_text}")
+                lines.append(f"# TYPE {family} histogram")
+                for name, metrics in functions:
+                    histogram = getattr(metrics, attr)
+                    for bound, total in histogram.cumulative():
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f'{family}_bucket{{function="{name}",le="{le}"}} {total}')
+                    lines.append(f'{family}_sum{{function="{name}"}} {histogram.sum}')
+                    lines.append(f'{family}_count{{function="{name}"}} {histogram.count}')
+        lines.append("# HELP fitness_backend_slow_queries Slow queries currently held in the log.")
+        lines.append("# TYPE fitness_backend_slow_queries gauge")
+        lines.append(f"fitness_backend_slow_queries {len(self.slow_queries)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._functions.clear()
+        self.slow_queries.clear()
+
+
+def param_shape(params):
+    """Describes query parameters by type and size only, so the slow log never holds user data."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: param_shape(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        if len(params) > 20:
+            return f"{type(params).__name__}[{len(params)}]"
+        return [_value_shape(value) for value in params]
+    return _value_shape(params)
+
+
+def _value_shape(value):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, str):
+        return f"str[{len(value)}]"
+    return type(value).__name__
+
+
+class InstrumentedCursor:
+    """Cursor proxy timing execute/fetch calls and counting rows for the active call."""
+
+    def __init__(self, cursor, instrumentation):
+        self._cursor = cursor
+        self._instrumentation = instrumentation
+
+    def _timed_execute(self, method, sql, params):
+        start = time.perf_counter()
+        try:
+            return method(sql, params) if params is not None else method(sql)
+        finally:
+            self._instrumentation.record_query(sql, params, time.perf_counter() - start)
+
+    def execute(self, sql, params=None):
+        return self._timed_execute(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, seq_of_params)
+        finally:
+            self._instrumentation.record_query(sql, f"{len(seq_of_params)} rows", time.perf_counter() - start)
+
+    def copy_expert(self, sql, file):
+        start = time.perf_counter()
+        try:
+            return self._cursor.copy_expert(sql, file)
+        finally:
+            self._instrumentation.record_query(sql, None, time.perf_counter() - start)
+
+    def _timed_fetch(self, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        rows = 0 if result is None else (len(result) if isinstance(result, list) else 1)
+        self._instrumentation.record_fetch(rows, time.perf_counter() - start)
+        return result
+
+    def fetchone(self):
+        return self._timed_fetch(self._cursor.fetchone)
+
+    def fetchall(self):
+        return self._timed_fetch(self._cursor.fetchall)
+
+    def fetchmany(self, size=None):
+        return self._timed_fetch(self._cursor.fetchmany, *(() if size is None else (size,)))
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # e.g. itersize on a psycopg2 named cursor
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._cursor.__exit__(exc_type, exc, tb)
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors are InstrumentedCursors; everything else passes through."""
+
+    def __init__(self, conn, instrumentation):
+        self._conn = conn
+        self._instrumentation = instrumentation
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._instrumentation)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return self._conn.commit()
+        finally:
+            call = self._instrumentation._current()
+            if call is not None:
+                call.execute += time.perf_counter() - start
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
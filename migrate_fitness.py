@@ -0,0 +1,658 @@
+"""
+Versioned schema migrations for the Postgres database, plus an EXPLAIN-based index check.
+
+    python migrate_fitness.py status
+    python migrate_fitness.py apply                       # every pending migration
+    python migrate_fitness.py apply --with-partitioning   # also range-partition workouts by month
+    python migrate_fitness.py rollback                    # undo the latest migration
+    python migrate_fitness.py rollback --to 1             # undo everything after version 1
+    python migrate_fitness.py baseline                    # mark a database loaded from "Fitness tracker.sql" as version 1
+    python migrate_fitness.py partitions --months-ahead 12
+    python migrate_fitness.py check                       # EXPLAIN every backend read; fail on table scans
+
+Migrations run against the database from backend_fitness.DB_CONFIG, each in its own
+transaction, and are recorded in schema_migrations. Migration 1 is the original schema, also
+shipped as "Fitness tracker.sql"; both stay frozen, and every schema change after it is a new
+migration here (and a change to the embedded SQLite schema in storage_fitness). Versions are
+fixed once released: a new migration always goes at the end of MIGRATIONS with the next number.
+`check` also runs on the SQLite engine.
+"""
+import argparse
+import re
+import sys
+from collections import namedtuple
+
+Migration = namedtuple("Migration", "version name up down optional")
+
+MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT now()
+);
+"""
+
+
+# --- Migrations ---
+
+# The schema the application shipped with, before any migration existed
+BASELINE_UP = """
+CREATE TABLE users (
+    user_id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    weight DECIMAL(5,2)
+);
+CREATE TABLE workouts (
+    workout_id SERIAL PRIMARY KEY,
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    workout_date DATE NOT NULL,
+    duration_minutes INT NOT NULL
+);
+CREATE TABLE exercises (
+    exercise_id SERIAL PRIMARY KEY,
+    workout_id INT REFERENCES workouts(workout_id) ON DELETE CASCADE,
+    exercise_name VARCHAR(255) NOT NULL,
+    sets INT,
+    reps INT,
+    weight DECIMAL(6,2)
+);
+CREATE TABLE friends (
+    id SERIAL PRIMARY KEY,
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    friend_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    UNIQUE (user_id, friend_id)
+);
+CREATE TABLE goals (
+    goal_id SERIAL PRIMARY KEY,
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    goal_description TEXT NOT NULL,
+    target_value INT,
+    progress_value INT DEFAULT 0
+);
+"""
+
+# Per-user running aggregates and per-day buckets behind get_business_insights and the
+# leaderboards, filled from the workouts already logged. IF NOT EXISTS / ON CONFLICT: databases
+# created from an edited "Fitness tracker.sql" may have them already, kept up to date
+WORKOUT_SUMMARIES_UP = """
+CREATE TABLE IF NOT EXISTS user_workout_stats (
+    user_id INT PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    workout_count INT NOT NULL DEFAULT 0,
+    duration_sum BIGINT NOT NULL DEFAULT 0,
+    duration_sumsq BIGINT NOT NULL DEFAULT 0,
+    duration_min INT,
+    duration_max INT
+);
+CREATE TABLE IF NOT EXISTS user_workout_daily (
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    workout_date DATE NOT NULL,
+    workout_count INT NOT NULL DEFAULT 0,
+    duration_sum BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, workout_date)
+);
+INSERT INTO user_workout_stats (user_id, workout_count, duration_sum, duration_sumsq, duration_min, duration_max)
+    SELECT user_id, COUNT(*), SUM(duration_minutes), SUM(duration_minutes::BIGINT * duration_minutes),
+           MIN(duration_minutes), MAX(duration_minutes)
+    FROM workouts WHERE user_id IS NOT NULL GROUP BY user_id
+    ON CONFLICT (user_id) DO NOTHING;
+INSERT INTO user_workout_daily (user_id, workout_date, workout_count, duration_sum)
+    SELECT user_id, workout_date, COUNT(*), SUM(duration_minutes)
+    FROM workouts WHERE user_id IS NOT NULL GROUP BY user_id, workout_date
+    ON CONFLICT (user_id, workout_date) DO NOTHING;
+"""
+
+WORKOUT_SUMMARIES_DOWN = """
+DROP TABLE IF EXISTS user_workout_daily;
+DROP TABLE IF EXISTS user_workout_stats;
+"""
+
+# User directory search (search_users): prefix lookups on name/email, trigram substring on name
+USER_SEARCH_INDEXES_UP = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_users_name ON users (name);
+CREATE INDEX IF NOT EXISTS idx_users_name_prefix ON users ((lower(name) COLLATE "C"));
+CREATE INDEX IF NOT EXISTS idx_users_email_prefix ON users ((lower(email) COLLATE "C"));
+CREATE INDEX IF NOT EXISTS idx_users_name_trgm ON users USING gin (lower(name) gin_trgm_ops);
+"""
+
+USER_SEARCH_INDEXES_DOWN = """
+DROP INDEX IF EXISTS idx_users_name_trgm;
+DROP INDEX IF EXISTS idx_users_email_prefix;
+DROP INDEX IF EXISTS idx_users_name_prefix;
+DROP INDEX IF EXISTS idx_users_name;
+"""
+
+# Automatic goal tracking: the goal's type, the exercise 'max_weight' goals follow, and the
+# week/month a 'workouts_per_week' / 'minutes_per_month' goal's progress counts for
+GOAL_TRACKING_UP = """
+ALTER TABLE goals ADD COLUMN IF NOT EXISTS goal_type VARCHAR(32) NOT NULL DEFAULT 'manual';
+ALTER TABLE goals ADD COLUMN IF NOT EXISTS exercise_name VARCHAR(255);
+ALTER TABLE goals ADD COLUMN IF NOT EXISTS period_start DATE;
+CREATE INDEX IF NOT EXISTS idx_goals_user_type ON goals (user_id, goal_type);
+"""
+
+GOAL_TRACKING_DOWN = """
+DROP INDEX IF EXISTS idx_goals_user_type;
+ALTER TABLE goals DROP COLUMN IF EXISTS period_start;
+ALTER TABLE goals DROP COLUMN IF EXISTS exercise_name;
+ALTER TABLE goals DROP COLUMN IF EXISTS goal_type;
+"""
+
+QUERY_INDEXES_UP = """
+-- History pages, get_all_workouts_for_user and iter_workouts become index-only scans
+CREATE INDEX IF NOT EXISTS idx_workouts_user_date_cover
+    ON workouts (user_id, workout_date DESC, workout_id DESC) INCLUDE (duration_minutes);
+DROP INDEX IF EXISTS idx_workouts_user_date;
+-- Exercise lookups by workout, already in exercise_id order, without heap access
+CREATE INDEX IF NOT EXISTS idx_exercises_workout_cover
+    ON exercises (workout_id, exercise_id) INCLUDE (exercise_name, sets, reps, weight);
+DROP INDEX IF EXISTS idx_exercises_workout;
+-- Reverse friend lookups (WHERE friend_id = ...); UNIQUE (user_id, friend_id) covers the other direction
+CREATE INDEX IF NOT EXISTS idx_friends_friend ON friends (friend_id, user_id);
+-- 30-day windows for insights and leaderboards
+CREATE INDEX IF NOT EXISTS idx_daily_user_date_cover
+    ON user_workout_daily (user_id, workout_date) INCLUDE (workout_count, duration_sum);
+ANALYZE workouts;
+ANALYZE exercises;
+ANALYZE friends;
+ANALYZE user_workout_daily;
+"""
+
+QUERY_INDEXES_DOWN = """
+DROP INDEX IF EXISTS idx_daily_user_date_cover;
+DROP INDEX IF EXISTS idx_friends_friend;
+CREATE INDEX IF NOT EXISTS idx_exercises_workout ON exercises (workout_id);
+DROP INDEX IF EXISTS idx_exercises_workout_cover;
+CREATE INDEX IF NOT EXISTS idx_workouts_user_date ON workouts (user_id, workout_date DESC, workout_id DESC);
+DROP INDEX IF EXISTS idx_workouts_user_date_cover;
+"""
+
+# Partitioned tables need the partition key in every unique constraint, so workouts' primary key
+# becomes (workout_id, workout_date) and exercises.workout_id loses its foreign key (delete_user
+# already removes exercises explicitly). Rows outside the created months land in the DEFAULT partition.
+PARTITIONING_UP = """
+CREATE OR REPLACE FUNCTION fitness_create_month_partitions(parent regclass, first_month date, last_month date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month date := date_trunc('month', first_month)::date;
+    partition text;
+    created integer := 0;
+BEGIN
+    WHILE month <= last_month LOOP
+        partition := format('%s_%s', parent, to_char(month, 'YYYY_MM'));
+        IF to_regclass(partition) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                           partition, parent, month, (month + interval '1 month')::date);
+            created := created + 1;
+        END IF;
+        month := (month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END $$;
+
+ALTER TABLE exercises DROP CONSTRAINT IF EXISTS exercises_workout_id_fkey;
+ALTER TABLE workouts RENAME TO workouts_unpartitioned;
+ALTER INDEX workouts_pkey RENAME TO workouts_unpartitioned_pkey;
+ALTER INDEX IF EXISTS idx_workouts_user_date_cover RENAME TO idx_workouts_user_date_cover_old;
+CREATE TABLE workouts (
+    workout_id INT NOT NULL DEFAULT nextval('workouts_workout_id_seq'),
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    workout_date DATE NOT NULL,
+    duration_minutes INT NOT NULL,
+    PRIMARY KEY (workout_id, workout_date)
+) PARTITION BY RANGE (workout_date);
+CREATE TABLE workouts_default PARTITION OF workouts DEFAULT;
+SELECT fitness_create_month_partitions('workouts',
+    COALESCE((SELECT MIN(workout_date) FROM workouts_unpartitioned), CURRENT_DATE),
+    (CURRENT_DATE + interval '12 months')::date);
+INSERT INTO workouts (workout_id, user_id, workout_date, duration_minutes)
+    SELECT workout_id, user_id, workout_date, duration_minutes FROM workouts_unpartitioned;
+ALTER SEQUENCE workouts_workout_id_seq OWNED BY workouts.workout_id;
+DROP TABLE workouts_unpartitioned;
+CREATE INDEX idx_workouts_user_date_cover
+    ON workouts (user_id, workout_date DESC, workout_id DESC) INCLUDE (duration_minutes);
+CREATE INDEX idx_workouts_id ON workouts (workout_id);
+
+ALTER TABLE user_workout_daily RENAME TO user_workout_daily_unpartitioned;
+ALTER INDEX user_workout_daily_pkey RENAME TO user_workout_daily_unpartitioned_pkey;
+ALTER INDEX IF EXISTS idx_daily_user_date_cover RENAME TO idx_daily_user_date_cover_old;
+CREATE TABLE user_workout_daily (
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    workout_date DATE NOT NULL,
+    workout_count INT NOT NULL DEFAULT 0,
+    duration_sum BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, workout_date)
+) PARTITION BY RANGE (workout_date);
+CREATE TABLE user_workout_daily_default PARTITION OF user_workout_daily DEFAULT;
+SELECT fitness_create_month_partitions('user_workout_daily',
+    COALESCE((SELECT MIN(workout_date) FROM user_workout_daily_unpartitioned), CURRENT_DATE),
+    (CURRENT_DATE + interval '12 months')::date);
+INSERT INTO user_workout_daily SELECT * FROM user_workout_daily_unpartitioned;
+DROP TABLE user_workout_daily_unpartitioned;
+CREATE INDEX idx_daily_user_date_cover
+    ON user_workout_daily (user_id, workout_date) INCLUDE (workout_count, duration_sum);
+ANALYZE workouts;
+ANALYZE user_workout_daily;
+"""
+
+PARTITIONING_DOWN = """
+ALTER TABLE workouts RENAME TO workouts_partitioned;
+ALTER INDEX workouts_pkey RENAME TO workouts_partitioned_pkey;
+ALTER INDEX idx_workouts_user_date_cover RENAME TO idx_workouts_user_date_cover_partitioned;
+CREATE TABLE workouts (
+    workout_id INT PRIMARY KEY DEFAULT nextval('workouts_workout_id_seq'),
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    workout_date DATE NOT NULL,
+    duration_minutes INT NOT NULL
+);
+INSERT INTO workouts (workout_id, user_id, workout_date, duration_minutes)
+    SELECT workout_id, user_id, workout_date, duration_minutes FROM workouts_partitioned;
+ALTER SEQUENCE workouts_workout_id_seq OWNED BY workouts.workout_id;
+DROP TABLE workouts_partitioned;
+CREATE INDEX idx_workouts_user_date_cover
+    ON workouts (user_id, workout_date DESC, workout_id DESC) INCLUDE (duration_minutes);
+DELETE FROM exercises WHERE workout_id NOT IN (SELECT workout_id FROM workouts);
+ALTER TABLE exercises ADD CONSTRAINT exercises_workout_id_fkey
+    FOREIGN KEY (workout_id) REFERENCES workouts(workout_id) ON DELETE CASCADE;
+
+ALTER TABLE user_workout_daily RENAME TO user_workout_daily_partitioned;
+ALTER INDEX user_workout_daily_pkey RENAME TO user_workout_daily_partitioned_pkey;
+ALTER INDEX idx_daily_user_date_cover RENAME TO idx_daily_user_date_cover_partitioned;
+CREATE TABLE user_workout_daily (
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    workout_date DATE NOT NULL,
+    workout_count INT NOT NULL DEFAULT 0,
+    duration_sum BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, workout_date)
+);
+INSERT INTO user_workout_daily SELECT * FROM user_workout_daily_partitioned;
+DROP TABLE user_workout_daily_partitioned;
+CREATE INDEX idx_daily_user_date_cover
+    ON user_workout_daily (user_id, workout_date) INCLUDE (workout_count, duration_sum);
+DROP FUNCTION IF EXISTS fitness_create_month_partitions(regclass, date, date);
+"""
+
+# Accounts waiting for purge_fitness; a row disappears in the transaction that deletes its user
+PURGE_QUEUE_UP = """
+CREATE TABLE IF NOT EXISTS purge_queue (
+    user_id INT PRIMARY KEY,
+    requested_at TIMESTAMP NOT NULL DEFAULT now()
+);
+"""
+
+PURGE_QUEUE_DOWN = "DROP TABLE IF EXISTS purge_queue;"
+
+# Every friendship stored in both directions: a user's friends are one range of the
+# UNIQUE (user_id, friend_id) index instead of an OR/UNION over both columns
+SYMMETRIC_FRIENDS_UP = """
+DELETE FROM friends WHERE user_id = friend_id;
+INSERT INTO friends (user_id, friend_id)
+    SELECT friend_id, user_id FROM friends
+    ON CONFLICT (user_id, friend_id) DO NOTHING;
+ALTER TABLE friends ADD CONSTRAINT friends_not_self CHECK (user_id <> friend_id);
+ANALYZE friends;
+"""
+
+SYMMETRIC_FRIENDS_DOWN = """
+ALTER TABLE friends DROP CONSTRAINT IF EXISTS friends_not_self;
+DELETE FROM friends f
+WHERE f.user_id > f.friend_id
+  AND EXISTS (SELECT 1 FROM friends r WHERE r.user_id = f.friend_id AND r.friend_id = f.user_id);
+"""
+
+# Idempotency keys for workout logging. A separate table because a unique index on workouts
+# would have to include workout_date once workouts is partitioned (partition_workouts_by_month)
+WORKOUT_IDEMPOTENCY_UP = """
+CREATE TABLE IF NOT EXISTS workout_idempotency (
+    user_id INT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    idempotency_key VARCHAR(64) NOT NULL,
+    workout_id INT,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, idempotency_key)
+);
+CREATE INDEX IF NOT EXISTS idx_workout_idempotency_created ON workout_idempotency (created_at);
+"""
+
+WORKOUT_IDEMPOTENCY_DOWN = "DROP TABLE IF EXISTS workout_idempotency;"
+
+# Outbox of logged workouts for the aggregation worker (worker_fitness), and its checkpoints.
+# No foreign keys: the write path only appends, and delete_users removes a user's events itself
+WORKOUT_EVENTS_UP = """
+CREATE TABLE IF NOT EXISTS workout_events (
+    event_id BIGSERIAL PRIMARY KEY,
+    event_type VARCHAR(32) NOT NULL DEFAULT 'workout_logged',
+    user_id INT NOT NULL,
+    workout_id INT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_workout_events_user ON workout_events (user_id);
+CREATE TABLE IF NOT EXISTS worker_checkpoints (
+    worker VARCHAR(64) PRIMARY KEY,
+    last_event_id BIGINT NOT NULL DEFAULT 0,
+    events_processed BIGINT NOT NULL DEFAULT 0,
+    batches BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+"""
+
+WORKOUT_EVENTS_DOWN = """
+DROP TABLE IF EXISTS worker_checkpoints;
+DROP TABLE IF EXISTS workout_events;
+"""
+
+# Directory of a sharded deployment (shard_fitness): the shards and their states, users placed
+# off their hash shard, id counters handed out in blocks, and email claims that keep emails unique
+SHARD_DIRECTORY_UP = """
+CREATE TABLE IF NOT EXISTS shards (
+    name VARCHAR(64) PRIMARY KEY,
+    state VARCHAR(16) NOT NULL DEFAULT 'active'
+);
+CREATE TABLE IF NOT EXISTS shard_directory (
+    user_id BIGINT PRIMARY KEY,
+    shard VARCHAR(64) NOT NULL,
+    moving BOOLEAN NOT NULL DEFAULT FALSE,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS shard_ids (
+    name VARCHAR(64) PRIMARY KEY,
+    next_id BIGINT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shard_emails (
+    email VARCHAR(255) PRIMARY KEY,
+    user_id BIGINT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_shard_emails_user ON shard_emails (user_id);
+"""
+
+SHARD_DIRECTORY_DOWN = """
+DROP TABLE IF EXISTS shard_emails;
+DROP TABLE IF EXISTS shard_ids;
+DROP TABLE IF EXISTS shard_directory;
+DROP TABLE IF EXISTS shards;
+"""
+
+MIGRATIONS = [
+    Migration(1, "baseline", BASELINE_UP, None, False),
+    Migration(2, "workout_summaries", WORKOUT_SUMMARIES_UP, WORKOUT_SUMMARIES_DOWN, False),
+    Migration(3, "user_search_indexes", USER_SEARCH_INDEXES_UP, USER_SEARCH_INDEXES_DOWN, False),
+    Migration(4, "goal_tracking", GOAL_TRACKING_UP, GOAL_TRACKING_DOWN, False),
+    Migration(5, "query_indexes", QUERY_INDEXES_UP, QUERY_INDEXES_DOWN, False),
+    Migration(6, "partition_workouts_by_month", PARTITIONING_UP, PARTITIONING_DOWN, True),
+    Migration(7, "purge_queue", PURGE_QUEUE_UP, PURGE_QUEUE_DOWN, False),
+    Migration(8, "symmetric_friends", SYMMETRIC_FRIENDS_UP, SYMMETRIC_FRIENDS_DOWN, False),
+    Migration(9, "workout_idempotency", WORKOUT_IDEMPOTENCY_UP, WORKOUT_IDEMPOTENCY_DOWN, False),
+    Migration(10, "workout_events", WORKOUT_EVENTS_UP, WORKOUT_EVENTS_DOWN, False),
+    Migration(11, "shard_directory", SHARD_DIRECTORY_UP, SHARD_DIRECTORY_DOWN, False),
+]
+
+
+# --- Applying ---
+
+def applied_versions(conn):
+    with conn.cursor() as cur:
+        cur.execute(MIGRATIONS_TABLE)
+        cur.execute("SELECT version, name, applied_at FROM schema_migrations ORDER BY version;")
+        rows = cur.fetchall()
+    conn.commit()
+    return {row[0]: row for row in rows}
+
+
+def status(conn):
+    """Returns (version, name, state) for every known migration."""
+    applied = applied_versions(conn)
+    rows = []
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            state = f"applied {applied[migration.version][2]:%Y-%m-%d %H:%M}"
+        else:
+            state = "pending (optional)" if migration.optional else "pending"
+        rows.append((migration.version, migration.name, state))
+    return rows
+
+
+def apply_migrations(conn, target=None, include_optional=False, fake=False, log=print):
+    """
+    Applies pending migrations up to `target` (default: the latest) in version order,
+    one transaction each. Optional migrations are skipped unless include_optional.
+    With fake=True the migrations are only recorded, e.g. to adopt an existing database.
+    Returns the versions applied.
+    """
+    applied = applied_versions(conn)
+    done = []
+    for migration in MIGRATIONS:
+        if migration.version in applied or (target is not None and migration.version > target):
+            continue
+        if migration.optional and not include_optional:
+            continue
+        try:
+            with conn.cursor() as cur:
+                if not fake:
+                    cur.execute(migration.up)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s);",
+                            (migration.version, migration.name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        log(f"{'Recorded' if fake else 'Applied'} {migration.version:04d} {migration.name}")
+        done.append(migration.version)
+    return done
+
+
+def upgrade(conn, log=print):
+    """
+    Applies every pending required migration. A database created from "Fitness tracker.sql"
+    before migrations existed is recorded as version 1 rather than rebuilt; the migrations
+    after it are written to be no-ops where an older, edited copy of that file already
+    created what they add.
+    """
+    if not applied_versions(conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('users') IS NOT NULL;")
+            existing = cur.fetchone()[0]
+        conn.commit()
+        if existing:
+            apply_migrations(conn, target=1, fake=True, log=log)
+    return apply_migrations(conn, log=log)
+
+
+def rollback_migrations(conn, target=None, log=print):
+    """
+    Undoes applied migrations newer than `target` (default: only the latest), newest first.
+    Stops at a migration that cannot be undone. Returns the versions rolled back.
+    """
+    applied = applied_versions(conn)
+    if not applied:
+        return []
+    if target is None:
+        target = max(v for v in applied if v != max(applied)) if len(applied) > 1 else 0
+    done = []
+    for migration in sorted(MIGRATIONS, key=lambda m: -m.version):
+        if migration.version not in applied or migration.version <= target:
+            continue
+        if migration.down is None:
+            log(f"Migration {migration.version:04d} {migration.name} cannot be rolled back; stopping.")
+            break
+        try:
+            with conn.cursor() as cur:
+                cur.execute(migration.down)
+                cur.execute("DELETE FROM schema_migrations WHERE version = %s;", (migration.version,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        log(f"Rolled back {migration.version:04d} {migration.name}")
+        done.append(migration.version)
+    return done
+
+
+def create_partitions(conn, months_ahead=12):
+    """Creates monthly partitions through `months_ahead` months from now for each partitioned table."""
+    created = 0
+    with conn.cursor() as cur:
+        for table in ("workouts", "user_workout_daily"):
+            cur.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s);", (table,))
+            if cur.fetchone():
+                cur.execute("SELECT fitness_create_month_partitions(%s, CURRENT_DATE, "
+                            "(CURRENT_DATE + make_interval(months => %s))::date);", (table, months_ahead))
+                created += cur.fetchone()[0]
+    conn.commit()
+    return created
+
+
+# --- Index check ---
+
+# Tables whose full scans the check reports; CTEs and subqueries are not tables
+CHECKED_TABLES = ("users", "workouts", "exercises", "friends", "goals", "user_workout_stats", "user_workout_daily")
+# Functions whose job is to read every row
+FULL_SCAN_ALLOWED = {"get_all_users"}
+
+
+def _table_of(name):
+    """Maps a partition (workouts_2024_05, workouts_default) back to its table."""
+    for table in sorted(CHECKED_TABLES, key=len, reverse=True):
+        if name == table or re.fullmatch(rf"{table}_(\d{{4}}_\d{{2}}|default)", name):
+            return table
+    return None
+
+
+def _postgres_scans(plan):
+    scans = []
+    if plan.get("Node Type") == "Seq Scan" and _table_of(plan.get("Relation Name", "")):
+        scans.append(f"Seq Scan on {plan['Relation Name']}")
+    for child in plan.get("Plans", ()):
+        scans.extend(_postgres_scans(child))
+    return scans
+
+
+def explain_table_scans(cur, engine_name, sql, params):
+    """Returns the full table scans in the plan of one statement."""
+    if engine_name == "postgres":
+        # Rule out "a scan was cheaper on this small table": only report scans no index can replace
+        cur.execute("SET LOCAL enable_seqscan = off;")
+        cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        return _postgres_scans(cur.fetchone()[0][0]["Plan"])
+    cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+    scans = []
+    for row in cur.fetchall():
+        match = re.match(r"SCAN (\w+)", row[-1])
+        if match and "USING" not in row[-1] and _table_of(match.group(1)):
+            scans.append(row[-1])
+    return scans
+
+
+def _sample_calls(backend):
+    """One call per read function, on real ids where the database has any."""
+    with backend.db_cursor() as cur:
+        cur.execute("SELECT user_id FROM workouts ORDER BY workout_id DESC LIMIT 1;")
+        row = cur.fetchone()
+        user_id = row[0] if row else 1
+        cur.execute("SELECT workout_id, workout_date FROM workouts WHERE user_id = %s ORDER BY workout_id DESC LIMIT 25;",
+                    (user_id,))
+        workouts = cur.fetchall()
+    workout_ids = [w[0] for w in workouts] or [1]
+    cursor = (workouts[0][1], workouts[0][0]) if workouts else None
+    return [
+        ("get_user", lambda: backend.get_user(user_id)),
+        ("get_all_users", backend.get_all_users),
+        ("search_users", lambda: backend.search_users("a")),
+        ("search_users", lambda: backend.search_users("user")),
+        ("get_friends_list", lambda: backend.get_friends_list(user_id)),
+        ("get_friend_ids", lambda: backend.get_friend_ids(user_id)),
+        ("get_mutual_friend_counts", lambda: backend.get_mutual_friend_counts(user_id, [user_id + 1])),
+        ("suggest_friends", lambda: backend.suggest_friends(user_id)),
+        ("get_all_workouts_for_user", lambda: backend.get_all_workouts_for_user(user_id)),
+        ("get_workouts_page", lambda: backend.get_workouts_page(user_id, limit=10, after=cursor)),
+        ("iter_workouts", lambda: list(backend.iter_workouts(user_id))),
+        ("get_exercises_for_workout", lambda: backend.get_exercises_for_workout(workout_ids[0])),
+        ("get_exercises_for_workouts", lambda: backend.get_exercises_for_workouts(workout_ids)),
+        ("get_exercises_for_user", lambda: backend.get_exercises_for_user(user_id)),
+        ("get_training_log", lambda: backend.get_training_log(user_id)),
+        ("get_goals", lambda: backend.get_goals(user_id)),
+        ("get_business_insights", lambda: backend.get_business_insights(user_id)),
+        ("get_leaderboard_data", lambda: backend.get_leaderboard_data("total_duration_all_time", user_id)),
+        ("get_dashboard_snapshot", lambda: backend.get_dashboard_snapshot(user_id)),
+    ]
+
+
+def check_indexes(log=print):
+    """
+    Runs every backend read with the caches cleared, captures the SQL it issues and EXPLAINs
+    each SELECT. Returns a list of (function, sql, scans) for statements that scan a whole table.
+    """
+    import backend_fitness as backend
+
+    engine = backend.get_engine()
+    problems = []
+    for function, call in _sample_calls(backend):
+        backend.clear_read_cache()
+        backend.clear_leaderboard_cache()
+        with backend.capture_queries() as statements:
+            call()
+        for sql, params in statements:
+            if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                continue
+            with backend.db_cursor() as cur:
+                scans = explain_table_scans(cur, engine.name, sql, params)
+            if scans and function not in FULL_SCAN_ALLOWED:
+                problems.append((function, " ".join(sql.split()), scans))
+                log(f"FAIL {function}: {', '.join(scans)}")
+            else:
+                log(f"ok   {function}" + (" (full scan expected)" if scans else ""))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply, roll back and check schema migrations.")
+    parser.add_argument("command", choices=["status", "apply", "rollback", "baseline", "partitions", "check"])
+    parser.add_argument("--to", type=int, help="target version")
+    parser.add_argument("--with-partitioning", action="store_true", help="include the optional partitioning migration")
+    parser.add_argument("--months-ahead", type=int, default=12)
+    args = parser.parse_args()
+
+    from backend_fitness import DB_ERRORS, get_engine
+
+    engine = get_engine()
+    try:
+        if args.command == "check":
+            problems = check_indexes()
+            if problems:
+                print(f"{len(problems)} statements scan whole tables:")
+                for function, sql, scans in problems:
+                    print(f"  {function}: {sql[:160]}")
+                return 1
+            print("Every backend query is served by an index.")
+            return 0
+
+        if engine.name != "postgres":
+            print("Migrations target Postgres; the SQLite engine creates its schema itself.")
+            return 2
+        conn = engine.connect()
+        try:
+            if args.command == "status":
+                for version, name, state in status(conn):
+                    print(f"{version:04d} {name:<32} {state}")
+            elif args.command == "apply":
+                if args.to is None and not args.with_partitioning:
+                    done = upgrade(conn)
+                else:
+                    done = apply_migrations(conn, args.to, include_optional=args.with_partitioning)
+                print(f"{len(done)} migrations applied." if done else "Database is up to date.")
+            elif args.command == "baseline":
+                apply_migrations(conn, target=1, fake=True)
+            elif args.command == "rollback":
+                done = rollback_migrations(conn, args.to)
+                print(f"{len(done)} migrations rolled back.")
+            elif args.command == "partitions":
+                print(f"Created {create_partitions(conn, args.months_ahead)} partitions.")
+        finally:
+            conn.close()
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    A small thread-safe connection pool.
+    Connections are created with `connect()`, checked with `check(conn)` before
+    being handed out and cleaned with `reset(conn)` when they come back.
+    Idle connections above `min_size` are closed after `idle_timeout` seconds.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, idle_timeout=300.0,
+                 checkout_timeout=30.0, check=None, check_interval=30.0, reset=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1.")
+        self._connect = connect
+        self._check = check
+        self._reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.check_interval = check_interval
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, returned_at), most recently returned on the right
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_closed': 0,
+            'health_check_failures': 0,
+        }
+
+        for _ in range(min_size):
+            conn = self._open()
+            self._idle.append((conn, time.monotonic()))
+
+    # --- Internal helpers ---
+
+    def _open(self):
+        conn = self._connect()
+        with self._cond:
+            self._size += 1
+            self._stats['connections_created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats['connections_closed'] += 1
+            self._cond.notify()
+
+    def _healthy(self, conn, idle_for):
+        if self._check is None or idle_for < self.check_interval:
+            return True
+        try:
+            return self._check(conn)
+        except Exception:
+            return False
+
+    def _reap_idle(self, now):
+        """Closes connections idle for longer than idle_timeout, keeping min_size open. Caller holds the lock."""
+        expired = []
+        while self._idle and self._size - len(expired) > self.min_size:
+            conn, returned_at = self._idle[0]
+            if now - returned_at < self.idle_timeout:
+                break
+            self._idle.popleft()
+            expired.append(conn)
+        return expired
+
+    # --- Public API ---
+
+    def getconn(self):
+        """Checks a connection out of the pool, opening a new one or waiting if necessary."""
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        waited = False
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed.")
+                expired = self._reap_idle(time.monotonic())
+                conn = None
+                idle_for = 0.0
+                open_new = False
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    idle_for = time.monotonic() - returned_at
+                elif self._size < self.max_size:
+                    # Reserve the slot now so concurrent callers respect max_size.
+                    self._size += 1
+                    open_new = True
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(f"No connection available after {self.checkout_timeout}s.")
+                    if not waited:
+                        waited = True
+                        self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+                    continue
+
+            for stale in expired:
+                self._discard(stale)
+
+            if open_new:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats['connections_created'] += 1
+            elif not self._healthy(conn, idle_for):
+                with self._cond:
+                    self._stats['health_check_failures'] += 1
+                self._discard(conn)
+                continue
+
+            waited_for = time.monotonic() - start
+            with self._cond:
+                self._stats['checkouts'] += 1
+                if waited:
+                    self._stats['wait_time'] += waited_for
+                    self._stats['max_wait_time'] = max(self._stats['max_wait_time'], waited_for)
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """Returns a connection to the pool. Broken connections should be passed with discard=True."""
+        if not discard and self._reset is not None:
+            try:
+                self._reset(conn)
+            except Exception:
+                discard = True
+        with self._cond:
+            closed = self._closed
+            if not discard and not closed:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and always returns it."""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def stats(self):
+        """Returns a snapshot of pool counters, useful for sizing min_size/max_size."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot['size'] = self._size
+            snapshot['idle'] = len(self._idle)
+            snapshot['in_use'] = self._size - len(self._idle)
+            snapshot['min_size'] = self.min_size
+            snapshot['max_size'] = self.max_size
+            checkouts = snapshot['checkouts']
+            snapshot['avg_wait_time'] = snapshot['wait_time'] / snapshot['waits'] if snapshot['waits'] else 0.0
+            snapshot['wait_ratio'] = snapshot['waits'] / checkouts if checkouts else 0.0
+        return snapshot
+
+    def closeall(self):
+        """Closes every idle connection; connections still in use are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
@@ -0,0 +1,202 @@
+"""
+Bulk account purge (e.g. GDPR erasure requests) in bounded, resumable chunks.
+
+    python purge_fitness.py enqueue --ids 12,57,90
+    python purge_fitness.py enqueue --file erasure_requests.txt     # one user id per line
+    python purge_fitness.py run                                     # until the queue is empty
+    python purge_fitness.py run --max-users 200 --max-workouts 20000 --pause 0.5
+    python purge_fitness.py status
+    python purge_fitness.py prune-keys --days 30                    # forget old workout idempotency keys
+
+Requested accounts wait in purge_queue. `run` takes them in user_id order, a chunk at a time,
+and deletes each chunk with one set-based statement per table (backend_fitness.delete_users)
+in a single short transaction that also removes the chunk's queue rows. A chunk holds at most
+--max-users accounts and, going by user_workout_stats, about --max-workouts workouts, so lock
+time and WAL volume per transaction stay bounded. An interrupted run resumes where it stopped:
+whatever was committed is gone from the queue, whatever was not is still in it.
+When sharded, every shard keeps its own queue of the accounts it holds and is purged in turn.
+"""
+import argparse
+import sys
+import time
+
+from backend_fitness import (
+    DB_ERRORS, db_connection, db_cursor, delete_users, forget_deleted_users, get_engine, invalidate_deleted_users,
+    on_each_database
+)
+
+
+def enqueue(user_ids, batch_size=10000):
+    """
+    Queues accounts for purging on the database (or shard) holding them; ids already queued or
+    of no existing account are ignored. Returns the number of ids passed.
+    """
+    engine = get_engine()
+    user_ids = list(user_ids)
+
+    def queue():
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            with db_cursor(commit=True) as cur:
+                cur.execute(f"""
+                    INSERT INTO purge_queue (user_id)
+                    SELECT user_id FROM users WHERE {engine.id_list_condition('user_id')}
+                    ON CONFLICT (user_id) DO NOTHING;
+                """, (engine.id_list_param(batch),))
+
+    on_each_database(queue)
+    return len(user_ids)
+
+
+def pending():
+    """Returns (accounts, workouts) still waiting to be purged."""
+    def count():
+        with db_cursor() as cur:
+            cur.execute("""
+                SELECT COUNT(*), COALESCE(SUM(s.workout_count), 0)
+                FROM purge_queue q
+                LEFT JOIN user_workout_stats s ON s.user_id = q.user_id;
+            """)
+            return cur.fetchone()
+
+    counts = on_each_database(count)
+    return sum(int(accounts) for accounts, _ in counts), sum(int(workouts) for _, workouts in counts)
+
+
+def _next_chunk(cur, max_users, max_workouts):
+    """The next queued accounts whose workouts fit the budget; always at least one account."""
+    cur.execute("""
+        SELECT q.user_id, COALESCE(s.workout_count, 0)
+        FROM purge_queue q
+        LEFT JOIN user_workout_stats s ON s.user_id = q.user_id
+        ORDER BY q.user_id
+        LIMIT %s;
+    """, (max_users,))
+    chunk = []
+    workouts = 0
+    for user_id, workout_count in cur.fetchall():
+        if chunk and workouts + workout_count > max_workouts:
+            break
+        chunk.append(user_id)
+        workouts += workout_count
+    return chunk
+
+
+def run_purge(max_users=500, max_workouts=50000, pause=0.0, max_chunks=None, progress=None):
+    """
+    Purges queued accounts chunk by chunk, one transaction per chunk, sleeping `pause`
+    seconds between chunks to let replication and autovacuum keep up.
+    Returns a dict of rows deleted per table (plus 'chunks'). When sharded the shards are
+    purged one after the other, and max_chunks counts the chunks of all of them.
+    """
+    engine = get_engine()
+    totals = {'chunks': 0}
+    start = time.perf_counter()
+
+    def purge():
+        while max_chunks is None or totals['chunks'] < max_chunks:
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    chunk = _next_chunk(cur, max_users, max_workouts)
+                    if not chunk:
+                        return
+                    deleted = delete_users(cur, chunk)
+                    cur.execute(f"DELETE FROM purge_queue WHERE {engine.id_list_condition('user_id')};",
+                                (engine.id_list_param(chunk),))
+                conn.commit()
+            forget_deleted_users(chunk)
+            invalidate_deleted_users(chunk)
+            totals['chunks'] += 1
+            for table, rows in deleted.items():
+                totals[table] = totals.get(table, 0) + rows
+            if progress:
+                progress(totals, time.perf_counter() - start)
+            if pause:
+                time.sleep(pause)
+
+    on_each_database(purge)
+    return totals
+
+
+def prune_idempotency_keys(days=30, batch_size=10000):
+    """
+    Deletes workout idempotency keys older than `days`, oldest first, `batch_size` per transaction.
+    A retry or redelivery arriving after that is no longer deduplicated. Returns the keys deleted.
+    Age is measured by the database clock that filled in created_at (each shard's, when sharded).
+    """
+    engine = get_engine()
+
+    def prune():
+        deleted = 0
+        while True:
+            with db_cursor(commit=True) as cur:
+                cur.execute(f"""
+                    DELETE FROM workout_idempotency
+                    WHERE (user_id, idempotency_key) IN (
+                        SELECT user_id, idempotency_key FROM workout_idempotency
+                        WHERE {engine.older_than_condition('created_at')}
+                        ORDER BY created_at
+                        LIMIT %s
+                    );
+                """, engine.older_than_params(days) + (batch_size,))
+                count = cur.rowcount
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+    return sum(on_each_database(prune))
+
+
+def _read_ids(path):
+    with open(path) as f:
+        return [int(line) for line in f if line.strip()]
+
+
+def _print_progress(totals, elapsed):
+    users = totals.get('users', 0)
+    print(f"  chunk {totals['chunks']}: {users} accounts, {totals.get('workouts', 0)} workouts, "
+          f"{totals.get('exercises', 0)} exercises purged ({users / elapsed if elapsed else 0:,.0f} accounts/s)",
+          file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Purge user accounts in bounded, resumable chunks.")
+    parser.add_argument("command", choices=["enqueue", "run", "status", "prune-keys"])
+    parser.add_argument("--ids", help="comma-separated user ids to enqueue")
+    parser.add_argument("--file", help="file of user ids to enqueue, one per line")
+    parser.add_argument("--max-users", type=int, default=500, help="accounts per transaction")
+    parser.add_argument("--max-workouts", type=int, default=50000, help="approximate workouts per transaction")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between chunks")
+    parser.add_argument("--max-chunks", type=int, help="stop after this many chunks")
+    parser.add_argument("--days", type=int, default=30, help="prune-keys: keep keys younger than this")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "enqueue":
+            user_ids = [int(i) for i in args.ids.split(",")] if args.ids else []
+            if args.file:
+                user_ids += _read_ids(args.file)
+            if not user_ids:
+                parser.error("enqueue needs --ids or --file")
+            enqueue(user_ids)
+            count, workouts = pending()
+            print(f"{count} accounts ({workouts} workouts) queued for purging.")
+        elif args.command == "run":
+            totals = run_purge(args.max_users, args.max_workouts, args.pause, args.max_chunks,
+                               progress=None if args.quiet else _print_progress)
+            count, _ = pending()
+            print(f"Purged {totals.get('users', 0)} accounts in {totals['chunks']} chunks; {count} still queued.")
+        elif args.command == "prune-keys":
+            print(f"Pruned {prune_idempotency_keys(args.days)} idempotency keys older than {args.days} days.")
+        else:
+            count, workouts = pending()
+            print(f"{count} accounts ({workouts} workouts) queued for purging.")
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
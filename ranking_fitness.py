@@ -0,0 +1,255 @@
+import bisect
+import heapq
+import math
+import threading
+import time
+from datetime import date
+
+from leaderboard_fitness import LEADERBOARD_METRICS
+
+# Metrics whose values are whole numbers (counts and minute totals); see LogHistogram.count_above
+INTEGER_METRICS = {'total_workouts_last_30_days', 'total_duration_last_30_days', 'total_duration_all_time'}
+
+
+class FenwickTree:
+    """Prefix sums over a fixed number of counters, with O(log n) update and query."""
+
+    def __init__(self, size):
+        self.size = size
+        self._tree = [0] * (size + 1)
+
+    def add(self, index, delta):
+        index += 1
+        while index <= self.size:
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index):
+        """Sum of counters 0..index inclusive."""
+        total = 0
+        index += 1
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+
+class LogHistogram:
+    """
+    Counts values in logarithmic buckets [gamma^i, gamma^(i+1)), so every value is within
+    `relative_error` of its bucket's midpoint. A Fenwick tree over the buckets answers "how many
+    values are above v" in O(log buckets), independent of how many values were added. Zero and
+    negative values share bucket 0, values in (0, 1) bucket 1, and values above `max_value` the last.
+    """
+
+    def __init__(self, relative_error=0.01, max_value=1e9, integer=False):
+        self.integer = integer
+        self.gamma = 1 + 2 * relative_error
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = 3 + int(math.log(max_value) / self._log_gamma)
+        self.counts = [0] * self.buckets
+        self.tree = FenwickTree(self.buckets)
+        self.total = 0
+
+    def bucket(self, value):
+        if value <= 0:
+            return 0
+        if value < 1:
+            return 1
+        return min(2 + int(math.log(value) / self._log_gamma), self.buckets - 1)
+
+    def bounds(self, index):
+        """[lower, upper) covered by bucket `index`."""
+        if index == 0:
+            return 0.0, 0.0
+        if index == 1:
+            return 0.0, 1.0
+        return self.gamma ** (index - 2), self.gamma ** (index - 1)
+
+    def add(self, value, count=1):
+        index = self.bucket(value)
+        self.counts[index] += count
+        self.tree.add(index, count)
+        self.total += count
+
+    def remove(self, value):
+        self.add(value, -1)
+
+    def count_above(self, value):
+        """
+        Estimated number of values strictly greater than `value`: exact above its bucket, and
+        within it the bucket's other entries spread uniformly over its range. For integer
+        histograms they are spread over the whole numbers in the range instead, so a bucket
+        holding a single possible value (every bucket below 1 / relative_error) counts ties exactly.
+        """
+        index = self.bucket(value)
+        above = self.total - self.tree.prefix(index)
+        others = max(self.counts[index] - 1, 0)
+        lower, upper = self.bounds(index)
+        if self.integer:
+            first, end = math.ceil(lower), math.ceil(upper)
+            if end - first > 1:
+                above += others * max(0.0, min(1.0, (end - 1 - value) / (end - first)))
+        elif upper > lower:
+            above += others * max(0.0, min(1.0, (upper - value) / (upper - lower)))
+        return above
+
+
+class MetricRanking:
+    """
+    Global ranking for one metric. Every user's current value is kept so updates can move them
+    between buckets; ranks come from a LogHistogram, except for the exact top `top_k`, which are
+    kept as a small sorted list. In "exact" mode a sorted list of every (value, user_id) also
+    gives exact ranks, at O(users) memory and O(users) memmove per update.
+    """
+
+    def __init__(self, top_k=100, exact=False, relative_error=0.01, integer=False):
+        self.top_k = top_k
+        self.exact = exact
+        self.relative_error = relative_error
+        self.integer = integer
+        self.clear()
+
+    def clear(self):
+        self.values = {}
+        self.histogram = LogHistogram(self.relative_error, integer=self.integer)
+        self.top = []  # (value, user_id) ascending, at most top_k entries
+        self.sorted = [] if self.exact else None
+
+    def load(self, values):
+        """Replaces every value ({user_id: value}) in one pass."""
+        self.clear()
+        self.values = dict(values)
+        for value in self.values.values():
+            self.histogram.add(value)
+        if self.exact:
+            self.sorted = sorted((value, user_id) for user_id, value in self.values.items())
+        self._refill_top()
+
+    def _refill_top(self):
+        self.top = sorted(heapq.nlargest(self.top_k, ((v, u) for u, v in self.values.items())))
+
+    def update(self, user_id, value):
+        old = self.values.get(user_id)
+        if old == value:
+            return
+        if old is not None:
+            self.histogram.remove(old)
+            if self.exact:
+                del self.sorted[bisect.bisect_left(self.sorted, (old, user_id))]
+        self.values[user_id] = value
+        self.histogram.add(value)
+        if self.exact:
+            bisect.insort(self.sorted, (value, user_id))
+        entry = (value, user_id)
+        if old is not None and (old, user_id) in self.top:
+            self.top.remove((old, user_id))
+            if value < old:
+                # Someone outside the kept top-K may now belong in it
+                self._refill_top()
+                return
+        if len(self.top) < self.top_k or entry > self.top[0]:
+            bisect.insort(self.top, entry)
+            if len(self.top) > self.top_k:
+                self.top.pop(0)
+
+    def remove(self, user_id):
+        value = self.values.pop(user_id, None)
+        if value is None:
+            return
+        self.histogram.remove(value)
+        if self.exact:
+            del self.sorted[bisect.bisect_left(self.sorted, (value, user_id))]
+        if (value, user_id) in self.top:
+            self._refill_top()
+
+    def rank(self, user_id, exact=None):
+        """
+        (rank, value, is_exact) for a user, rank 1 being the highest value; ties share a rank.
+        Users in the kept top-K, and every user in exact mode, get exact ranks. None if unknown.
+        """
+        value = self.values.get(user_id)
+        if value is None:
+            return None
+        exact = self.exact if exact is None else exact
+        if self.top and value >= self.top[0][0]:
+            return len(self.top) - bisect.bisect_right(self.top, (value, float("inf"))) + 1, value, True
+        if exact and self.sorted is not None:
+            return len(self.sorted) - bisect.bisect_right(self.sorted, (value, float("inf"))) + 1, value, True
+        return int(round(self.histogram.count_above(value))) + 1, value, False
+
+    def leaders(self, k):
+        """The exact top `k` (k <= top_k) as (user_id, value), highest first."""
+        return [(user_id, value) for value, user_id in reversed(self.top[-k:])]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class GlobalRankings:
+    """
+    In-process global rankings for every leaderboard metric (see backend_fitness.get_global_rank).
+    The backend feeds it full loads and incremental updates for users with new workouts (found by
+    a workout_id watermark). Windowed metrics move every day, so the first refresh of a new day,
+    and any refresh `rebuild_interval` seconds after the last full load, asks for a full rebuild;
+    this also picks up deleted users and workouts committed out of id order.
+    Nothing here locks on its own: callers hold `lock` around every read and mutation.
+    """
+
+    def __init__(self, top_k=100, exact=False, relative_error=0.01, rebuild_interval=3600.0):
+        self.rankings = {metric: MetricRanking(top_k, exact, relative_error, metric in INTEGER_METRICS)
+                         for metric in LEADERBOARD_METRICS}
+        self.names = {}
+        self.exact = exact
+        self.rebuild_interval = rebuild_interval
+        self.watermark = None
+        self.built_at = None
+        self._day = None
+        self.refreshed_at = float("-inf")
+        self.lock = threading.Lock()
+        self.stats_counters = {'full_rebuilds': 0, 'incremental_refreshes': 0, 'users_updated': 0}
+
+    def needs_rebuild(self):
+        return (self.watermark is None or self._day != date.today()
+                or time.monotonic() - self.built_at > self.rebuild_interval)
+
+    def rebuild(self, metrics_by_user, watermark):
+        """Loads every user's (name, workouts_30d, duration_30d, avg_duration, total_duration)."""
+        for metric, position in LEADERBOARD_METRICS.items():
+            self.rankings[metric].load({user_id: m[position] for user_id, m in metrics_by_user.items()})
+        self.names = {user_id: m[0] for user_id, m in metrics_by_user.items()}
+        self.watermark = watermark
+        self.built_at = time.monotonic()
+        self._day = date.today()
+        self.stats_counters['full_rebuilds'] += 1
+
+    def update(self, metrics_by_user, watermark=None):
+        """Applies fresh metrics for the users that logged workouts since the last watermark."""
+        for user_id, m in metrics_by_user.items():
+            self.names[user_id] = m[0]
+            for metric, position in LEADERBOARD_METRICS.items():
+                self.rankings[metric].update(user_id, m[position])
+        if watermark is not None:
+            self.watermark = watermark
+        self.stats_counters['incremental_refreshes'] += 1
+        self.stats_counters['users_updated'] += len(metrics_by_user)
+
+    def rename(self, user_id, name):
+        if user_id in self.names:
+            self.names[user_id] = name
+
+    def invalidate(self):
+        """Forces a full rebuild on the next refresh."""
+        self.watermark = None
+        self.refreshed_at = float("-inf")
+
+    def remove_users(self, *user_ids):
+        for user_id in user_ids:
+            self.names.pop(user_id, None)
+            for ranking in self.rankings.values():
+                ranking.remove(user_id)
+
+    def stats(self):
+        any_ranking = next(iter(self.rankings.values()))
+        return dict(self.stats_counters, users=len(any_ranking), exact=self.exact,
+                    watermark=self.watermark, buckets=any_ranking.histogram.buckets)
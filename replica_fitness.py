@@ -0,0 +1,208 @@
+"""
+Read-replica routing for backend_fitness.
+
+    FITNESS_DB_REPLICAS=replica1:5433,replica2 streamlit run frontend_fitness.py
+    python replica_fitness.py check                 # lag of every replica and a read-after-write probe
+
+Read-only backend functions check their connection out through
+backend_fitness.db_connection(read_only=True, user_id=...), which asks the ReplicaRouter for
+a replica. The router picks replicas round-robin. It falls back to the primary when:
+- the user wrote in the last `sticky_seconds` (read-your-writes: a workout just logged shows up
+  in the history and insights straight away);
+- every replica lags more than `max_lag` seconds;
+- every replica failed recently.
+Lag is measured on the replica itself (StorageEngine.replica_lag) at most every
+`check_interval` seconds, by whichever read finds the reading stale. A replica that cannot
+be reached, or fails a query with a transient error, is skipped for `retry_after` seconds.
+
+Stickiness is per process, which covers every Streamlit session served by it.
+
+To try it locally, start a second Postgres as a streaming replica of the first:
+
+    pg_basebackup -h localhost -p 5432 -U postgres -D /tmp/replica -R -X stream
+    pg_ctl -D /tmp/replica -o "-p 5433" start
+    FITNESS_DB_REPLICAS=localhost:5433 python replica_fitness.py check
+"""
+import argparse
+import itertools
+import sys
+import threading
+import time
+import uuid
+
+from pool_fitness import ConnectionPool
+
+
+class Replica:
+    """One replica: its engine, its own connection pool, and the router's view of its health."""
+
+    def __init__(self, name, engine, pool_config):
+        self.name = name
+        self.engine = engine
+        # min_size=0: a replica that is down must not stop the backend from starting
+        self.pool = ConnectionPool(engine.connect, check=engine.check, reset=engine.reset,
+                                   **dict(pool_config, min_size=0))
+        self.lag = None
+        self.lag_checked_at = float("-inf")
+        self.down_until = float("-inf")
+        self.reads = 0
+        self.failures = 0
+        self._checking = threading.Lock()
+
+    def check_lag(self):
+        """Measures replication lag in seconds on one of the replica's connections."""
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                self.lag = self.engine.replica_lag(cur)
+            conn.rollback()
+        except Exception:
+            self.pool.putconn(conn, discard=True)
+            raise
+        self.pool.putconn(conn)
+        self.lag_checked_at = time.monotonic()
+        return self.lag
+
+    def stats(self):
+        return {
+            'lag_seconds': self.lag,
+            'down': self.down_until > time.monotonic(),
+            'reads': self.reads,
+            'failures': self.failures,
+            'pool': self.pool.stats(),
+        }
+
+
+class ReplicaRouter:
+    """Chooses a replica (or None, meaning the primary) for each read-only checkout."""
+
+    def __init__(self, replicas, max_lag=2.0, check_interval=5.0, sticky_seconds=5.0, retry_after=30.0,
+                 errors=(Exception,)):
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        self.retry_after = retry_after
+        self.errors = errors
+        self._next = itertools.count()
+        self._recent_writes = {}  # user_id -> monotonic time until which reads go to the primary
+        self._lock = threading.Lock()
+        self.counters = {'replica_reads': 0, 'primary_sticky': 0, 'primary_lagging': 0, 'primary_down': 0}
+
+    def mark_write(self, *user_ids):
+        """Sends these users' reads to the primary for the next sticky_seconds."""
+        now = time.monotonic()
+        until = now + self.sticky_seconds
+        with self._lock:
+            for user_id in user_ids:
+                self._recent_writes[user_id] = until
+            if len(self._recent_writes) > 10000:
+                self._recent_writes = {u: t for u, t in self._recent_writes.items() if t > now}
+
+    def _sticky(self, user_ids, now):
+        return any(self._recent_writes.get(user_id, 0) > now for user_id in user_ids)
+
+    def _fresh(self, replica, now):
+        """Whether a replica is within max_lag, re-measuring a stale reading unless another thread is."""
+        if now - replica.lag_checked_at > self.check_interval and replica._checking.acquire(blocking=False):
+            try:
+                replica.check_lag()
+            except self.errors:
+                self.mark_failed(replica)
+                return False
+            finally:
+                replica._checking.release()
+        return replica.lag is not None and replica.lag <= self.max_lag
+
+    def route(self, user_id=None):
+        """
+        The replica for a read on behalf of `user_id` (an id, a list of ids, or None for reads
+        no user is waiting to see their own writes in), or None to use the primary.
+        """
+        now = time.monotonic()
+        user_ids = () if user_id is None else user_id if isinstance(user_id, (list, tuple, set, frozenset)) else (user_id,)
+        if user_ids and self._sticky(user_ids, now):
+            self.counters['primary_sticky'] += 1
+            return None
+        start = next(self._next)
+        up = False
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if replica.down_until > now:
+                continue
+            if self._fresh(replica, now):
+                replica.reads += 1
+                self.counters['replica_reads'] += 1
+                return replica
+            # Reachable but behind, unless the lag check just failed
+            up = up or replica.down_until <= now
+        self.counters['primary_lagging' if up else 'primary_down'] += 1
+        return None
+
+    def mark_failed(self, replica):
+        replica.failures += 1
+        replica.down_until = time.monotonic() + self.retry_after
+
+    def closeall(self):
+        for replica in self.replicas:
+            replica.pool.closeall()
+
+    def stats(self):
+        return dict(self.counters, replicas={replica.name: replica.stats() for replica in self.replicas})
+
+
+def probe_read_after_write(timeout=10.0):
+    """
+    Writes a marker user on the primary, then times how long until a replica read sees it,
+    both without and with the writer's stickiness. Returns seconds per case (None: not seen).
+    """
+    import backend_fitness as backend
+
+    email = f"replica-probe-{uuid.uuid4().hex[:12]}@example.com"
+    user_id = backend.create_user("Replica Probe", email, 70)
+    results = {}
+    try:
+        for label, reader in (("replica", None), ("sticky", user_id)):
+            start = time.perf_counter()
+            results[label] = None
+            while time.perf_counter() - start < timeout:
+                with backend.db_cursor(read_only=True, user_id=reader) as cur:
+                    cur.execute("SELECT 1 FROM users WHERE email = %s;", (email,))
+                    if cur.fetchone():
+                        results[label] = time.perf_counter() - start
+                        break
+                time.sleep(0.01)
+    finally:
+        backend.delete_user(user_id)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect read-replica routing.")
+    parser.add_argument("command", choices=["check"])
+    parser.add_argument("--timeout", type=float, default=10.0, help="probe: seconds to wait for the replica")
+    args = parser.parse_args()
+
+    import backend_fitness as backend
+
+    router = backend.get_router()
+    if router is None:
+        print("No replicas configured (set FITNESS_DB_REPLICAS).")
+        return 1
+    for replica in router.replicas:
+        try:
+            print(f"{replica.name}: lag {replica.check_lag():.3f}s")
+        except backend.DB_ERRORS as e:
+            print(f"{replica.name}: unreachable ({e})")
+    try:
+        for label, seconds in probe_read_after_write(args.timeout).items():
+            print(f"read after write ({label}): " + ("not visible" if seconds is None else f"{seconds * 1000:.1f} ms"))
+    except backend.DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return 1
+    print(router.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
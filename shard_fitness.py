@@ -0,0 +1,584 @@
+"""
+Sharding for backend_fitness: users spread over several databases by consistent hashing.
+
+    FITNESS_SHARDS=s0=db0/fitness,s1=db1:5433/fitness streamlit run frontend_fitness.py
+    python shard_fitness.py init                     # schema on every shard, register them, seed id counters
+    python shard_fitness.py status                   # shards, their states and users
+    python shard_fitness.py add s2                   # s2 joins: new users may land on it
+    python shard_fitness.py drain s0                 # s0 leaves once its users have moved
+    python shard_fitness.py plan                     # users a rebalance would move, per shard pair
+    python shard_fitness.py rebalance --batch-size 500 --pause 0.5
+    python shard_fitness.py move --user 42 --to s1
+
+Every user lives, with all of their rows, on one shard. A HashRing of the shards decides which,
+except for users listed in shard_directory: users the rebalancer moved, or created on a joining
+shard. The directory, the shards table with each shard's state, the id counters and the email
+claims live in the directory database (the one DB_CONFIG / FITNESS_SQLITE_PATH names), which
+may itself be one of the shards. Every process reloads them every `directory_ttl` seconds.
+
+backend_fitness runs each per-user function on its user's shard (ShardMap.using), sends
+functions keyed by a workout or goal id to every shard, and gathers cross-shard reads (friend
+lists, leaderboards, user search) from the shards involved in parallel (ShardMap.scatter).
+A friendship is stored on each side's shard, so friends.friend_id has no foreign key on a shard.
+Users, workouts and goals take their ids from blocks handed out by the directory, so ids are
+unique across shards and a user moves without being renumbered.
+
+Shard states: "active" shards hold users by hash. "joining" shards get new users and the users
+the rebalancer moves to them. "draining" shards keep their users until the rebalancer has moved
+them away. Once nobody is misplaced, rebalance makes joining shards active and drops drained ones.
+
+Moving a batch of users online (move_users):
+1. mark them moving in the directory: their reads stay on the old shard, their writes fail with
+   ShardMovingError (reported like any database error); wait until every process has seen it;
+2. copy their rows to the new shard in one transaction;
+3. point the directory at the new shard and wait again, so no process still reads the old copy;
+4. delete the old copy.
+An interrupted rebalance leaves users marked moving, still complete on the old shard; the next
+rebalance clears the marks, deletes half-made copies and moves them again. Run one rebalance at a time.
+
+To try it with local SQLite files (the first shard doubles as the directory):
+
+    export FITNESS_DB_ENGINE=sqlite FITNESS_SQLITE_PATH=shard0.db
+    export FITNESS_SHARDS=s0=shard0.db,s1=shard1.db
+    python shard_fitness.py init
+"""
+import argparse
+import bisect
+import contextvars
+import functools
+import hashlib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from pool_fitness import ConnectionPool
+
+# (shard, writable) for the backend call running in this context; see ShardMap.using
+_active = contextvars.ContextVar("fitness_shard", default=None)
+
+# Tables holding a user's rows, parents first: (table, condition selecting the moving users, with
+# {users} standing for a user_id id-list condition, surrogate key the target shard assigns afresh)
+USER_TABLES = [
+    ("users", "{users}", None),
+    ("workouts", "{users}", None),
+    ("exercises", "workout_id IN (SELECT workout_id FROM workouts WHERE {users})", "exercise_id"),
+    ("goals", "{users}", None),
+    ("friends", "{users}", "id"),
+    ("user_workout_stats", "{users}", None),
+    ("user_workout_daily", "{users}", None),
+    ("workout_idempotency", "{users}", None),
+    ("workout_events", "{users}", "event_id"),
+]
+
+# Ids that must be unique across shards, handed out by the directory: (counter, table, column)
+ID_COUNTERS = [("users", "users", "user_id"), ("workouts", "workouts", "workout_id"), ("goals", "goals", "goal_id")]
+
+
+class ShardMovingError(Exception):
+    """A write for a user whose rows are being copied to another shard; it succeeds again in seconds."""
+
+
+def current():
+    """(shard, writable) the running backend call is bound to, or None outside ShardMap.using."""
+    return _active.get()
+
+
+class HashRing:
+    """Consistent hashing: each shard owns `vnodes` points on a ring, a user the first point after theirs."""
+
+    def __init__(self, names, vnodes=64):
+        self.names = sorted(names)
+        points = sorted((self._hash(f"{name}#{i}"), name) for name in self.names for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [name for _, name in points]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(str(key).encode()).digest()[:8], "big")
+
+    def shard_for(self, user_id):
+        if not self._owners:
+            raise ValueError("No shards registered; run `python shard_fitness.py init`.")
+        index = bisect.bisect(self._hashes, self._hash(user_id)) % len(self._hashes)
+        return self._owners[index]
+
+
+class Shard:
+    """One database: its engine and a connection pool (shared with the backend for the directory)."""
+
+    def __init__(self, name, engine, pool_config=None, pool=None):
+        self.name = name
+        self.engine = engine
+        self.pool = pool or ConnectionPool(engine.connect, check=engine.check, reset=engine.reset,
+                                           **(pool_config or {}))
+
+    @contextmanager
+    def cursor(self, commit=False):
+        """A cursor outside the backend's instrumentation, for the directory and the rebalancer."""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                yield cur
+            if commit:
+                conn.commit()
+
+    def __repr__(self):
+        return f"Shard({self.name!r})"
+
+
+class ShardMap:
+    """
+    Where each user lives, with the directory's view cached for `directory_ttl` seconds, plus the
+    executor for scatter-gather and blocks of `id_block` globally unique ids per counter.
+    """
+
+    def __init__(self, shards, directory, vnodes=64, directory_ttl=5.0, workers=8, id_block=100):
+        self.shards = {shard.name: shard for shard in shards}
+        self.directory = directory
+        self.vnodes = vnodes
+        self.directory_ttl = directory_ttl
+        self.id_block = id_block
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard")
+        self._lock = threading.Lock()
+        self._id_lock = threading.Lock()
+        self._ids = {}  # counter -> (next id, end of the block)
+        self.states = {}
+        self.overrides = {}  # user_id -> (shard name, moving)
+        self.placement = self.target = None
+        self._loaded_at = float("-inf")
+        self.counters = {'directory_loads': 0, 'directory_errors': 0, 'scatters': 0, 'scatter_calls': 0}
+
+    # --- Directory ---
+
+    def refresh(self, force=False):
+        """Reloads the shard states and directory once they are `directory_ttl` seconds old."""
+        if not force and time.monotonic() - self._loaded_at < self.directory_ttl:
+            return
+        with self._lock:
+            if not force and time.monotonic() - self._loaded_at < self.directory_ttl:
+                return
+            try:
+                with self.directory.cursor() as cur:
+                    cur.execute("SELECT name, state FROM shards;")
+                    states = dict(cur.fetchall())
+                    cur.execute("SELECT user_id, shard, moving FROM shard_directory;")
+                    overrides = {user_id: (shard, bool(moving)) for user_id, shard, moving in cur.fetchall()}
+            except Exception:
+                self.counters['directory_errors'] += 1
+                if self.placement is None:
+                    raise
+                # Keep routing with the last view rather than failing every request
+                self._loaded_at = time.monotonic()
+                return
+            unknown = set(states) - set(self.shards)
+            if unknown:
+                raise ValueError(f"Shards {sorted(unknown)} are registered but not configured in FITNESS_SHARDS.")
+            self.states, self.overrides = states, overrides
+            self.placement = HashRing([name for name, state in states.items() if state in ("active", "draining")],
+                                      self.vnodes)
+            self.target = HashRing([name for name, state in states.items() if state in ("active", "joining")],
+                                   self.vnodes)
+            self._loaded_at = time.monotonic()
+            self.counters['directory_loads'] += 1
+
+    def locate(self, user_id):
+        """(shard, moving) holding `user_id` now."""
+        self.refresh()
+        name, moving = self.overrides.get(user_id) or (self.placement.shard_for(user_id), False)
+        return self.shards[name], moving
+
+    def target_for(self, user_id):
+        """The shard `user_id` belongs on once joining shards are active and draining ones gone."""
+        self.refresh()
+        return self.shards[self.target.shard_for(user_id)]
+
+    def place_new(self, user_id):
+        """The shard for a new user: by the target ring, recorded in the directory if it is still joining."""
+        shard = self.target_for(user_id)
+        if shard.name not in self.placement.names:
+            self.set_location([user_id], shard.name)
+        return shard
+
+    def set_location(self, user_ids, name, moving=False):
+        """Records where `user_ids` live in the directory and reloads this process's view."""
+        with self.directory.cursor(commit=True) as cur:
+            cur.executemany("""
+                INSERT INTO shard_directory (user_id, shard, moving, updated_at) VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    shard = excluded.shard, moving = excluded.moving, updated_at = excluded.updated_at;
+            """, [(user_id, name, moving) for user_id in user_ids])
+        self.refresh(force=True)
+
+    def forget(self, user_id):
+        """Drops a deleted user's directory entry and email claims."""
+        with self.directory.cursor(commit=True) as cur:
+            cur.execute("DELETE FROM shard_directory WHERE user_id = %s;", (user_id,))
+            cur.execute("DELETE FROM shard_emails WHERE user_id = %s;", (user_id,))
+
+    def wait(self, grace=1.0):
+        """Sleeps until every process has reloaded the directory since the last change."""
+        time.sleep(self.directory_ttl + grace)
+
+    # --- Global ids and emails ---
+
+    def next_id(self, counter):
+        """A new id for `counter` ("users", "workouts" or "goals"), unique across every shard."""
+        with self._id_lock:
+            next_id, end = self._ids.get(counter, (0, 0))
+            if next_id >= end:
+                with self.directory.cursor(commit=True) as cur:
+                    cur.execute("UPDATE shard_ids SET next_id = next_id + %s WHERE name = %s RETURNING next_id;",
+                                (self.id_block, counter))
+                    row = cur.fetchone()
+                if row is None:
+                    raise ValueError(f"No id counter for {counter}; run `python shard_fitness.py init`.")
+                end = row[0]
+                next_id = end - self.id_block
+            self._ids[counter] = (next_id + 1, end)
+            return next_id
+
+    def claim_email(self, email, user_id):
+        """Reserves `email` for `user_id` on every shard; False if another user holds it."""
+        with self.directory.cursor(commit=True) as cur:
+            cur.execute("INSERT INTO shard_emails (email, user_id) VALUES (%s, %s) ON CONFLICT (email) DO NOTHING;",
+                        (email, user_id))
+            if cur.rowcount:
+                return True
+            cur.execute("SELECT user_id FROM shard_emails WHERE email = %s;", (email,))
+            row = cur.fetchone()
+        return row is not None and row[0] == user_id
+
+    def release_emails(self, user_id, keep):
+        """Frees the emails `user_id` claimed other than `keep`."""
+        with self.directory.cursor(commit=True) as cur:
+            cur.execute("DELETE FROM shard_emails WHERE user_id = %s AND email <> %s;", (user_id, keep))
+
+    # --- Routing ---
+
+    @contextmanager
+    def using(self, shard, writable=True):
+        """Binds backend calls in this block to `shard`; with writable=False their writes raise ShardMovingError."""
+        token = _active.set((shard, writable))
+        try:
+            yield shard
+        finally:
+            _active.reset(token)
+
+    @contextmanager
+    def using_user(self, user_id):
+        """Binds backend calls in this block to `user_id`'s shard, read-only while they are being moved."""
+        shard, moving = self.locate(user_id)
+        with self.using(shard, writable=not moving):
+            yield shard
+
+    def group(self, user_ids, write=False):
+        """{shard: [user ids on it]}; with write=True raises ShardMovingError if any of them is moving."""
+        groups = {}
+        for user_id in user_ids:
+            shard, moving = self.locate(user_id)
+            if write and moving:
+                raise ShardMovingError(f"User {user_id} is moving to another shard; try again shortly.")
+            groups.setdefault(shard, []).append(user_id)
+        return groups
+
+    def scatter(self, calls, writable=True):
+        """
+        Runs each (shard, fn) of `calls` bound to its shard, in parallel on the executor when there
+        is more than one, and returns their results in order. Each call gets a copy of the
+        caller's context, so the backend's query accounting still sees it.
+        """
+        self.counters['scatters'] += 1
+        self.counters['scatter_calls'] += len(calls)
+        if len(calls) == 1:
+            shard, fn = calls[0]
+            with self.using(shard, writable):
+                return [fn()]
+        futures = [self._executor.submit(contextvars.copy_context().run, self._bound, shard, fn, writable)
+                   for shard, fn in calls]
+        return [future.result() for future in futures]
+
+    def _bound(self, shard, fn, writable):
+        with self.using(shard, writable):
+            return fn()
+
+    def every_shard(self, fn):
+        """fn(shard) on every registered shard, in parallel; returns {shard name: result}."""
+        self.refresh()
+        shards = [self.shards[name] for name in sorted(self.states)]
+        results = self.scatter([(shard, functools.partial(fn, shard)) for shard in shards])
+        return dict(zip((shard.name for shard in shards), results))
+
+    def stats(self):
+        return dict(self.counters, states=dict(self.states), directory_entries=len(self.overrides),
+                    moving=sum(1 for _, moving in self.overrides.values() if moving),
+                    shards={name: shard.pool.stats() for name, shard in self.shards.items()})
+
+    def closeall(self):
+        self._executor.shutdown(wait=False)
+        for shard in self.shards.values():
+            if shard.pool is not self.directory.pool:
+                shard.pool.closeall()
+
+
+# --- Rebalancing ---
+
+def _user_rows_deletes(engine):
+    """DELETEs for a batch of users' rows on one shard, children first. Rows of other users
+    naming them as a friend stay: those users live on this shard and still have the friendship."""
+    users = engine.id_list_condition("user_id")
+    return [f"DELETE FROM {table} WHERE {where.format(users=users)};" for table, where, _ in reversed(USER_TABLES)]
+
+
+def _delete_user_rows(cur, engine, user_ids):
+    ids = engine.id_list_param(user_ids)
+    for sql in _user_rows_deletes(engine):
+        cur.execute(sql, (ids,))
+
+
+def copy_users(user_ids, source, target):
+    """Copies every row of `user_ids` from `source` to `target` in one target transaction. Returns rows per table."""
+    engine = source.engine
+    users = engine.id_list_condition("user_id")
+    ids = engine.id_list_param(user_ids)
+    copied = {}
+    with source.cursor() as src, target.cursor(commit=True) as dst:
+        # Leftovers of an interrupted attempt would collide with the copy
+        _delete_user_rows(dst, target.engine, user_ids)
+        for table, where, surrogate in USER_TABLES:
+            src.execute(f"SELECT * FROM {table} WHERE {where.format(users=users)};", (ids,))
+            columns = [column[0] for column in src.description]
+            rows = src.fetchall()
+            if surrogate:
+                keep = [i for i, column in enumerate(columns) if column != surrogate]
+                columns = [columns[i] for i in keep]
+                rows = [tuple(row[i] for i in keep) for row in rows]
+            if rows:
+                target.engine.bulk_insert(dst, table, columns, rows)
+            copied[table] = len(rows)
+    return copied
+
+
+def move_users(shard_map, user_ids, source, target, grace=1.0):
+    """Moves `user_ids` from shard `source` to `target` online (see the module docstring). Returns rows per table."""
+    shard_map.set_location(user_ids, source.name, moving=True)
+    shard_map.wait(grace)
+    copied = copy_users(user_ids, source, target)
+    shard_map.set_location(user_ids, target.name)
+    shard_map.wait(grace)
+    with source.cursor(commit=True) as cur:
+        _delete_user_rows(cur, source.engine, user_ids)
+    return copied
+
+
+def plan(shard_map):
+    """
+    Scans every registered shard's users. Returns (moves, stale): {(source, target): [user ids]}
+    for users not on their target shard, and {shard: [user ids]} for copies the directory does
+    not point at (left by an interrupted move).
+    """
+    shard_map.refresh(force=True)
+    moves, stale = {}, {}
+    for name in sorted(shard_map.states):
+        shard = shard_map.shards[name]
+        with shard.cursor() as cur:
+            cur.execute("SELECT user_id FROM users ORDER BY user_id;")
+            user_ids = [row[0] for row in cur.fetchall()]
+        for user_id in user_ids:
+            located, _ = shard_map.locate(user_id)
+            if located is not shard:
+                stale.setdefault(name, []).append(user_id)
+                continue
+            target = shard_map.target_for(user_id)
+            if target is not shard:
+                moves.setdefault((name, target.name), []).append(user_id)
+    return moves, stale
+
+
+def _recover(shard_map, grace, log):
+    """Clears moving marks an interrupted rebalance left and deletes its half-made copies."""
+    with shard_map.directory.cursor(commit=True) as cur:
+        cur.execute("UPDATE shard_directory SET moving = %s WHERE moving = %s;", (False, True))
+        cleared = cur.rowcount
+    _, stale = plan(shard_map)
+    if not cleared and not stale:
+        return
+    log(f"Recovering an interrupted rebalance: {cleared} users unmarked, "
+        f"{sum(map(len, stale.values()))} stale copies to delete.")
+    shard_map.wait(grace)
+    for name, user_ids in stale.items():
+        shard = shard_map.shards[name]
+        with shard.cursor(commit=True) as cur:
+            _delete_user_rows(cur, shard.engine, user_ids)
+
+
+def finish(shard_map, grace=1.0):
+    """Makes joining shards active, drops drained ones and prunes directory entries the ring now implies."""
+    with shard_map.directory.cursor(commit=True) as cur:
+        cur.execute("UPDATE shards SET state = 'active' WHERE state = 'joining';")
+        cur.execute("DELETE FROM shards WHERE state = 'draining';")
+    shard_map.refresh(force=True)
+    # Until every process has the new ring, their entries must stay
+    shard_map.wait(grace)
+    redundant = [user_id for user_id, (name, moving) in shard_map.overrides.items()
+                 if not moving and shard_map.placement.shard_for(user_id) == name]
+    engine = shard_map.directory.engine
+    for start in range(0, len(redundant), 10000):
+        with shard_map.directory.cursor(commit=True) as cur:
+            cur.execute(f"DELETE FROM shard_directory WHERE {engine.id_list_condition('user_id')};",
+                        (engine.id_list_param(redundant[start:start + 10000]),))
+    shard_map.refresh(force=True)
+    return len(redundant)
+
+
+def rebalance(shard_map, batch_size=500, pause=0.0, grace=1.0, log=print):
+    """
+    Moves every misplaced user to its target shard in batches, rescanning until none is left,
+    then finishes the joins and drains. Returns totals: users moved, batches, rows copied per table.
+    """
+    _recover(shard_map, grace, log)
+    totals = {'moved': 0, 'batches': 0}
+    while True:
+        moves, stale = plan(shard_map)
+        for name, user_ids in stale.items():
+            shard = shard_map.shards[name]
+            with shard.cursor(commit=True) as cur:
+                _delete_user_rows(cur, shard.engine, user_ids)
+        if not moves:
+            break
+        for (source, target), user_ids in sorted(moves.items()):
+            for start in range(0, len(user_ids), batch_size):
+                batch = user_ids[start:start + batch_size]
+                copied = move_users(shard_map, batch, shard_map.shards[source], shard_map.shards[target], grace)
+                totals['moved'] += len(batch)
+                totals['batches'] += 1
+                for table, rows in copied.items():
+                    totals[table] = totals.get(table, 0) + rows
+                log(f"  moved {len(batch)} users {source} -> {target} ({copied.get('workouts', 0)} workouts)")
+                if pause:
+                    time.sleep(pause)
+    totals['pruned_entries'] = finish(shard_map, grace)
+    return totals
+
+
+# --- Setup ---
+
+def init(shard_map):
+    """
+    Brings every shard (and the directory) to the latest schema, drops friends.friend_id's foreign
+    key on the shards, registers the configured shards as active if none are registered yet, and
+    moves the id counters past the highest id on any shard.
+    """
+    for shard in [shard_map.directory] + list(shard_map.shards.values()):
+        shard.engine.init_schema()
+    for shard in shard_map.shards.values():
+        conn = shard.engine.connect()
+        try:
+            shard.engine.drop_foreign_key(conn, "friends", "friend_id")
+        finally:
+            conn.close()
+    with shard_map.directory.cursor(commit=True) as cur:
+        cur.execute("SELECT COUNT(*) FROM shards;")
+        if not cur.fetchone()[0]:
+            cur.executemany("INSERT INTO shards (name, state) VALUES (%s, 'active');",
+                            [(name,) for name in sorted(shard_map.shards)])
+    for counter, table, column in ID_COUNTERS:
+        highest = 0
+        for shard in shard_map.shards.values():
+            with shard.cursor() as cur:
+                cur.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table};")
+                highest = max(highest, cur.fetchone()[0])
+        with shard_map.directory.cursor(commit=True) as cur:
+            cur.execute("""
+                INSERT INTO shard_ids (name, next_id) VALUES (%s, %s)
+                ON CONFLICT (name) DO UPDATE SET next_id = CASE
+                    WHEN excluded.next_id > shard_ids.next_id THEN excluded.next_id ELSE shard_ids.next_id END;
+            """, (counter, highest + 1))
+    shard_map.refresh(force=True)
+
+
+def set_state(shard_map, name, state):
+    """Registers shard `name` as joining, or marks it draining."""
+    if name not in shard_map.shards:
+        raise ValueError(f"Shard {name!r} is not configured in FITNESS_SHARDS.")
+    with shard_map.directory.cursor(commit=True) as cur:
+        cur.execute("""
+            INSERT INTO shards (name, state) VALUES (%s, %s)
+            ON CONFLICT (name) DO UPDATE SET state = excluded.state;
+        """, (name, state))
+    shard_map.refresh(force=True)
+
+
+def status(shard_map):
+    """{shard name: (state, users)} for every configured shard (state None if unregistered)."""
+    shard_map.refresh(force=True)
+    result = {}
+    for name, shard in sorted(shard_map.shards.items()):
+        with shard.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM users;")
+            result[name] = (shard_map.states.get(name), cur.fetchone()[0])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Set up and rebalance the shards of a sharded deployment.")
+    parser.add_argument("command", choices=["init", "status", "add", "drain", "plan", "rebalance", "move"])
+    parser.add_argument("shard", nargs="?", help="add/drain: shard name as configured in FITNESS_SHARDS")
+    parser.add_argument("--user", type=int, help="move: user id")
+    parser.add_argument("--to", help="move: target shard")
+    parser.add_argument("--batch-size", type=int, default=500, help="users per move")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    parser.add_argument("--grace", type=float, default=1.0,
+                        help="seconds to wait beyond the directory TTL for in-flight requests")
+    args = parser.parse_args()
+
+    import backend_fitness as backend
+
+    shard_map = backend.get_shard_map()
+    if shard_map is None:
+        print("No shards configured (set FITNESS_SHARDS).")
+        return 1
+    try:
+        if args.command == "init":
+            init(shard_map)
+            print(f"Initialised {len(shard_map.shards)} shards.")
+        elif args.command in ("add", "drain"):
+            if not args.shard:
+                parser.error(f"{args.command} needs a shard name")
+            set_state(shard_map, args.shard, "joining" if args.command == "add" else "draining")
+            print(f"{args.shard} is {'joining' if args.command == 'add' else 'draining'}; "
+                  f"run `rebalance` to move users.")
+        elif args.command == "plan":
+            moves, stale = plan(shard_map)
+            for (source, target), user_ids in sorted(moves.items()):
+                print(f"{source} -> {target}: {len(user_ids)} users")
+            for name, user_ids in sorted(stale.items()):
+                print(f"{name}: {len(user_ids)} stale copies")
+            if not moves:
+                print("Every user is on its target shard.")
+        elif args.command == "rebalance":
+            totals = rebalance(shard_map, args.batch_size, args.pause, args.grace)
+            print(f"Moved {totals['moved']} users in {totals['batches']} batches; "
+                  f"pruned {totals['pruned_entries']} directory entries.")
+        elif args.command == "move":
+            if args.user is None or args.to not in shard_map.shards:
+                parser.error("move needs --user and --to with a configured shard")
+            source, _ = shard_map.locate(args.user)
+            if source.name == args.to:
+                print(f"User {args.user} is already on {args.to}.")
+                return 0
+            copied = move_users(shard_map, [args.user], source, shard_map.shards[args.to], args.grace)
+            print(f"Moved user {args.user} {source.name} -> {args.to}: {copied}")
+        else:
+            for name, (state, users) in status(shard_map).items():
+                print(f"{name}: {state or 'unregistered'}, {users} users")
+            stats = shard_map.stats()
+            print(f"{stats['directory_entries']} directory entries, {stats['moving']} users moving.")
+    except backend.DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Rebuild and verify the per-user workout summaries (user_workout_stats / user_workout_daily).
+
+    python stats_fitness.py verify            # compare summaries with the workouts table
+    python stats_fitness.py rebuild           # recompute every summary from scratch
+    python stats_fitness.py rebuild --user 7  # recompute a single user
+
+When sharded every shard holds the summaries of its own users and is rebuilt or verified in turn.
+"""
+import argparse
+import sys
+
+from backend_fitness import DB_ERRORS, db_connection, clear_leaderboard_cache, clear_read_cache, on_each_database
+
+# Raw aggregates straight from workouts, in the same shape as the summary tables. Workouts still
+# waiting in workout_events (AGGREGATION_MODE "worker") are left out: the worker adds them when it
+# applies their events, so counting them here as well would count them twice.
+RAW_STATS = """
+    SELECT w.user_id, COUNT(*) AS workout_count, SUM(w.duration_minutes) AS duration_sum,
+           SUM(w.duration_minutes * w.duration_minutes) AS duration_sumsq,
+           MIN(w.duration_minutes) AS duration_min, MAX(w.duration_minutes) AS duration_max
+    FROM workouts w
+    WHERE NOT EXISTS (SELECT 1 FROM workout_events e WHERE e.workout_id = w.workout_id){user_filter}
+    GROUP BY w.user_id
+"""
+RAW_DAILY = """
+    SELECT w.user_id, w.workout_date, COUNT(*) AS workout_count, SUM(w.duration_minutes) AS duration_sum
+    FROM workouts w
+    WHERE NOT EXISTS (SELECT 1 FROM workout_events e WHERE e.workout_id = w.workout_id){user_filter}
+    GROUP BY w.user_id, w.workout_date
+"""
+
+
+def rebuild_stats(user_id=None):
+    """
+    Recomputes the summaries for one user (or everyone) in a single transaction per database,
+    from the workouts whose events the aggregation worker has already applied.
+    Returns (users, daily buckets) written.
+    """
+    where = "WHERE user_id = %s" if user_id is not None else ""
+    user_filter = " AND w.user_id = %s" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+
+    def rebuild():
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"DELETE FROM user_workout_stats {where};", params)
+                cur.execute(f"DELETE FROM user_workout_daily {where};", params)
+                cur.execute(f"""
+                    INSERT INTO user_workout_stats (user_id, workout_count, duration_sum, duration_sumsq, duration_min, duration_max)
+                    {RAW_STATS.format(user_filter=user_filter)};
+                """, params)
+                users = cur.rowcount
+                cur.execute(f"""
+                    INSERT INTO user_workout_daily (user_id, workout_date, workout_count, duration_sum)
+                    {RAW_DAILY.format(user_filter=user_filter)};
+                """, params)
+                days = cur.rowcount
+            conn.commit()
+        return users, days
+
+    counts = on_each_database(rebuild)
+    clear_leaderboard_cache()
+    clear_read_cache()
+    return sum(users for users, _ in counts), sum(days for _, days in counts)
+
+
+def verify_stats(user_id=None):
+    """Returns the user ids whose summaries disagree with the (applied) workouts."""
+    user_filter = " AND w.user_id = %s" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+    summary_where = "WHERE s.user_id = %s" if user_id is not None else ""
+
+    def verify():
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT COALESCE(r.user_id, s.user_id)
+                    FROM ({RAW_STATS.format(user_filter=user_filter)}) r
+                    FULL OUTER JOIN (SELECT * FROM user_workout_stats s {summary_where}) s ON s.user_id = r.user_id
+                    WHERE r.workout_count IS DISTINCT FROM s.workout_count
+                       OR r.duration_sum IS DISTINCT FROM s.duration_sum
+                       OR r.duration_sumsq IS DISTINCT FROM s.duration_sumsq
+                       OR r.duration_min IS DISTINCT FROM s.duration_min
+                       OR r.duration_max IS DISTINCT FROM s.duration_max;
+                """, params + params)
+                mismatched = {row[0] for row in cur.fetchall()}
+                cur.execute(f"""
+                    SELECT DISTINCT COALESCE(r.user_id, s.user_id)
+                    FROM ({RAW_DAILY.format(user_filter=user_filter)}) r
+                    FULL OUTER JOIN (SELECT * FROM user_workout_daily s {summary_where}) s
+                        ON s.user_id = r.user_id AND s.workout_date = r.workout_date
+                    WHERE r.workout_count IS DISTINCT FROM s.workout_count
+                       OR r.duration_sum IS DISTINCT FROM s.duration_sum;
+                """, params + params)
+                mismatched.update(row[0] for row in cur.fetchall())
+        return mismatched
+
+    return sorted(set().union(*on_each_database(verify)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or verify the per-user workout summaries.")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--user", type=int, help="limit to one user id")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "rebuild":
+            users, days = rebuild_stats(args.user)
+            print(f"Rebuilt summaries for {users} users ({days} daily buckets).")
+            return 0
+        mismatched = verify_stats(args.user)
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return 2
+    if mismatched:
+        print(f"{len(mismatched)} users have stale summaries: {', '.join(map(str, mismatched[:50]))}"
+              + (" ..." if len(mismatched) > 50 else ""))
+        print("Run `python stats_fitness.py rebuild` to fix them.")
+        return 1
+    print("All workout summaries match the workouts table.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,624 @@
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from functools import lru_cache
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+except ImportError:  # psycopg2 is only needed for the Postgres engine
+    psycopg2 = None
+
+# Embedded schema for the SQLite engine (the Postgres schema after every migration in migrate_fitness)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    weight DECIMAL(5,2)
+);
+
+-- AUTOINCREMENT on workouts, exercises and goals: ids are never reused after a delete, which the
+-- exercise cache and the global-ranking watermark rely on
+CREATE TABLE IF NOT EXISTS workouts (
+    workout_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    workout_date DATE NOT NULL,
+    duration_minutes INT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS exercises (
+    exercise_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    workout_id INT REFERENCES workouts(workout_id) ON DELETE CASCADE,
+    exercise_name VARCHAR(255) NOT NULL,
+    sets INT,
+    reps INT,
+    weight DECIMAL(6,2)
+);
+
+-- Each friendship is stored in both directions, so neighbours are one range of the UNIQUE index
+CREATE TABLE IF NOT EXISTS friends (
+    id INTEGER PRIMARY KEY,
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    friend_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    UNIQUE (user_id, friend_id),
+    CHECK (user_id <> friend_id)
+);
+
+CREATE TABLE IF NOT EXISTS goals (
+    goal_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    goal_description TEXT NOT NULL,
+    target_value INT,
+    progress_value INT DEFAULT 0,
+    goal_type VARCHAR(32) NOT NULL DEFAULT 'manual',
+    exercise_name VARCHAR(255),
+    period_start DATE
+);
+
+CREATE INDEX IF NOT EXISTS idx_users_name ON users (name);
+CREATE INDEX IF NOT EXISTS idx_users_name_nocase ON users (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_users_email_nocase ON users (email COLLATE NOCASE);
+DROP INDEX IF EXISTS idx_workouts_user_date;
+CREATE INDEX IF NOT EXISTS idx_workouts_user_date_cover
+    ON workouts (user_id, workout_date DESC, workout_id DESC, duration_minutes);
+DROP INDEX IF EXISTS idx_exercises_workout;
+CREATE INDEX IF NOT EXISTS idx_exercises_workout_cover ON exercises (workout_id, exercise_id);
+CREATE INDEX IF NOT EXISTS idx_friends_friend ON friends (friend_id, user_id);
+CREATE INDEX IF NOT EXISTS idx_goals_user_type ON goals (user_id, goal_type);
+
+CREATE TABLE IF NOT EXISTS user_workout_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    workout_count INT NOT NULL DEFAULT 0,
+    duration_sum BIGINT NOT NULL DEFAULT 0,
+    duration_sumsq BIGINT NOT NULL DEFAULT 0,
+    duration_min INT,
+    duration_max INT
+);
+
+CREATE TABLE IF NOT EXISTS user_workout_daily (
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    workout_date DATE NOT NULL,
+    workout_count INT NOT NULL DEFAULT 0,
+    duration_sum BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, workout_date)
+);
+
+CREATE TABLE IF NOT EXISTS workout_idempotency (
+    user_id INT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    idempotency_key VARCHAR(64) NOT NULL,
+    workout_id INT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, idempotency_key)
+);
+CREATE INDEX IF NOT EXISTS idx_workout_idempotency_created ON workout_idempotency (created_at);
+
+CREATE TABLE IF NOT EXISTS purge_queue (
+    user_id INTEGER PRIMARY KEY,
+    requested_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- AUTOINCREMENT: processed events are deleted, and ids must not be handed out again
+CREATE TABLE IF NOT EXISTS workout_events (
+    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_type VARCHAR(32) NOT NULL DEFAULT 'workout_logged',
+    user_id INT NOT NULL,
+    workout_id INT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_workout_events_user ON workout_events (user_id);
+
+CREATE TABLE IF NOT EXISTS worker_checkpoints (
+    worker VARCHAR(64) PRIMARY KEY,
+    last_event_id BIGINT NOT NULL DEFAULT 0,
+    events_processed BIGINT NOT NULL DEFAULT 0,
+    batches BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS shards (
+    name VARCHAR(64) PRIMARY KEY,
+    state VARCHAR(16) NOT NULL DEFAULT 'active'
+);
+
+CREATE TABLE IF NOT EXISTS shard_directory (
+    user_id INTEGER PRIMARY KEY,
+    shard VARCHAR(64) NOT NULL,
+    moving BOOLEAN NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS shard_ids (
+    name VARCHAR(64) PRIMARY KEY,
+    next_id BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS shard_emails (
+    email VARCHAR(255) PRIMARY KEY,
+    user_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_shard_emails_user ON shard_emails (user_id);
+"""
+
+# One-off data fixes for files created by older versions, applied once each in order and
+# tracked in PRAGMA user_version (the Postgres equivalents are migrations in migrate_fitness).
+# A fix is an SQL script or a function of the connection
+SQLITE_DATA_MIGRATIONS = [
+    # 1: friendships stored in both directions
+    """
+    DELETE FROM friends WHERE user_id = friend_id;
+    -- "WHERE true" lets SQLite parse the ON CONFLICT clause after a SELECT
+    INSERT INTO friends (user_id, friend_id)
+        SELECT friend_id, user_id FROM friends WHERE true
+        ON CONFLICT (user_id, friend_id) DO NOTHING;
+    """,
+    # 2: ids of workouts, exercises and goals never handed out twice
+    lambda conn: _sqlite_autoincrement(conn, (("workouts", "workout_id"), ("exercises", "exercise_id"),
+                                               ("goals", "goal_id"))),
+]
+
+# Connection-level tuning applied to every SQLite connection
+SQLITE_PRAGMAS = (
+    "PRAGMA foreign_keys = ON;",
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA busy_timeout = 5000;",
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA cache_size = -16000;",
+    "PRAGMA mmap_size = 268435456;",
+)
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, datetime.isoformat)
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+# Columns added after a table first shipped; CREATE TABLE IF NOT EXISTS leaves existing files without them
+SQLITE_ADDED_COLUMNS = [
+    ("goals", "goal_type", "VARCHAR(32) NOT NULL DEFAULT 'manual'"),
+    ("goals", "exercise_name", "VARCHAR(255)"),
+    ("goals", "period_start", "DATE"),
+]
+
+_PLACEHOLDER = re.compile(r"%s|%%|%\((\w+)\)s")
+
+
+@lru_cache(maxsize=512)
+def _to_qmark(sql):
+    """Rewrites psycopg2-style %s / %(name)s placeholders as SQLite ? / :name placeholders."""
+    def replace(m):
+        if m.group(1):
+            return f":{m.group(1)}"
+        return "?" if m.group(0) == "%s" else "%"
+    return _PLACEHOLDER.sub(replace, sql)
+
+
+class SQLiteCursor(sqlite3.Cursor):
+    """
+    Cursor that accepts the %s placeholders used throughout backend_fitness
+    and supports `with conn.cursor() as cur:` like psycopg2 cursors.
+    """
+
+    def execute(self, sql, params=None):
+        if params is None:
+            return super().execute(sql)
+        return super().execute(_to_qmark(sql), params)
+
+    def executemany(self, sql, seq_of_params):
+        return super().executemany(_to_qmark(sql), seq_of_params)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class SQLiteConnection(sqlite3.Connection):
+    def cursor(self, factory=SQLiteCursor):
+        return super().cursor(factory)
+
+
+class StorageEngine:
+    """
+    Base class for the storage engines backend_fitness can run on.
+    An engine knows how to open, check and reset connections for its driver,
+    which exceptions the driver raises, and how to create the schema.
+    """
+
+    name = None
+    Error = ()
+    IntegrityError = ()
+
+    def connect(self):
+        raise NotImplementedError
+
+    def check(self, conn):
+        """Health check used by the pool before handing out an idle connection."""
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1;")
+        conn.rollback()
+        return True
+
+    def reset(self, conn):
+        """Leaves a returned connection outside of any transaction."""
+        raise NotImplementedError
+
+    def is_closed(self, conn):
+        return False
+
+    def is_transient(self, error):
+        """Whether a failed transaction may succeed if simply run again (lost connection, lock conflict)."""
+        return False
+
+    def init_schema(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    # --- Bulk helpers ---
+
+    def replica_lag(self, cur):
+        """Seconds the database behind `cur` trails its primary; engines without replication report 0."""
+        return 0.0
+
+    def skip_locked_clause(self):
+        """Row-locking suffix for a SELECT that lets concurrent consumers claim different rows."""
+        return ""
+
+    def id_list_condition(self, column):
+        """SQL condition matching `column` against a list of ids passed as one parameter (see id_list_param)."""
+        raise NotImplementedError
+
+    def id_list_param(self, ids):
+        raise NotImplementedError
+
+    def prefix_condition(self, column):
+        """Case-insensitive, index-backed "column starts with" condition; bind prefix_params()."""
+        raise NotImplementedError
+
+    def prefix_params(self, prefix):
+        raise NotImplementedError
+
+    def prefix_order(self, column):
+        """ORDER BY expression that walks the same index as prefix_condition, so LIMIT stops early."""
+        raise NotImplementedError
+
+    def contains_condition(self, column):
+        """Case-insensitive "column contains" condition; bind contains_params()."""
+        raise NotImplementedError
+
+    def contains_params(self, text):
+        raise NotImplementedError
+
+    def older_than_condition(self, column):
+        """
+        Matches `column` timestamps, as filled in by the schema's DEFAULT, more than a number of
+        days old by the database's own clock; bind older_than_params().
+        """
+        raise NotImplementedError
+
+    def older_than_params(self, days):
+        raise NotImplementedError
+
+    def server_cursor(self, conn, name, itersize=1000):
+        """A cursor that streams results instead of materialising them client-side."""
+        return conn.cursor()
+
+    def allocate_ids(self, cur, table, id_column, count):
+        """Reserves `count` new primary keys for `table` inside the current transaction."""
+        raise NotImplementedError
+
+    def bulk_insert(self, cur, table, columns, rows):
+        """Inserts many rows with a single statement/round trip."""
+        raise NotImplementedError
+
+    def drop_foreign_key(self, conn, table, column):
+        """Drops the foreign key on `table`.`column` and commits, e.g. friends.friend_id on a shard."""
+        raise NotImplementedError
+
+
+class PostgresEngine(StorageEngine):
+    """The original psycopg2/Postgres storage."""
+
+    name = "postgres"
+
+    def __init__(self, **config):
+        if psycopg2 is None:
+            raise RuntimeError("The Postgres engine requires psycopg2 to be installed.")
+        self.config = config
+        self.Error = psycopg2.Error
+        self.IntegrityError = psycopg2.IntegrityError
+
+    def connect(self):
+        return psycopg2.connect(**self.config)
+
+    def check(self, conn):
+        if conn.closed:
+            return False
+        return super().check(conn)
+
+    def reset(self, conn):
+        if conn.closed:
+            raise psycopg2.InterfaceError("connection already closed")
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+
+    def is_closed(self, conn):
+        return bool(conn.closed)
+
+    # serialization_failure, deadlock_detected, lock_not_available, and the connection-exception class
+    TRANSIENT_SQLSTATES = ("40001", "40P01", "55P03")
+
+    def is_transient(self, error):
+        if isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+            return True
+        code = getattr(error, "pgcode", None) or ""
+        return code in self.TRANSIENT_SQLSTATES or code.startswith("08")
+
+    def replica_lag(self, cur):
+        # Fully replayed means caught up, however long ago the last transaction was
+        cur.execute("""
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+            END;
+        """)
+        return float(cur.fetchone()[0])
+
+    def skip_locked_clause(self):
+        return "FOR UPDATE SKIP LOCKED"
+
+    def id_list_condition(self, column):
+        # A single array parameter keeps the statement (and its plan) the same size for any list length.
+        return f"{column} = ANY(%s)"
+
+    def id_list_param(self, ids):
+        return list(ids)
+
+    @staticmethod
+    def _escape_like(text):
+        return text.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    def prefix_condition(self, column):
+        # Served by the (lower(column) COLLATE "C") indexes, which support both LIKE 'x%' and ordering
+        return f'lower({column}) COLLATE "C" LIKE %s'
+
+    def prefix_params(self, prefix):
+        return (self._escape_like(prefix) + "%",)
+
+    def prefix_order(self, column):
+        return f'lower({column}) COLLATE "C"'
+
+    def contains_condition(self, column):
+        # Served by the pg_trgm GIN index for patterns of three characters or more
+        return f"lower({column}) LIKE %s"
+
+    def contains_params(self, text):
+        return ("%" + self._escape_like(text) + "%",)
+
+    def older_than_condition(self, column):
+        # DEFAULT now() writes the session's local time into TIMESTAMP columns; compare with the same clock
+        return f"{column} < now() - %s * interval '1 day'"
+
+    def older_than_params(self, days):
+        return (days,)
+
+    def server_cursor(self, conn, name, itersize=1000):
+        cur = conn.cursor(name=name)
+        cur.itersize = itersize
+        return cur
+
+    def allocate_ids(self, cur, table, id_column, count):
+        cur.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s);",
+            (table, id_column, count)
+        )
+        return [row[0] for row in cur.fetchall()]
+
+    def bulk_insert(self, cur, table, columns, rows):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            writer.writerow(["" if value is None else value for value in row])
+        buf.seek(0)
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+    def drop_foreign_key(self, conn, table, column):
+        with conn.cursor() as cur:
+            cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_{column}_fkey;")
+        conn.commit()
+
+    def init_schema(self):
+        """Brings the database to the latest schema with migrate_fitness."""
+        from migrate_fitness import upgrade
+
+        conn = self.connect()
+        try:
+            upgrade(conn, log=lambda message: None)
+        finally:
+            conn.close()
+
+
+class SQLiteEngine(StorageEngine):
+    """
+    Embedded SQLite storage for single-node deployments and benchmarks.
+    File databases run in WAL mode so readers never block the writer.
+    `path=":memory:"` gives a private in-memory database shared by all pooled connections.
+    """
+
+    name = "sqlite"
+    Error = sqlite3.Error
+    IntegrityError = sqlite3.IntegrityError
+
+    _memory_ids = itertools.count()
+
+    def __init__(self, path="fitness.db", cached_statements=256):
+        self.cached_statements = cached_statements
+        self._keepalive = None
+        if path == ":memory:":
+            self.database = f"file:fitness_mem_{os.getpid()}_{next(self._memory_ids)}?mode=memory&cache=shared"
+            self.uri = True
+            # A shared-cache memory database disappears with its last connection.
+            self._keepalive = self.connect()
+        else:
+            self.database = path
+            self.uri = False
+        self.path = path
+        self.init_schema()
+
+    def connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            uri=self.uri,
+            factory=SQLiteConnection,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def reset(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+
+    def is_transient(self, error):
+        # SQLITE_BUSY/SQLITE_LOCKED once busy_timeout has run out
+        return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+    def id_list_condition(self, column):
+        return f"{column} IN (SELECT value FROM json_each(%s))"
+
+    def id_list_param(self, ids):
+        return json.dumps(list(ids))
+
+    def prefix_condition(self, column):
+        # A range scan on the NOCASE index; unlike LIKE it needs no escaping
+        return f"{column} COLLATE NOCASE >= %s AND {column} COLLATE NOCASE < %s"
+
+    def prefix_params(self, prefix):
+        return (prefix, prefix + "\U0010ffff")
+
+    def prefix_order(self, column):
+        return f"{column} COLLATE NOCASE"
+
+    def contains_condition(self, column):
+        return f"instr(lower({column}), %s) > 0"
+
+    def contains_params(self, text):
+        return (text.lower(),)
+
+    def older_than_condition(self, column):
+        # DEFAULT CURRENT_TIMESTAMP is UTC, as is datetime('now')
+        return f"{column} < datetime('now', %s)"
+
+    def older_than_params(self, days):
+        return (f"-{days} days",)
+
+    def allocate_ids(self, cur, table, id_column, count):
+        # Take the write lock first so no other connection can claim the same ids.
+        if not cur.connection.in_transaction:
+            cur.execute("BEGIN IMMEDIATE;")
+        # AUTOINCREMENT tables remember ids of deleted rows in sqlite_sequence; inserting the
+        # allocated ids moves the sequence past them
+        cur.execute(f"SELECT COALESCE(MAX({id_column}), 0) FROM {table};")
+        start = cur.fetchone()[0]
+        if _autoincrement(cur.connection, table):
+            cur.execute("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = %s;", (table,))
+            start = max(start, cur.fetchone()[0])
+        return list(range(start + 1, start + 1 + count))
+
+    def bulk_insert(self, cur, table, columns, rows):
+        placeholders = ", ".join(["%s"] * len(columns))
+        cur.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders});", rows)
+
+    def drop_foreign_key(self, conn, table, column):
+        # SQLite cannot drop a constraint: rebuild the table without it, keeping rows and indexes
+        rebuilt, count = re.subn(rf"(\b{column}\s+\w+)\s+REFERENCES\s+\w+\s*\(\w+\)(\s+ON DELETE \w+)?",
+                                 r"\1", _table_sql(conn, table), flags=re.IGNORECASE)
+        if count:
+            _rebuild_table(conn, table, rebuilt)
+
+    def init_schema(self):
+        conn = self.connect()
+        try:
+            if not self.uri:
+                conn.execute("PRAGMA journal_mode = WAL;")
+            for table, column, definition in SQLITE_ADDED_COLUMNS:
+                existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table});")}
+                if existing and column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition};")
+            conn.executescript(SQLITE_SCHEMA)
+            version = conn.execute("PRAGMA user_version;").fetchone()[0]
+            for number, script in enumerate(SQLITE_DATA_MIGRATIONS[version:], start=version + 1):
+                if callable(script):
+                    script(conn)
+                else:
+                    conn.executescript(script)
+                conn.execute(f"PRAGMA user_version = {number};")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def close(self):
+        if self._keepalive is not None:
+            self._keepalive.close()
+            self._keepalive = None
+
+
+def _table_sql(conn, table):
+    return conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?;", (table,)).fetchone()[0]
+
+
+def _autoincrement(conn, table):
+    return "AUTOINCREMENT" in _table_sql(conn, table).upper()
+
+
+def _rebuild_table(conn, table, sql):
+    """
+    Recreates an SQLite table from a changed CREATE TABLE statement (`sql`), keeping its rows and
+    indexes. Foreign keys are off meanwhile, so rows referencing the table survive the DROP.
+    """
+    indexes = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL;", (table,)
+    )]
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = OFF;")
+    try:
+        conn.execute("BEGIN IMMEDIATE;")
+        conn.execute(re.sub(rf"\b{table}\b", f"{table}_rebuilt", sql, count=1))
+        conn.execute(f"INSERT INTO {table}_rebuilt SELECT * FROM {table};")
+        conn.execute(f"DROP TABLE {table};")
+        conn.execute(f"ALTER TABLE {table}_rebuilt RENAME TO {table};")
+        for index in indexes:
+            conn.execute(index)
+        conn.commit()
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON;")
+
+
+def _sqlite_autoincrement(conn, tables):
+    """Rebuilds tables of older files whose INTEGER PRIMARY KEY lacks AUTOINCREMENT."""
+    for table, id_column in tables:
+        sql = _table_sql(conn, table)
+        if "AUTOINCREMENT" not in sql.upper():
+            _rebuild_table(conn, table, re.sub(rf"(\b{id_column}\s+INTEGER\s+PRIMARY\s+KEY)", r"\1 AUTOINCREMENT",
+                                               sql, count=1, flags=re.IGNORECASE))
+
+
+def create_engine(kind, **options):
+    """Builds a storage engine by name ("postgres" or "sqlite")."""
+    if kind == "postgres":
+        return PostgresEngine(**options)
+    if kind == "sqlite":
+        return SQLiteEngine(**options)
+    raise ValueError(f"Unknown storage engine: {kind}")
@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend_fitness  # noqa: E402
+import shard_fitness  # noqa: E402
+from storage_fitness import create_engine  # noqa: E402
+
+# Postgres runs only against a throwaway database named here; its tables are emptied before each test
+POSTGRES_TEST_DB = os.environ.get("FITNESS_TEST_POSTGRES_DB")
+
+ENGINES = [
+    "sqlite",
+    pytest.param("postgres", marks=pytest.mark.skipif(
+        not POSTGRES_TEST_DB, reason="set FITNESS_TEST_POSTGRES_DB to run against Postgres")),
+]
+
+TABLES = ("users", "workouts", "exercises", "friends", "goals", "user_workout_stats", "user_workout_daily",
+          "workout_idempotency", "workout_events")
+
+
+def _engine(kind, tmp_path):
+    if kind == "sqlite":
+        return create_engine("sqlite", path=str(tmp_path / "fitness.db"))
+    engine = create_engine("postgres", **dict(backend_fitness.DB_CONFIG, database=POSTGRES_TEST_DB))
+    engine.init_schema()
+    conn = engine.connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE;")
+        conn.commit()
+    finally:
+        conn.close()
+    return engine
+
+
+@pytest.fixture(params=ENGINES)
+def backend(request, tmp_path):
+    """backend_fitness running on an empty database of each engine, with cold caches."""
+    engine = _engine(request.param, tmp_path)
+    backend_fitness.configure_engine(engine)
+    backend_fitness.clear_read_cache()
+    backend_fitness.clear_leaderboard_cache()
+    yield backend_fitness
+    backend_fitness.configure_pool()
+    engine.close()
+
+
+@pytest.fixture
+def sharded(tmp_path):
+    """backend_fitness spread over two SQLite shards, the first doubling as the directory."""
+    paths = {name: str(tmp_path / f"{name}.db") for name in ("s0", "s1")}
+    engine = create_engine("sqlite", path=paths["s0"])
+    backend_fitness.configure_engine(engine)
+    ttl = backend_fitness.SHARD_CONFIG['directory_ttl']
+    backend_fitness.configure_shards([(name, create_engine("sqlite", path=path)) for name, path in paths.items()],
+                                     directory_ttl=0.0)
+    shard_fitness.init(backend_fitness.get_shard_map())
+    backend_fitness.clear_read_cache()
+    backend_fitness.clear_leaderboard_cache()
+    yield backend_fitness
+    backend_fitness.configure_shards(None, directory_ttl=ttl)
+    backend_fitness.configure_pool()
+    engine.close()
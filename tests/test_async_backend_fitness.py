@@ -0,0 +1,34 @@
+import asyncio
+from datetime import date, timedelta
+
+import async_backend_fitness as api
+
+
+def test_iter_workouts_streams_past_one_chunk(backend):
+    user_id = backend.create_user("Ann", "ann@example.com", 70)
+    expected = [backend.create_workout_with_exercises(user_id, date.today() - timedelta(days=days_ago), 30, [])
+                for days_ago in range(7)]
+
+    async def collect():
+        return [row[0] async for row in api.iter_workouts(user_id, chunk_size=3)]
+
+    assert asyncio.run(collect()) == expected
+    assert backend.get_function_metrics()['iter_workouts']['errors'] == 0
+
+
+def test_iter_workouts_closed_early(backend):
+    user_id = backend.create_user("Ann", "ann@example.com", 70)
+    for days_ago in range(7):
+        backend.create_workout_with_exercises(user_id, date.today() - timedelta(days=days_ago), 30, [])
+
+    async def first_four():
+        rows = api.iter_workouts(user_id, chunk_size=3)
+        taken = []
+        async for row in rows:
+            taken.append(row)
+            if len(taken) == 4:
+                break
+        await rows.aclose()
+        return taken
+
+    assert len(asyncio.run(first_four())) == 4
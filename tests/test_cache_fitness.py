@@ -0,0 +1,81 @@
+import time
+
+from cache_fitness import ReadCache, cached_read
+
+
+def test_invalidation_drops_only_tagged_entries():
+    cache = ReadCache()
+    cache.put("goals-7", [1], [("goals", 7)], cache.generation())
+    cache.put("user-7", "Ann", [("user", 7), ("users",)], cache.generation())
+    cache.put("user-8", "Ben", [("user", 8), ("users",)], cache.generation())
+    cache.invalidate(("user", 7))
+    assert [cache.get(key) for key in ("goals-7", "user-7", "user-8")] == [(True, [1]), (False, None), (True, "Ben")]
+    cache.invalidate(("users",))
+    assert cache.get("user-8") == (False, None)
+    assert cache.stats()['invalidations'] == 2
+
+
+def test_read_racing_a_write_is_not_cached():
+    cache = ReadCache()
+    generation = cache.generation()
+    # A write lands between the read starting and its result being stored
+    cache.invalidate(("user", 7))
+    cache.put("user-7", "stale", [("user", 7)], generation)
+    assert cache.get("user-7") == (False, None)
+    cache.put("user-7", "fresh", [("user", 7)], cache.generation())
+    assert cache.get("user-7") == (True, "fresh")
+    cache.clear()
+    assert cache.get("user-7") == (False, None)
+
+
+def test_entries_expire_and_evict():
+    cache = ReadCache(max_entries=2, ttl=60)
+    for key in "abc":
+        cache.put(key, key, [("tag", key)], cache.generation())
+    assert cache.get("a") == (False, None)
+    assert cache.stats()['evictions'] == 1
+
+    cache.ttl = 0.01
+    time.sleep(0.02)
+    assert cache.get("b") == (False, None)
+    stats = cache.stats()
+    assert (stats['expirations'], stats['entries']) == (1, 1)
+    # An evicted entry leaves nothing behind under its tags
+    cache.invalidate(("tag", "a"))
+    assert cache.stats()['invalidations'] == 0
+
+
+def test_cached_read_keys_by_arguments():
+    cache = ReadCache()
+    calls = []
+
+    @cached_read(cache, tags=lambda args, result: [("user", args[0])])
+    def lookup(user_id, fields=()):
+        calls.append((user_id, fields))
+        return None if user_id < 0 else {'id': user_id, 'fields': list(fields)}
+
+    assert lookup(1, fields=["name"]) == lookup(1, fields=["name"])
+    lookup(2, fields=["name"])
+    assert calls == [(1, ["name"]), (2, ["name"])]
+    cache.invalidate(("user", 1))
+    lookup(1, fields=["name"])
+    assert len(calls) == 3
+    # None (a database error) is never cached
+    lookup(-1)
+    lookup(-1)
+    assert len(calls) == 5
+    assert lookup.uncached(1) == {'id': 1, 'fields': []}
+
+
+def test_backend_writes_invalidate_cached_reads(backend):
+    ann = backend.create_user("Ann", "ann@example.com", 60)
+    assert backend.get_user(ann)[1] == "Ann"
+    hits = backend.get_read_cache_stats()['hits']
+    assert backend.get_user(ann)[1] == "Ann"
+    assert backend.get_read_cache_stats()['hits'] == hits + 1
+    assert backend.update_user(ann, "Annie", "ann@example.com", 60)
+    assert backend.get_user(ann)[1] == "Annie"
+
+    assert backend.get_goals(ann) == []
+    assert backend.create_goal(ann, "Get strong", 100)
+    assert [goal[1] for goal in backend.get_goals(ann)] == ["Get strong"]
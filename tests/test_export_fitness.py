@@ -0,0 +1,92 @@
+import csv
+import gc
+import json
+import os
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from export_fitness import EXPORT_COLUMNS, ExportFile, JSONLWriter, export_to_tempfile, export_training_log
+
+DAY = date(2024, 5, 1)
+
+
+@pytest.fixture
+def history(backend):
+    """Two users; Ann has a workout with two exercises and one without any."""
+    ann = backend.create_user("Ann", "ann@example.com", 60)
+    ben = backend.create_user("Ben", "ben@example.com", 80)
+    first = backend.create_workout_with_exercises(ann, DAY, 45, [
+        {'name': "Squat", 'sets': 5, 'reps': 5, 'weight': 100.5},
+        {'name': "Bench", 'sets': 3, 'reps': 8, 'weight': None},
+    ])
+    second = backend.create_workout_with_exercises(ann, DAY, 20, [])
+    backend.create_workout_with_exercises(ben, DAY, 30, [{'name': "Row", 'sets': 4, 'reps': 10, 'weight': 40}])
+    return ann, first, second
+
+
+def test_csv_export(history, tmp_path):
+    ann, first, second = history
+    path = tmp_path / "log.csv"
+    result = export_training_log(str(path), "csv", ann)
+    with open(path, newline="") as f:
+        header, *rows = csv.reader(f)
+    assert header == list(EXPORT_COLUMNS)
+    # Postgres writes DECIMAL weights with their scale ("100.50")
+    assert [row[:7] + [float(row[7]) if row[7] else None] for row in rows] == [
+        [str(ann), str(first), "2024-05-01", "45", "Squat", "5", "5", 100.5],
+        [str(ann), str(first), "2024-05-01", "45", "Bench", "3", "8", None],
+        [str(ann), str(second), "2024-05-01", "20", "", "", "", None],
+    ]
+    assert result['rows'] == 3
+    assert result['bytes'] == path.stat().st_size
+
+
+def test_jsonl_export_of_every_user(history, tmp_path):
+    ann, first, _ = history
+    path = tmp_path / "log.jsonl"
+    assert export_training_log(str(path), "jsonl")['rows'] == 4
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert records[0] == {'user_id': ann, 'workout_id': first, 'workout_date': "2024-05-01", 'duration_minutes': 45,
+                          'exercise_name': "Squat", 'sets': 5, 'reps': 5, 'weight': 100.5}
+    assert [r['exercise_name'] for r in records] == ["Squat", "Bench", None, "Row"]
+
+
+def test_export_is_written_in_chunks(history, tmp_path):
+    ann, _, _ = history
+    progress = []
+    result = export_training_log(str(tmp_path / "log.csv"), "csv", ann, chunk_size=2,
+                                 progress=lambda rows, elapsed: progress.append(rows))
+    assert progress == [2, 3]
+    assert result['rows'] == 3
+
+
+def test_jsonl_serialises_decimals_and_dates(tmp_path):
+    path = tmp_path / "log.jsonl"
+    writer = JSONLWriter(str(path))
+    writer.write([(1, 2, date(2024, 5, 1), 30, "Squat", 5, 5, Decimal("102.50"))])
+    writer.close()
+    assert json.loads(path.read_text()) == {
+        'user_id': 1, 'workout_id': 2, 'workout_date': "2024-05-01", 'duration_minutes': 30,
+        'exercise_name': "Squat", 'sets': 5, 'reps': 5, 'weight': 102.5,
+    }
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        export_training_log(str(tmp_path / "log.xml"), "xml")
+
+
+def test_export_file_is_removed(history):
+    ann, _, _ = history
+    export = ExportFile(export_to_tempfile(ann, "csv"), "csv")
+    assert export.size > 0
+    export.remove()
+    assert not os.path.exists(export.path)
+
+    # An abandoned export goes when nothing holds it any more
+    path = export_to_tempfile(ann, "csv")
+    ExportFile(path, "csv")
+    gc.collect()
+    assert not os.path.exists(path)
@@ -0,0 +1,65 @@
+from graph_fitness import AdjacencyCache, friends_of_friends, mutual_friend_counts, query_suggestions
+
+
+def test_friends_of_friends_ranks_by_mutual_friends():
+    adjacency = {2: {1, 4, 5}, 3: {1, 4, 6}, 4: {2, 3}}
+    # 4 is a friend already; 5 and 6 share one friend each, ties broken by id
+    assert friends_of_friends(1, {2, 3, 4}, adjacency) == [(5, 1), (6, 1)]
+    assert friends_of_friends(1, {2, 3}, adjacency) == [(4, 2), (5, 1), (6, 1)]
+    assert friends_of_friends(1, {2, 3}, adjacency, limit=1) == [(4, 2)]
+    assert mutual_friend_counts({2, 3}, {4: {2, 3}, 5: {2}, 6: set()}, [4, 5, 6]) == {4: 2, 5: 1, 6: 0}
+
+
+def test_adjacency_cache_invalidation():
+    cache = AdjacencyCache()
+    cache.put_many({1: {2}, 2: {1, 3}, 3: {2}, 4: set()})
+    assert cache.get_many([1, 5]) == ({1: {2}}, [5])
+    cache.invalidate_friendship(1, 2)
+    assert cache.get_many([1, 2, 3]) == ({3: {2}}, [1, 2])
+    cache.put_many({2: {1, 3}})
+    cache.invalidate_users(3)
+    assert cache.get_many([2, 3, 4]) == ({4: frozenset()}, [2, 3])
+    assert cache.stats()['friend_sets'] == 1
+
+
+def _graph(backend):
+    """Ann - Ben - Cat - Dan, plus Ann - Eve - Cat: Cat is two hops from Ann by two paths."""
+    ids = {name: backend.create_user(name, f"{name.lower()}@example.com", 70)
+           for name in ("Ann", "Ben", "Cat", "Dan", "Eve")}
+    for left, right in (("Ann", "Ben"), ("Ben", "Cat"), ("Cat", "Dan"), ("Ann", "Eve"), ("Eve", "Cat")):
+        assert backend.add_friend(ids[left], ids[right])[0]
+    return ids
+
+
+def test_friendships_are_stored_in_both_directions(backend):
+    ids = _graph(backend)
+    with backend.db_cursor() as cur:
+        cur.execute("SELECT user_id, friend_id FROM friends WHERE %s IN (user_id, friend_id);", (ids["Ann"],))
+        pairs = set(map(tuple, cur.fetchall()))
+    assert pairs == {(ids["Ann"], ids["Ben"]), (ids["Ben"], ids["Ann"]), (ids["Ann"], ids["Eve"]),
+                     (ids["Eve"], ids["Ann"])}
+    assert backend.remove_friend(ids["Eve"], ids["Ann"])
+    assert backend.get_friend_ids(ids["Ann"]) == {ids["Ben"]}
+    assert ids["Ann"] not in backend.get_friend_ids(ids["Eve"])
+
+
+def test_suggestions_in_memory_match_the_sql_query(backend):
+    ids = _graph(backend)
+    expected = [(ids["Cat"], "Cat", 2)]
+    assert backend.suggest_friends(ids["Ann"]) == expected
+    with backend.db_cursor() as cur:
+        assert [tuple(row) for row in query_suggestions(cur, ids["Ann"])] == expected
+    assert backend.get_mutual_friend_counts(ids["Ann"], [ids["Cat"], ids["Dan"]]) == {ids["Cat"]: 2, ids["Dan"]: 0}
+
+    # A new friendship reaches the cached friend sets the suggestions were computed from
+    backend.add_friend(ids["Ben"], ids["Dan"])
+    assert backend.suggest_friends(ids["Ann"]) == [(ids["Cat"], "Cat", 2), (ids["Dan"], "Dan", 1)]
+    backend.add_friend(ids["Ann"], ids["Cat"])
+    assert backend.suggest_friends(ids["Ann"]) == [(ids["Dan"], "Dan", 2)]
+
+
+def test_large_friend_lists_fall_back_to_sql(backend, monkeypatch):
+    ids = _graph(backend)
+    backend.clear_leaderboard_cache()
+    monkeypatch.setattr(backend, "SUGGESTION_LOAD_LIMIT", 0)
+    assert [tuple(row) for row in backend.suggest_friends(ids["Ann"])] == [(ids["Cat"], "Cat", 2)]
@@ -0,0 +1,99 @@
+import io
+import json
+from datetime import date
+
+import pytest
+
+import import_fitness
+from import_fitness import RejectedRecord, bulk_import_workouts, parse_workout, read_csv, read_jsonl
+
+
+def _jsonl(*records):
+    return read_jsonl(io.StringIO("\n".join(r if isinstance(r, str) else json.dumps(r) for r in records)))
+
+
+def test_parse_workout():
+    workout = parse_workout({'user_id': "3", 'workout_date': "2024-05-01", 'duration_minutes': "45",
+                             'exercises': [{'name': " Squat ", 'sets': "5", 'reps': "", 'weight': "100.5"}]})
+    assert workout == {'user_id': 3, 'workout_date': date(2024, 5, 1), 'duration_minutes': 45,
+                       'exercises': [{'name': "Squat", 'sets': 5, 'reps': None, 'weight': 100.5}],
+                       'idempotency_key': None}
+
+
+@pytest.mark.parametrize("raw, error", [
+    ({'workout_date': "2024-05-01", 'duration_minutes': 45}, "missing field"),
+    ({'user_id': 1, 'workout_date': "May 1st", 'duration_minutes': 45}, "invalid workout value"),
+    ({'user_id': 1, 'workout_date': "2024-05-01", 'duration_minutes': 0}, "must be positive"),
+    ({'user_id': 1, 'workout_date': "2024-05-01", 'duration_minutes': 5, 'exercises': {'name': "Row"}}, "must be a list"),
+    ({'user_id': 1, 'workout_date': "2024-05-01", 'duration_minutes': 5, 'exercises': [{'sets': 1}]}, "name is required"),
+    ({'user_id': 1, 'workout_date': "2024-05-01", 'duration_minutes': 5, 'exercises': [{'name': "Row", 'reps': "x"}]},
+     "invalid exercise value"),
+    ({'user_id': 1, 'workout_date': "2024-05-01", 'duration_minutes': 5, 'idempotency_key': "k" * 65}, "longer than 64"),
+])
+def test_parse_workout_rejects(raw, error):
+    with pytest.raises(RejectedRecord, match=error):
+        parse_workout(raw)
+
+
+def test_read_csv_groups_exercise_rows():
+    f = io.StringIO(
+        "user_id,workout_date,duration_minutes,exercise_name,sets,reps,weight\n"
+        "1,2024-05-01,45,Squat,5,5,100\n"
+        "1,2024-05-01,45,Bench,5,5,60\n"
+        "1,2024-05-02,30,,,,\n"
+        "2,2024-05-02,30,Row,3,10,40\n"
+    )
+    records = list(read_csv(f))
+    assert [line for line, _ in records] == [2, 4, 5]
+    assert [[ex['exercise_name'] for ex in raw['exercises']] for _, raw in records] == [["Squat", "Bench"], [], ["Row"]]
+
+
+def test_import_writes_summaries_goals_and_rejects(backend):
+    user_id = backend.create_user("Ann", "ann@example.com", 70)
+    assert backend.create_goal(user_id, "Squat 120", 120, goal_type='max_weight', exercise_name="Squat")
+    today = date.today().isoformat()
+    rejects = io.StringIO()
+    stats = bulk_import_workouts(_jsonl(
+        {'user_id': user_id, 'workout_date': today, 'duration_minutes': 40,
+         'exercises': [{'name': "Squat", 'sets': 5, 'reps': 5, 'weight': 110}]},
+        {'user_id': user_id, 'workout_date': today, 'duration_minutes': 20},
+        {'user_id': 999, 'workout_date': today, 'duration_minutes': 20},
+        "{not json",
+    ), batch_rows=2, rejects=rejects)
+    assert (stats['workouts'], stats['exercises'], stats['rejected'], stats['batches']) == (2, 1, 2, 2)
+    assert [json.loads(line)['line'] for line in rejects.getvalue().splitlines()] == [3, 4]
+    assert backend.get_business_insights(user_id)['total_duration'] == 60
+    assert backend.get_goals(user_id)[0][3] == 110
+
+
+def test_import_skips_duplicate_keys(backend):
+    user_id = backend.create_user("Ann", "ann@example.com", 70)
+    logged = backend.create_workout_with_exercises(user_id, date.today(), 30, [], idempotency_key="logged")
+    workout = {'user_id': user_id, 'workout_date': date.today().isoformat(), 'duration_minutes': 25}
+    records = [dict(workout, idempotency_key=key) for key in ("logged", "a", "a", "b")]
+    stats = bulk_import_workouts(_jsonl(*records))
+    assert (stats['workouts'], stats['duplicates']) == (2, 2)
+    # Delivered again: everything is a duplicate
+    stats = bulk_import_workouts(_jsonl(*records))
+    assert (stats['workouts'], stats['duplicates']) == (0, 4)
+    assert len(backend.get_all_workouts_for_user(user_id)) == 3
+    with backend.db_cursor() as cur:
+        cur.execute("SELECT workout_id FROM workout_idempotency WHERE idempotency_key = 'logged';")
+        assert cur.fetchone()[0] == logged
+
+
+def test_key_claimed_by_a_concurrent_writer(backend, monkeypatch):
+    user_id = backend.create_user("Ann", "ann@example.com", 70)
+    claim = import_fitness._claim_keys
+
+    def racing_claim(cur, workouts):
+        # The key shows up after the batch was read, as if another writer had just committed it
+        cur.execute("INSERT INTO workout_idempotency (user_id, idempotency_key) VALUES (%s, 'raced');", (user_id,))
+        return claim(cur, workouts)
+
+    monkeypatch.setattr(import_fitness, "_claim_keys", racing_claim)
+    stats = bulk_import_workouts(_jsonl(
+        {'user_id': user_id, 'workout_date': date.today().isoformat(), 'duration_minutes': 25, 'idempotency_key': "raced"},
+        {'user_id': user_id, 'workout_date': date.today().isoformat(), 'duration_minutes': 35},
+    ))
+    assert (stats['workouts'], stats['duplicates'], stats['failed_batches']) == (1, 1, 0)
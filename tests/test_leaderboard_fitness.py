@@ -0,0 +1,84 @@
+import time
+from datetime import date, timedelta
+
+import leaderboard_fitness
+from leaderboard_fitness import LeaderboardCache, _LRUCache, rank
+
+
+def test_lru_evicts_least_recently_used_and_expires():
+    cache = _LRUCache(max_entries=2, ttl=60)
+    cache.put(1, "a")
+    cache.put(2, "b")
+    assert cache.get(1) == "a"
+    cache.put(3, "c")
+    assert (cache.get(2), cache.get(1), cache.get(3)) == (None, "a", "c")
+    assert (cache.hits, cache.misses) == (3, 1)
+
+    cache.ttl = 0.01
+    time.sleep(0.02)
+    assert cache.get(1) is None
+    assert len(cache) == 1
+
+
+def test_invalidation_hooks():
+    cache = LeaderboardCache()
+    cache.put_friend_set(1, [1, 2])
+    cache.put_friend_set(2, [2, 1, 3])
+    cache.put_friend_set(4, [4])
+    for user_id in (1, 2, 3):
+        cache.put_metrics(user_id, (f"u{user_id}", 0, 0, 0, user_id))
+
+    cache.invalidate_user_metrics(2)
+    assert cache.get_metrics([1, 2]) == ({1: ("u1", 0, 0, 0, 1)}, [2])
+    cache.invalidate_friendship(1, 4)
+    assert (cache.get_friend_set(1), cache.get_friend_set(4)) == (None, None)
+    assert cache.get_friend_set(2) == {1, 2, 3}
+
+    # A deleted user goes from every friend set that mentions them
+    cache.put_friend_set(1, [1, 2])
+    cache.invalidate_users(3)
+    assert (cache.get_friend_set(1), cache.get_friend_set(2)) == ({1, 2}, None)
+    assert cache.get_metrics([3]) == ({}, [3])
+
+
+def test_metrics_are_dropped_when_the_day_changes(monkeypatch):
+    cache = LeaderboardCache()
+    cache.put_metrics(1, ("u1", 1, 30, 30, 30))
+    cache.put_friend_set(1, [1])
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=1)
+
+    monkeypatch.setattr(leaderboard_fitness, "date", Tomorrow)
+    assert cache.get_metrics([1]) == ({}, [1])
+    assert cache.get_friend_set(1) == {1}
+
+
+def test_rank_orders_by_metric_then_name():
+    metrics = {1: ("Cat", 2, 50, 25.0, 50), 2: ("Ann", 1, 50, 50.0, 50), 3: ("Ben", 3, 90, 30.0, 90)}
+    assert rank(metrics, 'total_duration_all_time') == [("Ben", 90), ("Ann", 50), ("Cat", 50)]
+    assert rank(metrics, 'total_workouts_last_30_days') == [("Ben", 3), ("Cat", 2), ("Ann", 1)]
+    assert rank(metrics, 'no such metric') == rank(metrics, 'total_duration_all_time')
+
+
+def test_backend_serves_leaderboards_from_the_cache(backend):
+    ann = backend.create_user("Ann", "ann@example.com", 60)
+    ben = backend.create_user("Ben", "ben@example.com", 80)
+    cat = backend.create_user("Cat", "cat@example.com", 70)
+    backend.add_friend(ann, ben)
+    backend.create_workout_with_exercises(ben, date.today(), 40, [])
+    assert backend.get_leaderboard_data('total_duration_all_time', ann) == [("Ben", 40), ("Ann", 0)]
+
+    hits = backend.get_leaderboard_cache_stats()['friend_set_hits']
+    assert backend.get_leaderboard_data('total_workouts_last_30_days', ann) == [("Ben", 1), ("Ann", 0)]
+    assert backend.get_leaderboard_cache_stats()['friend_set_hits'] == hits + 1
+
+    # Writes invalidate exactly what they change
+    backend.create_workout_with_exercises(ann, date.today(), 60, [])
+    assert backend.get_leaderboard_data('total_duration_all_time', ann) == [("Ann", 60), ("Ben", 40)]
+    backend.add_friend(ann, cat)
+    assert backend.get_leaderboard_data('total_duration_all_time', ann) == [("Ann", 60), ("Ben", 40), ("Cat", 0)]
+    assert backend.delete_user(ben)
+    assert backend.get_leaderboard_data('total_duration_all_time', ann) == [("Ann", 60), ("Cat", 0)]
@@ -0,0 +1,18 @@
+from datetime import date, timedelta
+
+
+def test_generator_calls_exclude_consumer_work(backend):
+    user_id = backend.create_user("Ann", "ann@example.com", 70)
+    for days_ago in range(5):
+        backend.create_workout_with_exercises(user_id, date.today() - timedelta(days=days_ago), 30, [])
+    backend.create_goal(user_id, "Train", 3)
+    backend.reset_metrics()
+    for _ in backend.iter_workouts(user_id, chunk_size=2):
+        # Made while iter_workouts is suspended: its queries are get_goals' own
+        backend.clear_read_cache()
+        backend.get_goals(user_id)
+    metrics = backend.get_function_metrics()
+    assert metrics['get_goals']['calls'] == 5
+    assert metrics['get_goals']['queries_per_call']['sum'] == 5
+    assert metrics['iter_workouts']['calls'] == 1
+    assert metrics['iter_workouts']['queries_per_call']['sum'] == 1
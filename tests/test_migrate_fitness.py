@@ -0,0 +1,11 @@
+import migrate_fitness
+
+
+def test_versions_are_fixed_and_consecutive():
+    versions = [migration.version for migration in migrate_fitness.MIGRATIONS]
+    assert versions == list(range(1, len(versions) + 1))
+    assert len({migration.name for migration in migrate_fitness.MIGRATIONS}) == len(versions)
+
+
+def test_only_the_baseline_cannot_be_rolled_back():
+    assert [m.version for m in migrate_fitness.MIGRATIONS if m.down is None] == [1]
@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+
+DAY = date(2024, 5, 10)
+
+
+def _history(backend):
+    """Seven workouts over four days, several sharing a date; returns (user id, ids newest first)."""
+    user_id = backend.create_user("Ann", "ann@example.com", 60)
+    logged = [(DAY - timedelta(days=days_ago), backend.create_workout_with_exercises(
+        user_id, DAY - timedelta(days=days_ago), 30, [])) for days_ago in (3, 0, 1, 0, 3, 2, 0)]
+    return user_id, [workout_id for _, workout_id in sorted(logged, reverse=True)]
+
+
+def _walk(backend, user_id, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        page, cursor = backend.get_workouts_page(user_id, limit=limit, after=cursor, **filters)
+        pages.append([row[0] for row in page])
+        if cursor is None:
+            return pages
+
+
+def test_cursors_walk_every_workout_once_in_order(backend):
+    user_id, newest_first = _history(backend)
+    pages = _walk(backend, user_id, 3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    # Ties on workout_date are broken by workout_id, so no page repeats or skips a workout
+    assert sum(pages, []) == newest_first
+
+
+def test_last_full_page_has_no_cursor(backend):
+    user_id, newest_first = _history(backend)
+    assert _walk(backend, user_id, 7) == [newest_first]
+    _, cursor = backend.get_workouts_page(user_id, limit=6)
+    page, last_cursor = backend.get_workouts_page(user_id, limit=6, after=cursor)
+    assert ([row[0] for row in page], last_cursor) == ([newest_first[6]], None)
+
+
+def test_date_filters_apply_to_every_page(backend):
+    user_id, _ = _history(backend)
+    pages = _walk(backend, user_id, 2, start_date=DAY - timedelta(days=2), end_date=DAY - timedelta(days=1))
+    assert [len(page) for page in pages] == [2]
+    rows = backend.get_workouts_page(user_id, limit=10, start_date=DAY - timedelta(days=1))[0]
+    assert {str(row[1]) for row in rows} == {str(DAY), str(DAY - timedelta(days=1))}
+    assert backend.get_workouts_page(user_id, limit=10, end_date=DAY - timedelta(days=10)) == ([], None)
+
+
+def test_cursor_is_the_last_rows_date_and_id(backend):
+    user_id, _ = _history(backend)
+    page, cursor = backend.get_workouts_page(user_id, limit=2)
+    assert cursor == (page[-1][1], page[-1][0])
+
+
+def test_new_workouts_do_not_shift_later_pages(backend):
+    user_id, newest_first = _history(backend)
+    _, cursor = backend.get_workouts_page(user_id, limit=3)
+    backend.create_workout_with_exercises(user_id, DAY, 45, [])
+    page, _ = backend.get_workouts_page(user_id, limit=3, after=cursor)
+    assert [row[0] for row in page] == newest_first[3:6]
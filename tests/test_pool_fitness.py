@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from pool_fitness import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.resets = 0
+
+    def close(self):
+        self.closed = True
+
+
+class Connector:
+    def __init__(self):
+        self.made = []
+
+    def __call__(self):
+        conn = FakeConnection(len(self.made))
+        self.made.append(conn)
+        return conn
+
+
+def test_checkout_reuses_returned_connections():
+    connect = Connector()
+    pool = ConnectionPool(connect, min_size=1, max_size=3)
+    first = pool.getconn()
+    second = pool.getconn()
+    assert (first.number, second.number) == (0, 1)
+    pool.putconn(second)
+    assert pool.getconn() is second
+    with pool.connection() as conn:
+        assert conn not in (first, second)
+    stats = pool.stats()
+    assert (stats['size'], stats['idle'], stats['in_use'], stats['checkouts']) == (3, 1, 2, 4)
+
+
+def test_discarded_and_failed_resets_are_closed():
+    def reset(conn):
+        conn.resets += 1
+        if conn.number == 1:
+            raise RuntimeError("connection lost")
+
+    pool = ConnectionPool(Connector(), min_size=0, max_size=2, reset=reset)
+    broken = pool.getconn()
+    pool.putconn(broken, discard=True)
+    assert broken.closed and broken.resets == 0
+    failing = pool.getconn()
+    pool.putconn(failing)
+    assert failing.closed and failing.resets == 1
+    good = pool.getconn()
+    pool.putconn(good)
+    assert not good.closed
+    stats = pool.stats()
+    assert (stats['size'], stats['connections_created'], stats['connections_closed']) == (1, 3, 2)
+
+
+def test_full_pool_waits_then_times_out():
+    pool = ConnectionPool(Connector(), min_size=0, max_size=1, checkout_timeout=0.05)
+    held = pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+
+    releaser = threading.Timer(0.02, pool.putconn, args=(held,))
+    pool.checkout_timeout = 5.0
+    releaser.start()
+    assert pool.getconn() is held
+    stats = pool.stats()
+    assert (stats['timeouts'], stats['waits']) == (1, 2)
+    assert stats['max_wait_time'] > 0
+
+
+def test_unhealthy_idle_connections_are_replaced():
+    pool = ConnectionPool(Connector(), min_size=1, max_size=2, check=lambda conn: conn.number != 0, check_interval=0.0)
+    conn = pool.getconn()
+    assert conn.number == 1
+    assert pool.stats()['health_check_failures'] == 1
+
+
+def test_idle_connections_above_min_size_expire():
+    pool = ConnectionPool(Connector(), min_size=1, max_size=3, idle_timeout=0.01)
+    conns = [pool.getconn() for _ in range(3)]
+    for conn in conns:
+        pool.putconn(conn)
+    time.sleep(0.02)
+    kept = pool.getconn()
+    assert pool.stats()['size'] == 1
+    assert [conn.closed for conn in conns] == [True, True, False] and kept is conns[2]
+
+
+def test_closeall_closes_idle_and_returned_connections():
+    pool = ConnectionPool(Connector(), min_size=2, max_size=2)
+    held = pool.getconn()
+    pool.closeall()
+    assert pool.stats()['idle'] == 0
+    pool.putconn(held)
+    assert held.closed
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        ConnectionPool(Connector(), min_size=3, max_size=2)
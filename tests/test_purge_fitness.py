@@ -0,0 +1,67 @@
+from datetime import date, datetime, timedelta, timezone
+
+import purge_fitness
+
+
+def test_prune_idempotency_keys_by_age(backend):
+    user_id = backend.create_user("Ann", "ann@example.com", 70)
+    for key in ("old", "recent"):
+        assert backend.create_workout_with_exercises(user_id, date.today(), 30, [], idempotency_key=key)
+    # Timestamps as the schema default writes them (UTC on SQLite; the margins cover any offset)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    with backend.db_cursor(commit=True) as cur:
+        for key, age in (("old", timedelta(days=31)), ("recent", timedelta(days=29))):
+            cur.execute("UPDATE workout_idempotency SET created_at = %s WHERE idempotency_key = %s;", (now - age, key))
+    assert purge_fitness.prune_idempotency_keys(days=30) == 1
+    with backend.db_cursor() as cur:
+        cur.execute("SELECT idempotency_key FROM workout_idempotency;")
+        assert [row[0] for row in cur.fetchall()] == ["recent"]
+
+
+def _account(backend, name, workouts):
+    user_id = backend.create_user(name, f"{name.lower()}@example.com", 70)
+    for minutes in range(1, workouts + 1):
+        backend.create_workout_with_exercises(user_id, date.today(), minutes,
+                                              [{'name': "Squat", 'sets': 3, 'reps': 5, 'weight': 100}])
+    backend.create_goal(user_id, "Train", 3, goal_type='workouts_per_week')
+    return user_id
+
+
+def _rows(backend, table, user_id):
+    owned = ("workout_id IN (SELECT workout_id FROM workouts WHERE user_id = %s)" if table == "exercises"
+             else "user_id = %s")
+    with backend.db_cursor() as cur:
+        cur.execute(f"SELECT COUNT(*) FROM {table} WHERE {owned};", (user_id,))
+        return cur.fetchone()[0]
+
+
+def test_delete_user_removes_every_row(backend):
+    ann, ben = _account(backend, "Ann", 2), _account(backend, "Ben", 1)
+    backend.add_friend(ann, ben)
+    assert backend.delete_user(ann)
+    for table in ("users", "workouts", "exercises", "goals", "user_workout_stats", "user_workout_daily"):
+        assert _rows(backend, table, ann) == 0
+    assert backend.get_friends_list(ben) == []
+    assert backend.get_user(ben) is not None
+
+
+def test_purge_runs_in_bounded_resumable_chunks(backend):
+    users = [_account(backend, name, workouts) for name, workouts in (("Ann", 3), ("Ben", 3), ("Cat", 1), ("Dan", 0))]
+    survivor = _account(backend, "Eve", 1)
+    backend.add_friend(users[0], survivor)
+
+    assert purge_fitness.enqueue(users + [users[0], 10 ** 9]) == 6
+    assert purge_fitness.pending() == (4, 7)
+    # At most four workouts per chunk: Ann alone, then Ben with Cat's one and Dan's none
+    chunks = []
+    totals = purge_fitness.run_purge(max_workouts=4, max_chunks=1, progress=lambda t, _: chunks.append(t['users']))
+    assert (totals['chunks'], totals['users'], totals['workouts'], totals['exercises']) == (1, 1, 3, 3)
+    assert purge_fitness.pending() == (3, 4)
+
+    totals = purge_fitness.run_purge(max_workouts=4, progress=lambda t, _: chunks.append(t['users']))
+    assert (totals['chunks'], totals['users'], totals['workouts']) == (1, 3, 4)
+    assert chunks == [1, 3]
+    assert purge_fitness.pending() == (0, 0)
+    assert [_rows(backend, "users", user_id) for user_id in users] == [0, 0, 0, 0]
+    assert backend.get_friends_list(survivor) == []
+    assert backend.get_user(survivor) is not None
@@ -0,0 +1,90 @@
+import random
+import threading
+
+from ranking_fitness import GlobalRankings, LogHistogram, MetricRanking
+
+
+def _exact_rank(values, user_id):
+    return sum(1 for v in values.values() if v > values[user_id]) + 1
+
+
+def test_exact_mode_ranks_with_ties():
+    ranking = MetricRanking(top_k=1, exact=True)
+    ranking.load({1: 30, 2: 50, 3: 30, 4: 10})
+    assert [ranking.rank(u) for u in (2, 1, 3, 4)] == [(1, 50, True), (2, 30, True), (2, 30, True), (4, 10, True)]
+    ranking.update(4, 60)
+    assert ranking.rank(4) == (1, 60, True)
+    assert ranking.rank(2) == (2, 50, True)
+    ranking.remove(2)
+    assert ranking.rank(1) == (2, 30, True)
+    assert ranking.rank(2) is None
+    assert len(ranking) == 3
+
+
+def test_top_k_refills_when_a_leader_drops():
+    ranking = MetricRanking(top_k=2)
+    ranking.load({1: 100, 2: 90, 3: 80, 4: 10})
+    assert ranking.leaders(2) == [(1, 100), (2, 90)]
+    ranking.update(1, 5)
+    assert ranking.leaders(2) == [(2, 90), (3, 80)]
+    assert ranking.rank(3) == (2, 80, True)
+    ranking.remove(2)
+    assert ranking.leaders(2) == [(3, 80), (4, 10)]
+
+
+def test_integer_ties_are_exact_below_the_top_k():
+    ranking = MetricRanking(top_k=1, integer=True)
+    ranking.load({1: 9, 2: 7, 3: 7, 4: 7, 5: 3})
+    assert [ranking.rank(u)[0] for u in (2, 3, 4, 5)] == [2, 2, 2, 5]
+    assert not ranking.rank(5)[2]
+
+
+def test_approximate_ranks_stay_within_their_bucket():
+    rng = random.Random(7)
+    values = {user_id: rng.lognormvariate(5, 1.5) for user_id in range(2000)}
+    ranking = MetricRanking(top_k=10, relative_error=0.01)
+    ranking.load(values)
+    histogram = ranking.histogram
+    for user_id in rng.sample(sorted(values), 200):
+        position, value, is_exact = ranking.rank(user_id)
+        exact = _exact_rank(values, user_id)
+        if is_exact:
+            assert position == exact
+        else:
+            # Only the users sharing the bucket, all within 2% of the value, can be misplaced
+            assert abs(position - exact) <= histogram.counts[histogram.bucket(value)]
+    # Asking for an exact rank without the sorted list still falls back to the estimate
+    assert ranking.rank(0, exact=True)[0] >= 1
+
+
+def test_histogram_counts_above():
+    histogram = LogHistogram(relative_error=0.01, integer=True)
+    for value in (0, 1, 2, 2, 50, 1000):
+        histogram.add(value)
+    assert histogram.count_above(2) == 2
+    assert histogram.count_above(0) == 5
+    assert histogram.count_above(1000) == 0
+    histogram.remove(1000)
+    assert histogram.count_above(50) == 0
+
+
+def test_global_rankings_updates_under_the_lock():
+    rankings = GlobalRankings(top_k=5)
+    rankings.rebuild({user_id: (f"u{user_id}", 0, 0, 0.0, 0) for user_id in range(100)}, watermark=0)
+
+    def worker(offset):
+        for step in range(200):
+            user_id = (offset + step) % 100
+            with rankings.lock:
+                rankings.update({user_id: (f"u{user_id}", step, step, float(step), step)})
+                if step % 50 == 0:
+                    rankings.remove_users(user_id)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(0, 100, 25)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for ranking in rankings.rankings.values():
+        assert ranking.histogram.total == len(ranking)
+        assert len(ranking.top) == min(5, len(ranking))
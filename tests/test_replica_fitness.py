@@ -0,0 +1,132 @@
+import time
+
+import pytest
+
+from replica_fitness import Replica, ReplicaRouter
+from storage_fitness import create_engine
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeEngine:
+    """Reports `lag` seconds of replication lag, or fails the check while `down` is set."""
+
+    def __init__(self, lag=0.0):
+        self.lag = lag
+        self.down = False
+        self.checks = 0
+
+    def connect(self):
+        return FakeConnection()
+
+    def check(self, conn):
+        return True
+
+    def reset(self, conn):
+        pass
+
+    def replica_lag(self, cur):
+        self.checks += 1
+        if self.down:
+            raise ConnectionError("replica unreachable")
+        return self.lag
+
+
+def _router(*lags, **settings):
+    engines = [FakeEngine(lag) for lag in lags]
+    replicas = [Replica(f"r{i}", engine, {}) for i, engine in enumerate(engines)]
+    return ReplicaRouter(replicas, **dict({'max_lag': 2.0, 'check_interval': 60.0}, **settings)), replicas, engines
+
+
+def test_reads_rotate_over_fresh_replicas():
+    router, replicas, _ = _router(0.0, 0.5)
+    assert [router.route().name for _ in range(4)] == ["r0", "r1", "r0", "r1"]
+    assert [replica.reads for replica in replicas] == [2, 2]
+    assert router.counters['replica_reads'] == 4
+
+
+def test_writers_stick_to_the_primary():
+    router, _, _ = _router(0.0, sticky_seconds=0.05)
+    router.mark_write(7)
+    assert router.route(7) is None
+    assert router.route([8, 7]) is None
+    assert router.route(8).name == "r0"
+    assert router.route() is not None
+    time.sleep(0.06)
+    assert router.route(7).name == "r0"
+    assert router.counters['primary_sticky'] == 2
+
+
+def test_lagging_replicas_fall_back_to_the_primary():
+    router, _, engines = _router(5.0, 0.1)
+    assert [router.route().name for _ in range(3)] == ["r1", "r1", "r1"]
+    engines[1].lag = 9.0
+    # The reading is only refreshed every check_interval
+    assert router.route().name == "r1"
+    router.check_interval = 0.0
+    assert router.route() is None
+    assert router.counters['primary_lagging'] == 1
+    engines[0].lag = 1.0
+    assert router.route().name == "r0"
+
+
+def test_unreachable_replicas_are_skipped_until_retry_after():
+    router, replicas, engines = _router(0.0, retry_after=0.05, check_interval=0.0)
+    engines[0].down = True
+    assert router.route() is None
+    assert router.counters['primary_down'] == 1
+    assert replicas[0].failures == 1
+    checks = engines[0].checks
+    assert router.route() is None
+    assert engines[0].checks == checks
+    engines[0].down = False
+    time.sleep(0.06)
+    assert router.route().name == "r0"
+
+
+def test_failed_checkouts_mark_the_replica_down():
+    router, replicas, _ = _router(0.0, 0.0)
+    router.mark_failed(replicas[0])
+    assert {router.route().name for _ in range(3)} == {"r1"}
+    assert router.stats()['replicas']['r0']['down']
+
+
+@pytest.fixture
+def replicated(backend, tmp_path, monkeypatch):
+    """The backend reading from a replica that has the schema but none of the primary's rows yet."""
+    for key in ('max_lag', 'check_interval', 'sticky_seconds', 'retry_after'):
+        monkeypatch.setitem(backend.REPLICA_CONFIG, key, backend.REPLICA_CONFIG[key])
+    replica = create_engine("sqlite", path=str(tmp_path / "replica.db"))
+    replica.init_schema()
+    backend.configure_replicas([("replica", replica)], sticky_seconds=0.05)
+    yield backend
+    backend.configure_replicas()
+    replica.close()
+
+
+@pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+def test_backend_reads_its_own_writes_then_the_replica(replicated):
+    user_id = replicated.create_user("Ann", "ann@example.com", 70)
+    assert replicated.get_user(user_id)[1] == "Ann"
+    time.sleep(0.06)
+    replicated.clear_read_cache()
+    # Past the sticky window reads go to the (still empty) replica
+    assert replicated.get_user(user_id) is None
+    assert replicated.get_replica_stats()['replica_reads'] == 1
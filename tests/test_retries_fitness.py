@@ -0,0 +1,73 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+
+def _flaky(failures, error=sqlite3.OperationalError("database is locked")):
+    calls = []
+
+    def fn(value):
+        calls.append(value)
+        if len(calls) <= failures:
+            raise error
+        return value * 2
+
+    return fn, calls
+
+
+@pytest.fixture
+def sleeps(backend, monkeypatch):
+    """Records with_retries' sleeps instead of sleeping, with the jitter at its upper bound."""
+    slept = []
+    monkeypatch.setattr(backend.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(backend.time, "sleep", slept.append)
+    monkeypatch.setitem(backend.RETRY_CONFIG, 'attempts', 4)
+    monkeypatch.setitem(backend.RETRY_CONFIG, 'base_delay', 0.05)
+    monkeypatch.setitem(backend.RETRY_CONFIG, 'max_delay', 0.15)
+    return slept
+
+
+@pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+def test_transient_errors_are_retried_with_capped_exponential_backoff(backend, sleeps):
+    fn, calls = _flaky(3)
+    assert backend.with_retries(fn, 21) == 42
+    assert len(calls) == 4
+    assert sleeps == [0.05, 0.1, 0.15]
+
+
+@pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+def test_gives_up_after_the_last_attempt(backend, sleeps):
+    fn, calls = _flaky(10)
+    with pytest.raises(sqlite3.OperationalError):
+        backend.with_retries(fn, 1)
+    assert len(calls) == 4
+    assert len(sleeps) == 3
+
+
+@pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+def test_other_errors_are_not_retried(backend, sleeps):
+    fn, calls = _flaky(1, sqlite3.IntegrityError("UNIQUE constraint failed"))
+    with pytest.raises(sqlite3.IntegrityError):
+        backend.with_retries(fn, 1)
+    assert (len(calls), sleeps) == (1, [])
+
+
+@pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+def test_logging_a_workout_survives_a_lost_commit(backend, sleeps, monkeypatch):
+    user_id = backend.create_user("Ann", "ann@example.com", 70)
+    log_workout = backend._log_workout
+    attempts = []
+
+    def commit_then_fail(*args):
+        # The first attempt commits but its outcome is lost, as with a dropped connection
+        attempts.append(args)
+        result = log_workout(*args)
+        if len(attempts) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return result
+
+    monkeypatch.setattr(backend, "_log_workout", commit_then_fail)
+    workout_id = backend.create_workout_with_exercises(user_id, date.today(), 30, [], idempotency_key="submit-1")
+    assert len(attempts) == 2
+    assert [row[0] for row in backend.get_all_workouts_for_user(user_id)] == [workout_id]
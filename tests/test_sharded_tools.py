@@ -0,0 +1,108 @@
+"""The maintenance tools (worker, purge, summaries, goals, import) against two SQLite shards."""
+import io
+import json
+from datetime import date, timedelta
+
+import goals_fitness
+import import_fitness
+import purge_fitness
+import stats_fitness
+import worker_fitness
+
+TODAY = date.today()
+
+
+def _users(backend, count=8):
+    """`count` users, spread over both shards by the hash ring; returns {shard name: [user ids]}."""
+    shard_map = backend.get_shard_map()
+    placed = {}
+    for i in range(count):
+        user_id = backend.create_user(f"User{i}", f"user{i}@example.com", 70)
+        placed.setdefault(shard_map.locate(user_id)[0].name, []).append(user_id)
+    assert sorted(placed) == ["s0", "s1"]
+    return placed
+
+
+def _query(backend, shard, sql, params=()):
+    with backend.get_shard_map().shards[shard].cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+
+def _stats(backend, shard, user_id):
+    rows = _query(backend, shard, "SELECT workout_count, duration_sum FROM user_workout_stats WHERE user_id = %s;",
+                  (user_id,))
+    return tuple(rows[0]) if rows else None
+
+
+def test_worker_applies_events_on_every_shard(sharded, monkeypatch):
+    monkeypatch.setattr(sharded, "AGGREGATION_MODE", "worker")
+    placed = _users(sharded)
+    for user_ids in placed.values():
+        sharded.create_workout_with_exercises(user_ids[0], TODAY, 30, [])
+    assert worker_fitness.lag()['pending_events'] == 2
+
+    events, users, _ = worker_fitness.process_batch("w1", batch_size=10)
+    assert (events, users) == (2, {user_ids[0] for user_ids in placed.values()})
+    for shard, user_ids in placed.items():
+        assert _stats(sharded, shard, user_ids[0]) == (1, 30)
+    status = worker_fitness.lag()
+    assert status['pending_events'] == 0
+    assert status['workers']['w1']['events_processed'] == 2
+
+
+def test_purge_reaches_every_shard(sharded):
+    placed = _users(sharded)
+    ann, ben = placed["s0"][0], placed["s1"][0]
+    sharded.add_friend(ann, ben)
+    sharded.create_workout_with_exercises(ben, TODAY, 30, [])
+
+    assert purge_fitness.enqueue([ann, ben, 10 ** 9]) == 3
+    assert purge_fitness.pending() == (2, 1)
+    totals = purge_fitness.run_purge()
+    assert (totals['users'], totals['workouts'], totals['chunks']) == (2, 1, 2)
+    assert purge_fitness.pending() == (0, 0)
+    for shard in ("s0", "s1"):
+        assert _query(sharded, shard, "SELECT user_id FROM users WHERE user_id IN (%s, %s);", (ann, ben)) == []
+        assert _query(sharded, shard, "SELECT * FROM friends;") == []
+    assert sharded.get_user(placed["s1"][1]) is not None
+
+
+def test_summaries_and_goals_are_rebuilt_on_every_shard(sharded):
+    placed = _users(sharded)
+    owners = [user_ids[0] for user_ids in placed.values()]
+    for user_id in owners:
+        sharded.create_goal(user_id, "Train", 3, goal_type='workouts_per_week')
+        sharded.create_workout_with_exercises(user_id, TODAY, 30, [])
+        sharded.create_workout_with_exercises(user_id, TODAY - timedelta(days=40), 20, [])
+    for shard in placed:
+        with sharded.get_shard_map().shards[shard].cursor(commit=True) as cur:
+            cur.execute("DELETE FROM user_workout_daily;")
+            cur.execute("UPDATE user_workout_stats SET workout_count = 0;")
+            cur.execute("UPDATE goals SET progress_value = 0;")
+
+    assert stats_fitness.verify_stats() == sorted(owners)
+    assert stats_fitness.rebuild_stats() == (2, 4)
+    assert stats_fitness.verify_stats() == []
+    assert goals_fitness.recompute_goals() == 2
+    for shard, user_ids in placed.items():
+        assert _stats(sharded, shard, user_ids[0]) == (2, 50)
+        assert sharded.get_goals(user_ids[0])[0][3] == 1
+
+
+def test_import_writes_each_workout_on_its_users_shard(sharded):
+    placed = _users(sharded)
+    ann, ben = placed["s0"][0], placed["s1"][0]
+    records = [{'user_id': user_id, 'workout_date': "2024-05-01", 'duration_minutes': 30 + i,
+                'exercises': [{'name': "Squat", 'sets': 5, 'reps': 5, 'weight': 100}]}
+               for i, user_id in enumerate([ann, ben, ann, 10 ** 9])]
+    stats = import_fitness.bulk_import_workouts(import_fitness.read_jsonl(io.StringIO(
+        "\n".join(json.dumps(record) for record in records))))
+    assert (stats['workouts'], stats['exercises'], stats['rejected'], stats['failed_batches']) == (3, 3, 1, 0)
+
+    assert _stats(sharded, "s0", ann) == (2, 62)
+    assert _stats(sharded, "s1", ben) == (1, 31)
+    imported = [row[0] for shard in ("s0", "s1") for row in _query(sharded, shard, "SELECT workout_id FROM workouts;")]
+    # Ids come from the directory, so later workouts on either shard cannot collide with them
+    logged = sharded.create_workout_with_exercises(ben, TODAY, 10, [])
+    assert len(set(imported + [logged])) == 4
@@ -0,0 +1,153 @@
+"""The public backend API, run unchanged on every storage engine (see conftest.ENGINES)."""
+from datetime import date, timedelta
+
+import pytest
+
+from storage_fitness import _to_qmark
+
+TODAY = date.today()
+
+
+def _user(backend, name):
+    user_id = backend.create_user(name, f"{name.lower()}@example.com", 70.5)
+    assert user_id
+    return user_id
+
+
+def _workout(backend, user_id, days_ago, minutes, exercises=()):
+    workout_id = backend.create_workout_with_exercises(
+        user_id, TODAY - timedelta(days=days_ago), minutes,
+        [{'name': name, 'sets': 3, 'reps': 10, 'weight': weight} for name, weight in exercises]
+    )
+    assert workout_id
+    return workout_id
+
+
+def test_placeholder_translation():
+    assert _to_qmark("SELECT %s, %(user_id)s WHERE name LIKE 'a%%'") == "SELECT ?, :user_id WHERE name LIKE 'a%'"
+
+
+def test_placeholders_on_engine(backend):
+    with backend.db_cursor() as cur:
+        cur.execute("SELECT %(a)s + %(b)s, 'x%%';", {'a': 1, 'b': 2})
+        assert tuple(cur.fetchone()) == (3, "x%")
+
+
+def test_id_list_parameter(backend):
+    ids = [_user(backend, name) for name in ("Ann", "Ben", "Cat")]
+    engine = backend.get_engine()
+    with backend.db_cursor() as cur:
+        cur.execute(f"SELECT user_id FROM users WHERE {engine.id_list_condition('user_id')} ORDER BY user_id;",
+                    (engine.id_list_param(ids[:2]),))
+        assert [row[0] for row in cur.fetchall()] == ids[:2]
+        cur.execute(f"SELECT COUNT(*) FROM users WHERE {engine.id_list_condition('user_id')};",
+                    (engine.id_list_param([]),))
+        assert cur.fetchone()[0] == 0
+
+
+def test_users(backend):
+    ann = _user(backend, "Ann")
+    assert backend.create_user("Ann again", "ann@example.com", 60) is None
+    assert backend.get_user(ann)[1:3] == ("Ann", "ann@example.com")
+    assert backend.update_user(ann, "Annie", "annie@example.com", 61)
+    assert backend.get_user(ann)[1] == "Annie"
+    ben = _user(backend, "Ben")
+    assert sorted(row[0] for row in backend.get_all_users()) == [ann, ben]
+    assert backend.search_users("ann") == [(ann, "Annie")]
+    assert backend.search_users("BEN@") == [(ben, "Ben")]
+    assert backend.delete_user(ann)
+    assert backend.get_user(ann) is None
+
+
+def test_workouts_and_exercises(backend):
+    ann = _user(backend, "Ann")
+    first = _workout(backend, ann, 2, 30, [("Squat", 100), ("Bench", 60)])
+    second = _workout(backend, ann, 1, 45, [("Deadlift", 120)])
+    assert [row[0] for row in backend.get_all_workouts_for_user(ann)] == [second, first]
+    page, cursor = backend.get_workouts_page(ann, limit=1)
+    assert [row[0] for row in page] == [second]
+    assert [row[0] for row in backend.get_workouts_page(ann, limit=1, after=cursor)[0]] == [first]
+    assert [row[0] for row in backend.iter_workouts(ann, chunk_size=1)] == [second, first]
+    assert sorted(row[0] for row in backend.get_exercises_for_workout(first)) == ["Bench", "Squat"]
+    columns = backend.get_exercises_for_workouts([first, second])
+    assert columns['workout_id'] == [second, first, first]
+    assert columns['exercise_name'] == ["Deadlift", "Squat", "Bench"]
+    assert backend.get_exercises_for_workouts([])['workout_id'] == []
+
+
+def test_idempotent_logging(backend):
+    ann = _user(backend, "Ann")
+    workout_id = backend.create_workout_with_exercises(ann, TODAY, 30, [], idempotency_key="form-1")
+    assert backend.create_workout_with_exercises(ann, TODAY, 30, [], idempotency_key="form-1") == workout_id
+    assert len(backend.get_all_workouts_for_user(ann)) == 1
+
+
+def test_goals(backend):
+    ann = _user(backend, "Ann")
+    assert backend.create_goal(ann, "Get strong", 100)
+    assert backend.create_goal(ann, "Squat 120", 120, goal_type='max_weight', exercise_name="Squat")
+    assert backend.create_goal(ann, "Train", 3, goal_type='workouts_per_week')
+    _workout(backend, ann, 0, 30, [("Squat", 110)])
+    manual, squat, weekly = backend.get_goals(ann)
+    assert (squat[3], weekly[3]) == (110, 1)
+    assert backend.update_goal_progress(manual[0], 40)
+    assert backend.get_goals(ann)[0][3] == 40
+    assert not backend.update_goal_progress(squat[0], 5)
+    assert backend.get_goals(ann)[1][3] == 110
+    assert backend.delete_goal(manual[0])
+    assert [goal[0] for goal in backend.get_goals(ann)] == [squat[0], weekly[0]]
+
+
+def test_friends(backend):
+    ann, ben, cat = (_user(backend, name) for name in ("Ann", "Ben", "Cat"))
+    assert backend.add_friend(ann, ben)[0]
+    assert not backend.add_friend(ben, ann)[0]
+    assert not backend.add_friend(ann, ann)[0]
+    assert backend.add_friend(ben, cat)[0]
+    assert sorted(backend.get_friends_list(ann)) == [(ben, "Ben")]
+    assert backend.get_friend_ids(ben) == {ann, cat}
+    assert backend.get_mutual_friend_counts(ann, [cat]) == {cat: 1}
+    assert [row[0] for row in backend.suggest_friends(ann)] == [cat]
+    assert backend.remove_friend(ben, ann)
+    assert backend.get_friends_list(ann) == []
+
+
+def test_insights(backend):
+    ann = _user(backend, "Ann")
+    assert backend.get_business_insights(ann)['total_workouts'] == 0
+    for days_ago, minutes in ((40, 20), (3, 30), (1, 40)):
+        _workout(backend, ann, days_ago, minutes)
+    insights = backend.get_business_insights(ann)
+    assert (insights['total_workouts'], insights['total_duration']) == (3, 90)
+    assert (insights['min_duration'], insights['max_duration']) == (20, 40)
+    assert insights['avg_duration'] == pytest.approx(30)
+    assert (insights['workouts_last_30_days'], insights['duration_last_30_days']) == (2, 70)
+
+
+def test_leaderboard(backend):
+    ann, ben, cat = (_user(backend, name) for name in ("Ann", "Ben", "Cat"))
+    backend.add_friend(ann, ben)
+    _workout(backend, ann, 1, 30)
+    _workout(backend, ben, 1, 50)
+    _workout(backend, cat, 1, 90)
+    assert backend.get_leaderboard_data('total_duration_all_time', ann) == [("Ben", 50), ("Ann", 30)]
+    _workout(backend, ann, 0, 30)
+    assert backend.get_leaderboard_data('total_duration_all_time', ann) == [("Ann", 60), ("Ben", 50)]
+    snapshot = backend.get_dashboard_snapshot(ann)
+    assert snapshot['friends_count'] == 1
+    assert snapshot['leaderboard'] == [("Ann", 60), ("Ben", 50)]
+    assert backend.get_global_rank(ann, exact=True)['rank'] == 2
+
+
+def test_global_rankings(backend):
+    ann, ben, cat = (_user(backend, name) for name in ("Ann", "Ben", "Cat"))
+    _workout(backend, ann, 1, 30)
+    _workout(backend, ben, 1, 50)
+    assert backend.refresh_global_rankings()
+    assert backend.get_global_rank(ben) == {'value': 50, 'rank': 1, 'users': 3, 'top_percent': 100 / 3,
+                                            'percentile': 200 / 3, 'exact': True}
+    assert backend.get_global_top(k=2) == [(ben, "Ben", 50), (ann, "Ann", 30)]
+    assert backend.update_user(ben, "Benji", "ben@example.com", 80)
+    assert backend.get_global_top(k=1) == [(ben, "Benji", 50)]
+    backend.invalidate_deleted_users([ben])
+    assert backend.get_global_top(k=2) == [(ann, "Ann", 30), (cat, "Cat", 0)]
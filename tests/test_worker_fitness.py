@@ -0,0 +1,62 @@
+from datetime import date, datetime, timedelta
+
+import goals_fitness
+import stats_fitness
+import worker_fitness
+
+
+def _log_backdated(backend, user_id, days_ago):
+    """Logs a workout dated `days_ago` days back, as if it had been logged that day."""
+    workout_id = backend.create_workout_with_exercises(user_id, date.today() - timedelta(days=days_ago), 30, [])
+    with backend.db_cursor(commit=True) as cur:
+        cur.execute("UPDATE workout_events SET created_at = %s WHERE workout_id = %s;",
+                    (datetime.now() - timedelta(days=days_ago), workout_id))
+
+
+def _weekly_goal(backend, user_id):
+    with backend.db_cursor() as cur:
+        cur.execute("SELECT progress_value, period_start FROM goals WHERE user_id = %s;", (user_id,))
+        return tuple(cur.fetchone())
+
+
+def test_backlogged_events_count_toward_the_period_they_were_logged_in(backend, monkeypatch):
+    monkeypatch.setattr(backend, "AGGREGATION_MODE", "worker")
+    user_id = backend.create_user("Ann", "ann@example.com", 70)
+    assert backend.create_goal(user_id, "Train", 3, goal_type='workouts_per_week')
+    last_week = date.today() - timedelta(days=7)
+    last_week_start = last_week - timedelta(days=last_week.weekday())
+    # Last counted two weeks ago
+    with backend.db_cursor(commit=True) as cur:
+        cur.execute("UPDATE goals SET progress_value = 2, period_start = %s WHERE user_id = %s;",
+                    (last_week_start - timedelta(days=7), user_id))
+
+    _log_backdated(backend, user_id, 7)
+    assert worker_fitness.process_batch(batch_size=10)[0] == 1
+    assert _weekly_goal(backend, user_id) == (1, last_week_start)
+
+    # An even older event, processed late, leaves the newer period alone
+    _log_backdated(backend, user_id, 14)
+    assert worker_fitness.process_batch(batch_size=10)[0] == 1
+    assert _weekly_goal(backend, user_id) == (1, last_week_start)
+
+
+def test_rebuild_with_pending_events_counts_each_workout_once(backend, monkeypatch):
+    monkeypatch.setattr(backend, "AGGREGATION_MODE", "worker")
+    user_id = backend.create_user("Ann", "ann@example.com", 70)
+    assert backend.create_goal(user_id, "Train", 5, goal_type='workouts_per_week')
+    backend.create_workout_with_exercises(user_id, date.today(), 30, [])
+    assert worker_fitness.process_batch(batch_size=10)[0] == 1
+    backend.create_workout_with_exercises(user_id, date.today(), 45, [])
+
+    # The second workout's event is still queued while the summaries and goals are rebuilt
+    assert stats_fitness.rebuild_stats() == (1, 1)
+    assert goals_fitness.recompute_goals() == 1
+    assert stats_fitness.verify_stats() == []
+    assert _weekly_goal(backend, user_id)[0] == 1
+
+    assert worker_fitness.process_batch(batch_size=10)[0] == 1
+    with backend.db_cursor() as cur:
+        cur.execute("SELECT workout_count, duration_sum FROM user_workout_stats WHERE user_id = %s;", (user_id,))
+        assert tuple(cur.fetchone()) == (2, 75)
+    assert _weekly_goal(backend, user_id)[0] == 2
+    assert stats_fitness.verify_stats() == []
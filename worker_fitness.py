@@ -0,0 +1,240 @@
+"""
+Aggregation worker: folds logged workouts into the summaries and goal progress off the write path.
+
+    FITNESS_AGGREGATION=worker streamlit run frontend_fitness.py   # writes append to workout_events
+    python worker_fitness.py run                                    # consume until interrupted
+    python worker_fitness.py run --batch-size 1000 --poll 0.5 --name worker-2
+    python worker_fitness.py drain                                  # until the log is empty, then exit
+    python worker_fitness.py status                                 # backlog, lag and checkpoints
+    python worker_fitness.py status --prometheus
+
+With AGGREGATION_MODE "worker", create_workout_with_exercises appends a workout_events row in
+its own transaction instead of updating user_workout_stats, user_workout_daily and the tracked
+goals. A worker takes the oldest events a batch at a time and, in one transaction, applies
+them (backend_fitness.apply_workout_events), deletes them and advances its row in
+worker_checkpoints. A crash before the commit leaves the events in the log to be taken again;
+anything outside the database (cache invalidation, the on_batch hook) runs after the commit
+and is at-least-once. On Postgres several workers can run side by side: batches are claimed
+with FOR UPDATE SKIP LOCKED, and every aggregate is a sum, min or max, so the order in which
+they are applied does not matter. On SQLite run a single worker (or start_in_process).
+When sharded, every event lives on its user's shard and each batch takes up to --batch-size
+events from every shard, each shard in its own transaction with its own checkpoint row.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+
+from backend_fitness import (
+    DB_ERRORS, apply_workout_events, db_connection, db_cursor, get_engine, invalidate_aggregates, on_each_database,
+    with_retries
+)
+
+DEFAULT_WORKER_NAME = f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _claim_batch(cur, batch_size):
+    """The oldest events not claimed by another worker, locked until this transaction ends."""
+    cur.execute(f"""
+        SELECT event_id, user_id, workout_id, created_at FROM workout_events
+        ORDER BY event_id
+        LIMIT %s
+        {get_engine().skip_locked_clause()};
+    """, (batch_size,))
+    return cur.fetchall()
+
+
+def process_batch(worker=DEFAULT_WORKER_NAME, batch_size=500):
+    """
+    Applies, deletes and checkpoints up to `batch_size` events in one transaction, on every
+    shard when sharded. Returns (events, affected user ids, seconds the newest of them waited).
+    """
+    results = on_each_database(lambda: _process_batch(worker, batch_size))
+    return (sum(count for count, _, _ in results), set().union(*(users for _, users, _ in results)),
+            max(lag for _, _, lag in results))
+
+
+def _process_batch(worker, batch_size):
+    engine = get_engine()
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            events = _claim_batch(cur, batch_size)
+            if not events:
+                conn.rollback()
+                return 0, set(), 0.0
+            event_ids = [event_id for event_id, _, _, _ in events]
+            users = apply_workout_events(cur, list({workout_id for _, _, workout_id, _ in events}), {
+                workout_id: _as_datetime(created_at).date() for _, _, workout_id, created_at in events
+            })
+            cur.execute(f"DELETE FROM workout_events WHERE {engine.id_list_condition('event_id')};",
+                        (engine.id_list_param(event_ids),))
+            cur.execute("""
+                INSERT INTO worker_checkpoints (worker, last_event_id, events_processed, batches, updated_at)
+                VALUES (%(worker)s, %(last)s, %(events)s, 1, %(now)s)
+                ON CONFLICT (worker) DO UPDATE SET
+                    last_event_id = CASE WHEN excluded.last_event_id > worker_checkpoints.last_event_id
+                                         THEN excluded.last_event_id ELSE worker_checkpoints.last_event_id END,
+                    events_processed = worker_checkpoints.events_processed + excluded.events_processed,
+                    batches = worker_checkpoints.batches + 1,
+                    updated_at = excluded.updated_at;
+            """, {'worker': worker, 'last': max(event_ids), 'events': len(events), 'now': datetime.now()})
+        conn.commit()
+    newest = max(_as_datetime(created_at) for _, _, _, created_at in events)
+    return len(events), users, max((datetime.now() - newest).total_seconds(), 0.0)
+
+
+def _as_datetime(value):
+    # SQLite hands timestamps back as text
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def run_worker(worker=DEFAULT_WORKER_NAME, batch_size=500, poll=1.0, until_empty=False,
+               stop=None, on_batch=None):
+    """
+    Processes batches until `stop` (a threading.Event) is set, or with until_empty once the log
+    is empty; sleeps `poll` seconds whenever it is. Transient errors are retried with backoff;
+    others are reported and retried after `poll`. on_batch(events, users, lag_seconds) is called
+    after each commit. Returns totals: events, batches, errors.
+    """
+    stop = stop or threading.Event()
+    totals = {'events': 0, 'batches': 0, 'errors': 0}
+    while not stop.is_set():
+        try:
+            count, users, lag = with_retries(process_batch, worker, batch_size)
+        except DB_ERRORS as e:
+            print(f"Database error: {e}", file=sys.stderr)
+            totals['errors'] += 1
+            stop.wait(poll)
+            continue
+        if count:
+            totals['events'] += count
+            totals['batches'] += 1
+            invalidate_aggregates(users)
+            if on_batch:
+                on_batch(count, users, lag)
+            # A full batch (from some shard) means there is probably more waiting
+            if count >= batch_size:
+                continue
+        if until_empty and count < batch_size:
+            break
+        stop.wait(poll)
+    return totals
+
+
+def start_in_process(batch_size=500, poll=0.5):
+    """
+    Runs the worker on a daemon thread of this process, e.g. beside the frontend on a
+    single-machine SQLite deployment, where its cache invalidation also reaches this
+    process's caches. Returns the threading.Event that stops it.
+    """
+    stop = threading.Event()
+    thread = threading.Thread(target=run_worker, name="aggregation-worker", daemon=True,
+                              kwargs={'worker': f"{DEFAULT_WORKER_NAME}-thread", 'batch_size': batch_size,
+                                      'poll': poll, 'stop': stop})
+    thread.start()
+    return stop
+
+
+def lag():
+    """
+    Backlog and lag of the event log: pending events, age in seconds of the oldest pending one
+    (how far behind the summaries are), and every worker's checkpoint with seconds since its last batch.
+    When sharded the counts are summed over the shards and each worker's checkpoints combined.
+    """
+    def read():
+        with db_cursor() as cur:
+            cur.execute("SELECT COUNT(*), MIN(created_at) FROM workout_events;")
+            count, oldest = cur.fetchone()
+            cur.execute("""
+                SELECT worker, last_event_id, events_processed, batches, updated_at
+                FROM worker_checkpoints
+                ORDER BY worker;
+            """)
+            return count, oldest, cur.fetchall()
+
+    now = datetime.now()
+    pending, oldest_seconds, workers = 0, 0.0, {}
+    for count, oldest, checkpoints in on_each_database(read):
+        pending += int(count)
+        if oldest:
+            oldest_seconds = max(oldest_seconds, (now - _as_datetime(oldest)).total_seconds())
+        for worker, last, events, batches, updated_at in checkpoints:
+            idle = (now - _as_datetime(updated_at)).total_seconds()
+            seen = workers.get(worker)
+            if seen is None:
+                workers[worker] = {'last_event_id': int(last), 'events_processed': int(events),
+                                   'batches': int(batches), 'idle_seconds': idle}
+                continue
+            seen['last_event_id'] = max(seen['last_event_id'], int(last))
+            seen['events_processed'] += int(events)
+            seen['batches'] += int(batches)
+            seen['idle_seconds'] = min(seen['idle_seconds'], idle)
+    return {
+        'pending_events': pending,
+        'oldest_pending_seconds': oldest_seconds,
+        'workers': dict(sorted(workers.items())),
+    }
+
+
+def prometheus_lines(status):
+    """`lag()` in the Prometheus text exposition format, next to metrics_fitness's output."""
+    lines = [
+        "# TYPE fitness_workout_events_pending gauge",
+        f"fitness_workout_events_pending {status['pending_events']}",
+        "# TYPE fitness_workout_events_lag_seconds gauge",
+        f"fitness_workout_events_lag_seconds {status['oldest_pending_seconds']:.3f}",
+        "# TYPE fitness_worker_events_processed_total counter",
+    ]
+    for worker, checkpoint in status['workers'].items():
+        lines.append(f'fitness_worker_events_processed_total{{worker="{worker}"}} {checkpoint["events_processed"]}')
+    lines.append("# TYPE fitness_worker_idle_seconds gauge")
+    for worker, checkpoint in status['workers'].items():
+        lines.append(f'fitness_worker_idle_seconds{{worker="{worker}"}} {checkpoint["idle_seconds"]:.3f}')
+    return "\n".join(lines) + "\n"
+
+
+def _print_batch(count, users, lag_seconds):
+    print(f"  applied {count} events for {len(users)} users (newest waited {lag_seconds:.2f}s)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold logged workouts into the summaries and goals.")
+    parser.add_argument("command", choices=["run", "drain", "status"])
+    parser.add_argument("--name", default=DEFAULT_WORKER_NAME, help="checkpoint name of this worker")
+    parser.add_argument("--batch-size", type=int, default=500, help="events per transaction")
+    parser.add_argument("--poll", type=float, default=1.0, help="seconds to wait when the log is empty")
+    parser.add_argument("--prometheus", action="store_true", help="status: Prometheus text format")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "status":
+            status = lag()
+            if args.prometheus:
+                print(prometheus_lines(status), end="")
+                return 0
+            print(f"{status['pending_events']} events pending, oldest {status['oldest_pending_seconds']:.1f}s old.")
+            for worker, checkpoint in status['workers'].items():
+                print(f"  {worker}: {checkpoint['events_processed']} events in {checkpoint['batches']} batches, "
+                      f"up to event {checkpoint['last_event_id']}, idle {checkpoint['idle_seconds']:.1f}s")
+            return 0
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        try:
+            totals = run_worker(args.name, args.batch_size, args.poll, until_empty=args.command == "drain",
+                                stop=stop, on_batch=None if args.quiet else _print_batch)
+        except KeyboardInterrupt:
+            return 0
+        print(f"Applied {totals['events']} events in {totals['batches']} batches ({totals['errors']} errors).")
+    except DB_ERRORS as e:
+        print(f"Database error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())